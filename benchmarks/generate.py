@@ -0,0 +1,84 @@
+"""Synthetic directory trees for benchmarks.
+
+Every shape is deterministic for a given (count, seed). Files are small
+placeholders: scanning, classification prompts and moves only look at names
+and metadata, so content size would only measure the disk.
+"""
+import os
+import random
+from typing import Callable, Dict, List
+
+SHAPES = ("flat", "deep", "wide", "unicode", "mixed")
+
+# 1x1 transparent PNG.
+_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d4944415478da63fcffff3f0300050001ff8b1d8f0b0000000049454e44ae426082"
+)
+_ZIP_HEADER = b"PK\x05\x06" + b"\x00" * 18  # empty zip: stands in for docx/xlsx/pptx
+
+_MIXED_EXTENSIONS = [
+    ".docx", ".pdf", ".xlsx", ".pptx", ".txt", ".md", ".csv",
+    ".jpg", ".png", ".mp3", ".mp4", ".zip", ".py", ".weird",
+]
+_WORDS = ["报告", "会议纪要", "合同", "发票", "report", "notes", "draft", "final", "IMG", "照片", "数据", "plan"]
+_UNICODE_PARTS = [
+    "中文文件名", "日本語のファイル", "한국어", "Ελληνικά", "кириллица", "עברית", "العربية",
+    "emoji🎉", "café", "naïve", "é", "带 空 格", "全角（括号）", "①②③",
+]
+
+
+def _content(ext: str) -> bytes:
+    if ext == ".png":
+        return _PNG
+    if ext in (".docx", ".xlsx", ".pptx", ".zip"):
+        return _ZIP_HEADER
+    return b"autosniffer benchmark\n"
+
+
+def _name(rng: random.Random, i: int, exts: List[str]) -> str:
+    return f"{rng.choice(_WORDS)}_{i:07d}{rng.choice(exts)}"
+
+
+def _unicode_name(rng: random.Random, i: int, exts: List[str]) -> str:
+    return f"{rng.choice(_UNICODE_PARTS)}_{rng.choice(_UNICODE_PARTS)}_{i}{rng.choice(exts)}"
+
+
+def _dir_for(shape: str, i: int, count: int) -> List[str]:
+    if shape == "flat":
+        return []
+    if shape == "deep":
+        # Chains of 24 nested levels, 2000 files per chain, spread over the levels.
+        chain, pos = divmod(i, 2000)
+        return [f"chain{chain:03d}"] + [f"level{d:02d}" for d in range(pos % 24)]
+    if shape == "wide":
+        width = max(1, int(count ** 0.5))
+        return [f"dir{i % width:05d}"]
+    if shape == "unicode":
+        return [f"{_UNICODE_PARTS[i % len(_UNICODE_PARTS)]}目录", f"子目录{(i // 50) % 20:02d}"]
+    # mixed: a little of everything, like a real downloads folder.
+    return [["下载", "桌面", "work/2024/q1", "photos/旅行", ""][i % 5]]
+
+
+def generate_tree(root: str, shape: str, count: int, *, seed: int = 0) -> Dict[str, int]:
+    """Create `count` files under `root` in the given shape; returns {files, dirs, bytes}."""
+    if shape not in SHAPES:
+        raise ValueError(f"未知的目录形态：{shape}（可选：{', '.join(SHAPES)}）")
+    rng = random.Random(f"{shape}:{count}:{seed}")
+    exts = _MIXED_EXTENSIONS if shape == "mixed" else [".txt", ".docx", ".pdf", ".jpg", ".xlsx"]
+    make_name: Callable[[random.Random, int, List[str]], str] = _unicode_name if shape == "unicode" else _name
+    os.makedirs(root, exist_ok=True)
+    made_dirs = set()
+    written = 0
+    for i in range(count):
+        parts = [p for part in _dir_for(shape, i, count) for p in part.split("/") if p]
+        directory = os.path.join(root, *parts) if parts else root
+        if directory not in made_dirs:
+            os.makedirs(directory, exist_ok=True)
+            made_dirs.update(os.path.join(root, *parts[:k]) for k in range(1, len(parts) + 1))
+        name = make_name(rng, i, exts)
+        data = _content(os.path.splitext(name)[1])
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        written += len(data)
+    return {"files": count, "dirs": len(made_dirs - {root}), "bytes": written}
@@ -0,0 +1,208 @@
+"""End-to-end benchmark: generate synthetic trees, time each pipeline phase,
+write a JSON report and optionally compare it with a previous one.
+
+    python -m benchmarks.run --scales 1k,100k --shapes flat,deep,wide,unicode,mixed --out bench.json
+    python -m benchmarks.run --scales 1k --compare bench.json   # exit 1 on regression
+
+Phases: scan, flatten, json_encode, classify (stage 2 against the local mock
+server, on a sample of `--classify-limit` files), move (with journaling),
+cleanup and undo. Classification latency is the mock's, so it measures the
+client side (prompt building, HTTP, JSON parsing), not a real model.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from benchmarks.generate import SHAPES, generate_tree
+from src.ai_service import AIService
+from src.mock_server import MockChatServer
+from src.workflow import OrganizerWorkflow
+
+REPORT_VERSION = 1
+_SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+_FOLDERS = ["文档", "表格", "演示文稿", "图片", "音视频", "压缩包", "代码", "其他"]
+
+
+def parse_scale(text: str) -> int:
+    key = text.strip().lower()
+    return _SCALES[key] if key in _SCALES else int(key)
+
+
+@contextmanager
+def _phase(phases: Dict[str, Dict[str, Any]], name: str, items: int) -> Iterator[Dict[str, Any]]:
+    entry: Dict[str, Any] = {"items": items}
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        seconds = time.perf_counter() - start
+        entry["seconds"] = round(seconds, 4)
+        entry["items_per_sec"] = round(entry["items"] / seconds, 1) if seconds > 0 else None
+        phases[name] = entry
+
+
+def run_case(wf: OrganizerWorkflow, workdir: str, shape: str, count: int, args: argparse.Namespace) -> Dict[str, Any]:
+    root = os.path.join(workdir, f"{shape}_{count}")
+    shutil.rmtree(root, ignore_errors=True)
+    started = time.perf_counter()
+    tree = generate_tree(root, shape, count, seed=args.seed)
+    generate_seconds = round(time.perf_counter() - started, 3)
+
+    phases: Dict[str, Dict[str, Any]] = {}
+    with _phase(phases, "scan", count):
+        structure = wf.scan_directory(root)
+    with _phase(phases, "flatten", count):
+        files = wf.flatten_files(structure)
+    with _phase(phases, "json_encode", count) as p:
+        p["bytes"] = len(wf.format_structure_json(structure).encode("utf-8"))
+
+    sample = files[: max(0, args.classify_limit)]
+    destinations: List[str] = []
+    with _phase(phases, "classify", len(sample)) as p:
+        for batch in wf.chunk_list(sample, args.batch_size):
+            destinations.extend(wf.stage2_choose_destinations_batch(batch, _FOLDERS))
+        p["requests"] = -(-len(sample) // args.batch_size) if sample else 0
+    # Files beyond the sample are spread round-robin; moves do not depend on the model.
+    destinations.extend(_FOLDERS[i % len(_FOLDERS)] for i in range(len(destinations), len(files)))
+
+    created = wf.create_folders_python(root, _FOLDERS)
+    vacated = set(_FOLDERS)
+    journal = wf.open_journal(root, created_folders=created, allowed_folders=_FOLDERS)
+    try:
+        with _phase(phases, "move", len(files)) as p:
+            moved = 0
+            for batch, dests in zip(wf.chunk_list(files, args.batch_size), wf.chunk_list(destinations, args.batch_size)):
+                records = wf.move_files_python(root, batch, dests, vacated_dirs=vacated)
+                journal.append_moves(records)
+                moved += sum(1 for r in records if r.get("status") == "moved")
+            p["moved"] = moved
+        with _phase(phases, "cleanup", len(vacated)) as p:
+            deleted = wf.cleanup_empty_folders(root, candidates=vacated)
+            p["deleted"] = len(deleted)
+        journal.finalize(deleted_empty_folders=deleted)
+    finally:
+        journal.close()
+
+    with _phase(phases, "undo", moved) as p:
+        result = wf.undo_last(root, max_workers=args.undo_workers)
+        p["restored"] = int(result.get("restored") or 0)
+
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return {"shape": shape, "files": count, "dirs": tree["dirs"], "generate_seconds": generate_seconds, "phases": phases}
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        return out.stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_seconds: float = 0.05) -> List[str]:
+    """Return one message per (case, phase) that got slower than `threshold` (0.2 = 20%)."""
+    old = {(c["shape"], c["files"]): c for c in baseline.get("results") or []}
+    regressions: List[str] = []
+    for case in report.get("results") or []:
+        prev = old.get((case["shape"], case["files"]))
+        if not prev:
+            continue
+        for name, entry in case["phases"].items():
+            before = (prev.get("phases") or {}).get(name, {}).get("seconds")
+            after = entry.get("seconds")
+            # Ignore very short phases; scheduler and disk-cache noise dominates there.
+            if not before or after is None or max(before, after) < min_seconds:
+                continue
+            ratio = after / before
+            if ratio > 1 + threshold:
+                regressions.append(f"{case['shape']}/{case['files']} {name}: {before:.3f}s -> {after:.3f}s (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="AutoSniffer 端到端基准测试（合成目录 + 本地模拟接口）")
+    parser.add_argument("--scales", default="1k", help="规模，逗号分隔：1k,10k,100k,1m 或具体数字")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help=f"目录形态，逗号分隔：{','.join(SHAPES)}")
+    parser.add_argument("--batch-size", type=int, default=20, help="阶段2每批文件数")
+    parser.add_argument("--classify-limit", type=int, default=2000, help="每个用例最多送去分类的文件数")
+    parser.add_argument("--latency", default="fixed:0", help='模拟接口延迟分布，如 "uniform:20,80"')
+    parser.add_argument("--undo-workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="生成目录的位置（默认临时目录）")
+    parser.add_argument("--keep", action="store_true", help="保留生成的目录")
+    parser.add_argument("--out", default="", help="JSON 报告路径（默认 benchmarks/results/<时间>.json）")
+    parser.add_argument("--compare", help="与之前的报告比较，变慢超过阈值时退出码为 1")
+    parser.add_argument("--threshold", type=float, default=0.2, help="回归阈值（0.2 = 慢 20%%）")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="比较时忽略耗时低于该值的阶段")
+    args = parser.parse_args(argv)
+    args.batch_size = max(1, args.batch_size)
+
+    shapes = [s.strip() for s in args.shapes.split(",") if s.strip()]
+    scales = [parse_scale(s) for s in args.scales.split(",") if s.strip()]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="autosniffer_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    results: List[Dict[str, Any]] = []
+    with MockChatServer(latency=args.latency, seed=args.seed) as server:
+        wf = OrganizerWorkflow(AIService(api_key="mock", base_url=server.base_url))
+        for count in scales:
+            for shape in shapes:
+                case = run_case(wf, workdir, shape, count, args)
+                results.append(case)
+                summary = "  ".join(f"{k}={v['seconds']:.3f}s" for k, v in case["phases"].items())
+                print(f"[{shape:>7} {count:>9}] {summary}", flush=True)
+        mock_stats = dict(server.stats)
+
+    report = {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            "batch_size": args.batch_size,
+            "classify_limit": args.classify_limit,
+            "latency": args.latency,
+            "seed": args.seed,
+        },
+        "mock": mock_stats,
+        "results": results,
+    }
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已写入：{out}")
+    if not args.workdir and not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold, args.min_seconds)
+        for line in regressions:
+            print(f"回归：{line}")
+        if regressions:
+            return 1
+        print("与基线相比无回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,176 @@
+import argparse
+import json
 import os
 import sys
-import json
-from src import config
-from src import file_ops
-from src import cmd_executor
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src import config, metrics
+from src.ai_service import AIService
+from src.jobs import JOB_DONE, JobManager, current_token
 from src.workflow import OrganizerWorkflow
 
-def main():
-    # 检查是否提供了目录路径参数
-    # if len(sys.argv) < 2:
-    #     print("用法: python main.py <目录路径>")
-    #     sys.exit(1)
-    
-    # 从命令行参数获取根目录，或者使用配置中的默认路径
-    # root_path = sys.argv[1] if len(sys.argv) > 1 else config.DEFAULT_ROOT_PATH
-    root_path = config.DEFAULT_ROOT_PATH
-
-    # 验证路径是否存在且为目录
-    if not os.path.isdir(root_path):
-        print(f"错误: 提供的路径 '{root_path}' 不是一个有效的目录。")
-        sys.exit(1)
-        
-    wf = OrganizerWorkflow()
-
-    # 获取目录结构
-    print(f"正在分析目录: {root_path} ...")
-    directory_json_structure = file_ops.get_directory_structure(root_path)
-
-    # 将字典转换为格式化的 JSON 字符串并打印
-    json_output = json.dumps(directory_json_structure, indent=4, ensure_ascii=False)
-    print("目录结构分析完成。")
-
-    # 阶段1：生成并创建文件夹
-    print("阶段1：请求 AI 生成目标分类目录...")
-    folders = wf.stage1_plan_folders(json_output, model=getattr(config, "MODEL_NAME_STAGE1", None))
-    mkdir_script = wf.build_mkdir_script(folders)
-    print("阶段1：将创建以下文件夹：")
-    for f in folders:
-        print(f"- {f}")
-    print("阶段1：正在创建文件夹...")
-    cmd_executor.execute_cmd_with_powershell(mkdir_script, working_dir=root_path)
-
-    # 阶段2：批量（每次 N 个文件）归类并移动
-    batch_size = int(os.getenv("AUTOSNIFFER_STAGE2_BATCH_SIZE") or "5")
-    if batch_size <= 0:
-        batch_size = 1
-    print(f"阶段2：开始批量归类并移动（每批 {batch_size} 个）...")
-    decisions, batch_results = wf.stage2_process_files_batched(
-        root_path=root_path,
-        structure=directory_json_structure,
-        allowed_folders=folders,
-        batch_size=batch_size,
-        timeout_seconds=300,
-        model=getattr(config, "MODEL_NAME_STAGE2", None),
+_print_lock = threading.Lock()
+
+
+def emit(event: str, **data: Any) -> None:
+    """Write one JSON-lines progress record to stdout."""
+    record = {"ts": round(time.time(), 3), "event": event, **data}
+    line = json.dumps(record, ensure_ascii=False)
+    with _print_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="autosniffer",
+        description="AutoSniffer 命令行：对一个或多个目录执行两阶段整理，进度以 JSON lines 输出到 stdout。",
+    )
+    parser.add_argument("roots", nargs="*", help="要整理的目录（可多个）；省略时使用 config.DEFAULT_ROOT_PATH")
+    parser.add_argument("--jobs", type=int, default=2, help="同时整理的目录数（默认 2）")
+    parser.add_argument(
+        "--ai-concurrency",
+        type=int,
+        default=config.AI_MAX_CONCURRENCY or 4,
+        help="所有目录共享的最大并发 AI 调用数（默认 4；0 表示不限制）",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=int(os.getenv("AUTOSNIFFER_STAGE2_BATCH_SIZE") or "5"),
+        help="阶段2每批文件数（默认 5）",
+    )
+    parser.add_argument("--folders", help="跳过阶段1 AI 规划，直接使用这些分类文件夹（逗号分隔）")
+    parser.add_argument("--requirements", help="个性化整理要求（传给 AI）")
+    parser.add_argument("--model-stage1", default=config.MODEL_NAME_STAGE1, help="阶段1模型")
+    parser.add_argument("--model-stage2", default=config.MODEL_NAME_STAGE2, help="阶段2模型")
+    parser.add_argument("--resume", action="store_true", help="若上次运行中断，则继续上次运行")
+    parser.add_argument("--dry-run", action="store_true", help="只预演（内存中模拟移动），不改动磁盘")
+    parser.add_argument("--metrics", metavar="DIR", help="把耗时 trace（JSON）与 Prometheus 文本写入该目录")
+    return parser.parse_args(argv)
+
+
+def organize_root(wf: OrganizerWorkflow, root_path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Scan, plan folders and classify/move one root with the Python move + journal path."""
+    should_stop = current_token() or (lambda: False)
+    root_path = wf.validate_root_path(root_path)
+    requirements = (args.requirements or "").strip() or None
+
+    emit("scan_started", root=root_path)
+    structure = wf.scan_directory(root_path)
+    files = wf.flatten_files(structure)
+    emit("scan_done", root=root_path, files=len(files))
+    if not files:
+        return {"root": root_path, "files": 0}
+
+    resume_state = wf.load_resume_state(root_path) if args.resume else None
+    if resume_state:
+        folders = list(resume_state.get("allowed_folders") or [])
+        emit("resume", root=root_path, run_id=resume_state.get("run_id"), moved=len(resume_state.get("moved") or {}))
+    elif args.folders:
+        folders = [f.strip() for f in args.folders.split(",") if f.strip()]
+    else:
+        emit("stage1_started", root=root_path)
+        folders = wf.stage1_plan_folders(
+            wf.format_structure_json(structure),
+            model=args.model_stage1,
+            user_requirements=requirements,
+        )
+    if not folders:
+        raise ValueError("阶段1未得到分类文件夹")
+    emit("stage1_done", root=root_path, folders=folders)
+
+    def on_progress(stage: str, done: int, total: int) -> None:
+        emit("progress", root=root_path, stage=stage, done=done, total=total)
+
+    if args.dry_run:
+        result = wf.dry_run_stage2(
+            structure,
+            folders,
+            batch_size=args.batch_size,
+            model=args.model_stage2,
+            user_requirements=requirements,
+            should_stop=should_stop,
+            on_progress=on_progress,
+        )
+        if result is None:
+            return {"root": root_path, "stopped": True}
+        return {"root": root_path, "dry_run": True, **result["summary"]}
+
+    created = [] if resume_state else wf.create_folders_python(root_path, folders)
+    summary = wf.run_stage2(
+        root_path,
+        files,
+        folders,
+        batch_size=args.batch_size,
+        model=args.model_stage2,
+        user_requirements=requirements,
+        created_folders=created,
+        resume_state=resume_state,
+        should_stop=should_stop,
+        on_progress=on_progress,
     )
-    total_files = len(decisions)
-    total_batches = len(batch_results)
-    ok_batches = sum(1 for r in batch_results if r.return_code == 0)
-    print(f"阶段2完成：文件 {total_files} 个，批次 {ok_batches}/{total_batches} 成功")
+    return {"root": root_path, "created_folders": created, **summary}
+
+
+def run_roots(manager: JobManager, roots: List[str], args: argparse.Namespace) -> int:
+    """Organize every root on the manager's pool; returns the number of roots that failed."""
+    # One workflow (and AI client) per root; the AI call budget is global.
+    submitted = [manager.submit(root, organize_root, OrganizerWorkflow(), root, args) for root in roots]
+    failed = 0
+    try:
+        for job in submitted:
+            try:
+                result = job.wait()
+                if result is not None:
+                    emit("root_summary", **result)
+            except Exception:
+                failed += 1
+    except KeyboardInterrupt:
+        # Stop at the next batch boundary; journals stay resumable with --resume.
+        emit("interrupted", roots=[j.name for j in manager.active()])
+        manager.cancel_all()
+        for job in submitted:
+            try:
+                job.wait()
+            except Exception:
+                pass
+        failed = sum(1 for j in submitted if j.status != JOB_DONE)
+    finally:
+        manager.shutdown(wait=True)
+    return failed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    roots = args.roots or [config.DEFAULT_ROOT_PATH]
+    invalid = [r for r in roots if not os.path.isdir(r)]
+    if invalid:
+        for r in invalid:
+            emit("error", root=r, error=f"提供的路径 '{r}' 不是一个有效的目录。")
+        return 2
+
+    AIService.set_max_concurrency(args.ai_concurrency)
+    manager = JobManager(max_workers=max(1, args.jobs))
+
+    def on_job_event(job, event: str) -> None:
+        if event == "started":
+            emit("root_started", root=job.name, job=job.id)
+        elif event == "finished":
+            emit("root_finished", root=job.name, job=job.id, status=job.status, error=job.error or None)
+
+    manager.subscribe(on_job_event)
+    with metrics.collect("cli") as trace:
+        failed = run_roots(manager, roots, args)
+
+    emit("metrics", **trace.summary())
+    if args.metrics:
+        emit("metrics_written", **trace.write(args.metrics))
+    emit("done", roots=len(roots), failed=failed)
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,14 +1,27 @@
 import json
 import base64
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
 from openai import OpenAI
 
 from . import config
+from . import metrics
 
 class AIService:
     USER_REQUIREMENTS_TOKEN = "<<USER_REQUIREMENTS>>"
 
+    # Process-wide cap on in-flight model calls, shared by every AIService instance
+    # (several roots organized in parallel still respect one budget). None = unlimited.
+    _call_slots: Optional[threading.BoundedSemaphore] = (
+        threading.BoundedSemaphore(config.AI_MAX_CONCURRENCY) if config.AI_MAX_CONCURRENCY > 0 else None
+    )
+
+    @classmethod
+    def set_max_concurrency(cls, limit: Optional[int]) -> None:
+        """Set the global limit of concurrent model calls (0/None removes the limit)."""
+        cls._call_slots = threading.BoundedSemaphore(int(limit)) if limit and int(limit) > 0 else None
+
     def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
         self._api_key = (api_key or config.API_KEY or "").strip()
         self._base_url = (base_url or config.API_BASE_URL or "").strip()
@@ -18,6 +31,19 @@ class AIService:
             base_url=self._base_url,
         )
 
+    def _create_completion(self, **kwargs: Any) -> Any:
+        slots = AIService._call_slots
+        if slots is None:
+            return self._timed_create(**kwargs)
+        with slots:
+            return self._timed_create(**kwargs)
+
+    def _timed_create(self, **kwargs: Any) -> Any:
+        with metrics.span("ai.chat", model=str(kwargs.get("model") or "")) as attrs:
+            completion = self.client.chat.completions.create(**kwargs)
+            attrs.update(metrics.usage_attrs(getattr(completion, "usage", None)))
+            return completion
+
     @staticmethod
     def _normalize_user_requirements(text: Optional[str], *, max_len: int = 2000) -> str:
         s = (text or "").strip()
@@ -64,7 +90,7 @@ class AIService:
             if req_norm:
                 messages.append({"role": "user", "content": f"个性化要求（请严格遵守）：\n{req_norm}"})
             messages.append({"role": "user", "content": user_content})
-            completion = self.client.chat.completions.create(
+            completion = self._create_completion(
                 model=model_to_use,
                 messages=messages,
             )
@@ -80,14 +106,15 @@ class AIService:
         # Best-effort: try to extract the first JSON object if model added extra text.
         if not text:
             raise ValueError("AI 返回为空")
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            start = text.find("{")
-            end = text.rfind("}")
-            if start != -1 and end != -1 and end > start:
-                return json.loads(text[start : end + 1])
-            raise
+        with metrics.span("ai.parse_json", chars=len(text)):
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                start = text.find("{")
+                end = text.rfind("}")
+                if start != -1 and end != -1 and end > start:
+                    return json.loads(text[start : end + 1])
+                raise
 
     def get_folder_plan_stage1(
         self,
@@ -227,6 +254,109 @@ class AIService:
             return prefix.strip()
         raise ValueError("智能重命名返回格式错误：缺少 description")
 
+    def suggest_prefixes_for_rename_batch(
+        self,
+        payload: Dict[str, Any],
+        model: Optional[str] = None,
+        *,
+        user_requirements: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        """Batch rename: returns list of {relative_path, description} in the same order as input files."""
+        raw = self._chat(
+            config.SYSTEM_PROMPT_RENAME_SUGGEST_PREFIX_BATCH,
+            json.dumps(payload, ensure_ascii=False),
+            model=model or config.MODEL_NAME_STAGE2,
+            user_requirements=user_requirements,
+        )
+        obj = self._parse_json_object(raw)
+        items = obj.get("descriptions")
+        if not isinstance(items, list):
+            raise ValueError("智能重命名批处理返回格式错误：缺少 descriptions 数组")
+        cleaned: List[Dict[str, str]] = []
+        for it in items:
+            if not isinstance(it, dict):
+                cleaned.append({"relative_path": "", "description": ""})
+                continue
+            rp = str(it.get("relative_path") or "")
+            desc = it.get("description")
+            if not isinstance(desc, str) or not desc.strip():
+                desc = it.get("prefix")
+            cleaned.append({"relative_path": rp, "description": str(desc or "").strip()})
+        return cleaned
+
+    @staticmethod
+    def _vision_model(model: Optional[str]) -> str:
+        model_to_use = (model or config.MODEL_NAME_STAGE2 or "").strip()
+        if not model_to_use:
+            raise ValueError("未配置模型名称")
+        # Use qwen-vl series for image understanding
+        if "qwen" in model_to_use.lower() and "vl" not in model_to_use.lower():
+            # Automatically switch to vision model
+            model_to_use = "qwen-vl-max"
+        return model_to_use
+
+    def describe_images_for_rename_batch(
+        self,
+        images: List[Tuple[str, Dict[str, Any]]],
+        model: Optional[str] = None,
+        *,
+        user_requirements: Optional[str] = None,
+    ) -> List[str]:
+        """Describe several (image_base64, file_info) pairs in one multimodal request.
+
+        Returns descriptions in input order ("" where the model gave none).
+        Raises ValueError if the reply cannot be matched to the images.
+        """
+        if not self._api_key:
+            raise ValueError("未配置 API Key。请在 UI 中填写，或设置环境变量 AUTOSNIFFER_API_KEY/DASHSCOPE_API_KEY。")
+        model_to_use = self._vision_model(model)
+        req_norm = self._normalize_user_requirements(user_requirements)
+        system_prompt = self._apply_user_requirements(config.SYSTEM_PROMPT_RENAME_DESCRIBE_IMAGES_BATCH, user_requirements)
+
+        content: List[Dict[str, Any]] = []
+        if req_norm:
+            content.append({"type": "text", "text": f"个性化要求（请严格遵守）：\n{req_norm}"})
+        for n, (image_base64, file_info) in enumerate(images, start=1):
+            content.append(
+                {
+                    "type": "text",
+                    "text": f"第 {n} 张：文件名：{file_info.get('name', '')}，相对路径：{file_info.get('relative_path', '')}",
+                }
+            )
+            content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}})
+        content.append({"type": "text", "text": f"共 {len(images)} 张图片，请按顺序为每张生成重命名前缀。"})
+
+        try:
+            completion = self._create_completion(
+                model=model_to_use,
+                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": content}],
+                max_tokens=80 * len(images) + 100,
+            )
+        except Exception as e:
+            print(f"AI Image Service Error: {e} (model={model_to_use}, images={len(images)})")
+            raise RuntimeError(f"图片批量识别调用失败: {e}") from e
+
+        obj = self._parse_json_object(str(completion.choices[0].message.content or ""))
+        items = obj.get("descriptions")
+        if not isinstance(items, list):
+            raise ValueError("图片批量识别返回格式错误：缺少 descriptions 数组")
+        out = [""] * len(images)
+        by_index = {}
+        for it in items:
+            if isinstance(it, dict) and isinstance(it.get("index"), int):
+                by_index[it["index"]] = it
+        if by_index:
+            for n in range(len(images)):
+                it = by_index.get(n + 1) or {}
+                out[n] = str(it.get("description") or "").strip()
+        elif len(items) == len(images):
+            for n, it in enumerate(items):
+                desc = it.get("description") if isinstance(it, dict) else it
+                out[n] = str(desc or "").strip()
+        else:
+            raise ValueError("图片批量识别返回数量与输入不一致")
+        return out
+
     def describe_image_for_rename(
         self,
         image_base64: str,
@@ -242,14 +372,7 @@ class AIService:
         if not self._api_key:
             raise ValueError("未配置 API Key。请在 UI 中填写，或设置环境变量 AUTOSNIFFER_API_KEY/DASHSCOPE_API_KEY。")
         
-        model_to_use = (model or config.MODEL_NAME_STAGE2 or "").strip()
-        if not model_to_use:
-            raise ValueError("未配置模型名称")
-        
-        # Use qwen-vl series for image understanding
-        if "qwen" in model_to_use.lower() and "vl" not in model_to_use.lower():
-            # Automatically switch to vision model
-            model_to_use = "qwen-vl-max"
+        model_to_use = self._vision_model(model)
         
         system_prompt = """你是一位图片内容识别专家。你将收到一张图片和文件信息。
 
@@ -280,7 +403,7 @@ class AIService:
         user_content = f"文件名：{file_name}\n相对路径：{file_path}\n\n请分析这张图片并生成重命名前缀。"
         
         try:
-            completion = self.client.chat.completions.create(
+            completion = self._create_completion(
                 model=model_to_use,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -1,8 +1,13 @@
+import fnmatch
 import os
+import re
+import shutil
 import subprocess
 import tempfile
 import time
 
+from . import file_ops
+
 def print_console_result(result):
     """以正确编码打印控制台结果"""
     # 打印执行结果
@@ -131,3 +136,246 @@ def execute_cmd_with_powershell(script_content, working_dir=None, timeout=300, d
             _safe_remove(temp_bat_path)
     
     return result
+
+
+# --- Native backend: interpret the mkdir/move subset in-process ---
+
+_TOKEN_RE = re.compile(r'"[^"]*"|\S+')
+_REDIRECT_RE = re.compile(r'^\d?>>?(nul|&\d)$', re.IGNORECASE)
+_FOR_RE = re.compile(
+    r'^for\s+%%?(?P<var>\w)\s+in\s+\((?P<pattern>[^)]+)\)\s+do\s+'
+    r'(?:if\s+(?:/i\s+)?not\s+"%%?~x(?P=var)"\s*==\s*"(?P<skip_ext>[^"]*)"\s+)?'
+    r'(?P<body>move\b.*)$',
+    re.IGNORECASE,
+)
+
+
+def _tokens(line):
+    """Split a command line cmd-style (double quotes group) and drop output redirections."""
+    return [t for t in _TOKEN_RE.findall(line) if not _REDIRECT_RE.match(t)]
+
+
+def _unquote(token):
+    return token[1:-1] if len(token) >= 2 and token[0] == token[-1] == '"' else token
+
+
+def parse_script(script_content):
+    """Parse a generated cmd script into operations.
+
+    Supported subset (what `build_mkdir_script` / `build_batch_script` and the
+    legacy planning prompt produce):
+      - `@echo off`, `cd /d "%~dp0"`, `rem` / `::` comments (no-ops)
+      - `mkdir` / `md "dir"`
+      - `move [/Y] "src" "dst\\"` (src may contain * / ?)
+      - `for %%f in (*.*) do [if /i not "%%~xf"==".bat"] move "%%f" "dst\\"`
+
+    Returns (ops, errors): ops are tuples
+      ("mkdir", path) / ("move", src, dst, skip_ext); errors are (line_no, line, message).
+    """
+    ops = []
+    errors = []
+    for line_no, raw in enumerate((script_content or "").splitlines(), start=1):
+        line = raw.strip().lstrip('\ufeff')
+        if not line:
+            continue
+        lower = line.lower()
+        if lower.startswith(('@echo', 'echo off', 'rem ', '::', 'chcp ')) or lower == 'rem':
+            continue
+        match = _FOR_RE.match(line)
+        if match:
+            body = _tokens(match.group('body'))
+            var = '%%' + match.group('var')
+            args = [_unquote(t) for t in body[1:] if t.lower() not in ('/y', '/-y')]
+            if len(args) == 2 and args[0].replace('%%', '%') in (var, var.replace('%%', '%')):
+                for pattern in match.group('pattern').split():
+                    ops.append(('move', _unquote(pattern), args[1], match.group('skip_ext') or ''))
+                continue
+            errors.append((line_no, line, '不支持的 for 循环写法'))
+            continue
+        tokens = _tokens(line)
+        if not tokens:
+            # Nothing but redirections (e.g. ">nul"): a no-op in cmd as well.
+            continue
+        command = tokens[0].lower()
+        args = [_unquote(t) for t in tokens[1:]]
+        if command == 'cd':
+            if [a.lower() for a in args] in (['/d', '%~dp0'], ['%~dp0']):
+                continue
+            errors.append((line_no, line, '只支持 cd /d "%~dp0"'))
+        elif command in ('mkdir', 'md') and len(args) == 1:
+            ops.append(('mkdir', args[0]))
+        elif command == 'move':
+            args = [a for a in args if a.lower() not in ('/y', '/-y')]
+            if len(args) == 2:
+                ops.append(('move', args[0], args[1], ''))
+            else:
+                errors.append((line_no, line, 'move 需要源和目标两个参数'))
+        else:
+            errors.append((line_no, line, f'不支持的命令：{tokens[0]}'))
+    return ops, errors
+
+
+def _safe_rel(path):
+    """Normalize a script path to a root-relative posix path; None if it escapes the root."""
+    text = (path or '').replace('%~dp0', '').replace('\\', '/')
+    if not text or text.startswith('/') or re.match(r'^[A-Za-z]:', text):
+        return None
+    parts = [p for p in text.split('/') if p and p != '.']
+    if any(p == '..' for p in parts):
+        return None
+    return '/'.join(parts)
+
+
+def _expand_sources(working_dir, pattern, skip_ext):
+    """Resolve a move source (possibly a wildcard) to existing root-relative paths."""
+    rel = _safe_rel(pattern)
+    if rel is None:
+        return None
+    parent, _, name = rel.rpartition('/')
+    if not any(c in name for c in '*?'):
+        return [rel]
+    if name == '*.*':
+        # cmd's *.* also matches names without an extension.
+        name = '*'
+    base = os.path.join(working_dir, *parent.split('/')) if parent else working_dir
+    try:
+        entries = sorted(e.name for e in os.scandir(base) if e.is_file())
+    except OSError:
+        return []
+    skip = (skip_ext or '').lower()
+    return [
+        f'{parent}/{n}' if parent else n
+        for n in entries
+        if fnmatch.fnmatch(n.lower(), name.lower()) and not (skip and os.path.splitext(n)[1].lower() == skip)
+    ]
+
+
+def _default_move_files(working_dir, file_items, destinations):
+    """Fallback mover: move each item into its destination folder, keeping both on conflict."""
+    records = []
+    for item, folder in zip(file_items, destinations):
+        src_rel = item['relative_path']
+        record = {'src_rel': src_rel, 'final_dst_rel': '', 'status': 'pending', 'error': '', 'conflict': False}
+        try:
+            src_abs = os.path.join(working_dir, *src_rel.split('/'))
+            dst_dir = os.path.join(working_dir, *folder.split('/'))
+            os.makedirs(dst_dir, exist_ok=True)
+            dst_abs = os.path.join(dst_dir, item['name'])
+            if os.path.exists(dst_abs):
+                # Same naming as `OrganizerWorkflow.move_files_python`.
+                record['conflict'] = True
+                dst_abs = file_ops.unique_path(dst_abs, '__conflict')
+            shutil.move(src_abs, dst_abs)
+            record['status'] = 'moved'
+            record['final_dst_rel'] = os.path.relpath(dst_abs, working_dir).replace('\\', '/')
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+        records.append(record)
+    return records
+
+
+def execute_cmd_native(script_content, working_dir=None, timeout=300, move_files=None):
+    """
+    在当前进程内解释执行 mkdir/move 脚本（跨平台，无需启动 PowerShell）
+
+    `move_files(file_items, destinations)` moves a list of
+    {relative_path, name} items into destination folders and returns move
+    records (the signature of `OrganizerWorkflow.move_files_python` bound to a
+    root); consecutive folder moves are handed to it as one batch. Moves to an
+    explicit file name are done here and never overwrite an existing target.
+
+    Returns the same dict as `execute_cmd_with_powershell` plus `moves`.
+    """
+    working_dir = os.path.abspath(working_dir or os.getcwd())
+    os.makedirs(working_dir, exist_ok=True)
+    if move_files is None:
+        move_files = lambda items, dests: _default_move_files(working_dir, items, dests)
+    deadline = time.monotonic() + timeout if timeout else None
+
+    ops, errors = parse_script(script_content)
+    messages = [f'第{n}行：{msg}：{line}' for n, line, msg in errors]
+    moves = []
+    pending_items = []
+    pending_dests = []
+    created = 0
+
+    def flush():
+        if pending_items:
+            moves.extend(move_files(list(pending_items), list(pending_dests)))
+            pending_items.clear()
+            pending_dests.clear()
+
+    timed_out = False
+    for op in ops:
+        if deadline is not None and time.monotonic() > deadline:
+            timed_out = True
+            break
+        if op[0] == 'mkdir':
+            rel = _safe_rel(op[1])
+            if rel is None:
+                messages.append(f'拒绝操作工作目录之外的路径：{op[1]}')
+                continue
+            abs_dir = os.path.join(working_dir, *rel.split('/'))
+            if not os.path.isdir(abs_dir):
+                try:
+                    os.makedirs(abs_dir, exist_ok=True)
+                    created += 1
+                except OSError as e:
+                    messages.append(f'创建失败：{op[1]}：{e}')
+            continue
+
+        _, src, dst, skip_ext = op
+        dst_rel = _safe_rel(dst)
+        if any(c in src for c in '*?'):
+            # A wildcard sees the directory as it is now: apply queued moves first,
+            # or files already queued for another folder are matched (and moved) again.
+            flush()
+        sources = _expand_sources(working_dir, src, skip_ext)
+        if dst_rel is None or sources is None:
+            messages.append(f'拒绝操作工作目录之外的路径：{src} -> {dst}')
+            continue
+        dst_abs = os.path.join(working_dir, *dst_rel.split('/'))
+        into_dir = dst.endswith(('\\', '/')) or os.path.isdir(dst_abs) or len(sources) != 1
+        for src_rel in sources:
+            if into_dir:
+                pending_items.append({'relative_path': src_rel, 'name': src_rel.rpartition('/')[2]})
+                pending_dests.append(dst_rel)
+                continue
+            flush()
+            record = {'src_rel': src_rel, 'final_dst_rel': '', 'status': 'pending', 'error': '', 'conflict': False}
+            src_abs = os.path.join(working_dir, *src_rel.split('/'))
+            if not os.path.exists(src_abs):
+                record.update(status='skipped', error='源文件不存在')
+            elif os.path.exists(dst_abs):
+                record.update(status='failed', error='目标已存在', conflict=True)
+            else:
+                try:
+                    shutil.move(src_abs, dst_abs)
+                    record.update(status='moved', final_dst_rel=dst_rel)
+                except Exception as e:
+                    record.update(status='failed', error=str(e))
+            moves.append(record)
+    flush()
+
+    for r in moves:
+        if r.get('status') != 'moved':
+            messages.append(f"移动失败：{r.get('src_rel')}：{r.get('error')}")
+    if timed_out:
+        messages.append(f'执行超时（{timeout}秒）')
+
+    moved = sum(1 for r in moves if r.get('status') == 'moved')
+    return {
+        'return_code': -1 if timed_out else (1 if messages else 0),
+        'stdout': f'已创建 {created} 个文件夹，已移动 {moved} 个文件\n',
+        'stderr': '\n'.join(messages),
+        'executed_file': '',
+        'moves': moves,
+    }
+
+
+def execute_cmd(script_content, working_dir=None, timeout=300, backend='native', move_files=None):
+    """按 backend（"native" / "powershell"）执行脚本"""
+    if (backend or 'native').lower() == 'powershell':
+        return execute_cmd_with_powershell(script_content, working_dir=working_dir, timeout=timeout)
+    return execute_cmd_native(script_content, working_dir=working_dir, timeout=timeout, move_files=move_files)
@@ -17,6 +17,12 @@ MODEL_NAME_IMAGE = os.getenv("AUTOSNIFFER_MODEL_IMAGE") or "qwen3-vl-plus-2025-1
 # Default Paths
 DEFAULT_ROOT_PATH = "./test_files"
 
+# Maximum number of concurrent model calls across the whole process (0 = unlimited).
+AI_MAX_CONCURRENCY = int(os.getenv("AUTOSNIFFER_AI_CONCURRENCY") or "0")
+
+# How generated mkdir/move scripts run: "native" (in-process, cross-platform) or "powershell".
+SCRIPT_BACKEND = (os.getenv("AUTOSNIFFER_SCRIPT_BACKEND") or "native").strip().lower()
+
 # Prompts
 SYSTEM_PROMPT = """
 ###你是一位文件整理专家。
@@ -175,3 +181,99 @@ SYSTEM_PROMPT_RENAME_SUGGEST_PREFIX = """
 - description 建议 6~24 个字符（中文算 1 个字符），尽量避免过长。
 - 不要输出引号外的解释、不输出 markdown。
 """
+
+
+SYSTEM_PROMPT_RENAME_SUGGEST_PREFIX_BATCH = """
+你是一位文件命名专家。你将收到一个 JSON，包含：
+- files：一批文件，每个元素包含 relative_path/name/extension 与 content_snippet（从文件中提取的文本片段，可能被截断）
+
+个性化要求（可选；如果为空请忽略）：
+<<USER_REQUIREMENTS>>
+
+任务：
+根据每个文件各自的 content_snippet 的主题，为该文件生成一个“简短、信息密度高、可读”的中文或英文描述，用于添加到原文件名前。
+每个文件只参考它自己的 content_snippet，不要混用其他文件的内容。
+
+输出要求（必须严格遵守）：
+- 只输出一个 JSON 对象，不能包含任何额外文本。
+- JSON 结构固定为：
+	{"descriptions": [{"relative_path": "...", "description": "..."}, ...]}
+- descriptions 的长度必须与输入 files 的长度相同，且顺序必须与 files 完全一致。
+- relative_path 必须与输入完全一致。
+
+命名约束：
+- description 只作为“前缀”，不要包含文件扩展名。
+- description 不要包含路径分隔符（/ \\），不要包含 Windows 不允许的字符：<>:"/\\|?*。
+- description 建议 6~24 个字符（中文算 1 个字符），尽量避免过长。
+- 不要输出 markdown。
+"""
+
+SYSTEM_PROMPT_RENAME_DESCRIBE_IMAGES_BATCH = """你是一位图片内容识别专家。你将收到若干张图片，每张图片前都有一行“第 N 张”及其文件信息。
+
+个性化要求（可选；如果为空请忽略）：
+<<USER_REQUIREMENTS>>
+
+任务：
+分别观察每张图片，为每张图片生成一个适合作为文件名前缀的简短中文描述。
+每张图片只描述它自己的内容，不要混用其他图片的内容。
+
+输出要求（必须严格遵守）：
+- 只输出一个 JSON 对象，不能包含任何额外文本
+- JSON 结构固定为：
+	{"descriptions": [{"index": 1, "description": "..."}, ...]}
+- descriptions 的长度必须与图片数量相同，index 从 1 开始，顺序与图片顺序一致
+- description：用于文件名前缀的内容描述，建议 6-18 个字，尽量避免标点符号
+"""
+
+# Batched rename prefix suggestion: several files' snippets per request.
+RENAME_BATCH_MAX_FILES = int(os.getenv("AUTOSNIFFER_RENAME_BATCH_MAX_FILES") or "8")
+# Rough token budget for one batched request (snippets + metadata).
+RENAME_BATCH_TOKEN_BUDGET = int(os.getenv("AUTOSNIFFER_RENAME_BATCH_TOKENS") or "6000")
+# Words kept per file inside a batched request.
+RENAME_BATCH_WORDS_PER_FILE = int(os.getenv("AUTOSNIFFER_RENAME_BATCH_WORDS") or "300")
+
+# Text extraction for rename (worker processes)
+# Hard per-file timeout in seconds, by extension; others use EXTRACT_TIMEOUT_DEFAULT.
+EXTRACT_TIMEOUT_DEFAULT = float(os.getenv("AUTOSNIFFER_EXTRACT_TIMEOUT") or "20")
+EXTRACT_TIMEOUTS = {
+    ".pdf": EXTRACT_TIMEOUT_DEFAULT * 2,
+    ".pptx": EXTRACT_TIMEOUT_DEFAULT * 1.5,
+    ".xlsx": EXTRACT_TIMEOUT_DEFAULT * 1.5,
+    ".xls": EXTRACT_TIMEOUT_DEFAULT * 1.5,
+    ".docx": EXTRACT_TIMEOUT_DEFAULT,
+    ".txt": EXTRACT_TIMEOUT_DEFAULT / 2,
+}
+# Address-space cap per extraction process (POSIX only); 0 disables it.
+EXTRACT_MEMORY_LIMIT_MB = int(os.getenv("AUTOSNIFFER_EXTRACT_MEMORY_MB") or "1536")
+
+# Rename snippet cache under .autosniffer_history/cache (LRU by total size); 0 disables it.
+SNIPPET_CACHE_MAX_MB = float(os.getenv("AUTOSNIFFER_SNIPPET_CACHE_MB") or "16")
+
+# Image thumbnails sent to the vision model for rename (longest side in px, JPEG quality).
+RENAME_IMAGE_MAX_SIDE = int(os.getenv("AUTOSNIFFER_RENAME_IMAGE_SIDE") or "768")
+RENAME_IMAGE_QUALITY = int(os.getenv("AUTOSNIFFER_RENAME_IMAGE_QUALITY") or "70")
+# Images whose dHash differs by at most this many bits share one vision call; -1 disables.
+RENAME_IMAGE_DEDUP_DISTANCE = int(os.getenv("AUTOSNIFFER_RENAME_IMAGE_DEDUP") or "4")
+# Longest wait (seconds) for the first image of a near-duplicate group before describing a copy on its own.
+RENAME_IMAGE_DEDUP_WAIT_SECONDS = float(os.getenv("AUTOSNIFFER_RENAME_IMAGE_DEDUP_WAIT") or "120")
+# On-disk cache of encoded image payloads under .autosniffer_history/cache; 0 disables it.
+IMAGE_CACHE_MAX_MB = float(os.getenv("AUTOSNIFFER_IMAGE_CACHE_MB") or "64")
+# Batched vision rename: images per request and total thumbnail pixels per request.
+RENAME_IMAGE_BATCH_MAX_FILES = int(os.getenv("AUTOSNIFFER_RENAME_IMAGE_BATCH") or "4")
+RENAME_IMAGE_BATCH_MAX_PIXELS = int(os.getenv("AUTOSNIFFER_RENAME_IMAGE_BATCH_PIXELS") or str(4 * 768 * 768))
+# Name screenshots / generic camera files (IMG_1234.jpg) from EXIF metadata without a vision call.
+RENAME_IMAGE_METADATA_PREFIX = (os.getenv("AUTOSNIFFER_RENAME_IMAGE_METADATA") or "1").strip().lower() not in ("0", "false", "no")
+
+# UI log: rows kept on screen; the full history is written to a daily file in UI_LOG_DIR ("" disables).
+UI_LOG_MAX_LINES = int(os.getenv("AUTOSNIFFER_UI_LOG_LINES") or "500")
+UI_LOG_DIR = os.getenv("AUTOSNIFFER_LOG_DIR", os.path.join(os.path.expanduser("~"), ".autosniffer", "logs")).strip()
+
+# Write a timing trace (Chrome trace JSON) and Prometheus text to METRICS_DIR after each UI run.
+# A per-user directory like UI_LOG_DIR, so read-only runs never write into the folder being organized.
+METRICS_EXPORT = (os.getenv("AUTOSNIFFER_METRICS_EXPORT") or "1").strip().lower() not in ("0", "false", "no")
+METRICS_DIR = os.getenv("AUTOSNIFFER_METRICS_DIR", os.path.join(os.path.expanduser("~"), ".autosniffer", "metrics")).strip()
+
+# Profile scan / stage 2 / rename preview runs (cProfile + stack sampling) into .autosniffer_history/profiles.
+# Can also be switched on from the hidden settings toggle (Ctrl+Shift+P on the settings page).
+PROFILE_ENABLED = (os.getenv("AUTOSNIFFER_PROFILE") or "0").strip().lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("AUTOSNIFFER_PROFILE_INTERVAL_MS") or "5")
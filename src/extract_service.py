@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from . import config
+
+STARTUP_TIMEOUT = 60.0
+
+
+class ExtractionTimeout(RuntimeError):
+    pass
+
+
+class ExtractionError(RuntimeError):
+    pass
+
+
+def _limit_memory(limit_bytes: int) -> None:
+    if limit_bytes <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        # Windows: no rlimit; the per-file timeout still bounds runaway parses.
+        return
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+    except (ValueError, OSError):
+        pass
+
+
+def _worker_main(conn, target: Callable[[str], str], memory_limit_bytes: int) -> None:
+    """Child process loop: receive a path, send back ("ok", text) or ("error", message)."""
+    _limit_memory(memory_limit_bytes)
+    # Handshake: importing the target's module can be slow and must not count
+    # against the first file's timeout.
+    conn.send(("ready", None))
+    while True:
+        try:
+            path = conn.recv()
+        except (EOFError, OSError):
+            return
+        if path is None:
+            return
+        try:
+            conn.send(("ok", target(path) or ""))
+        except MemoryError:
+            conn.send(("error", "内存超出限制"))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    def __init__(self, ctx, target: Callable[[str], str], memory_limit_bytes: int):
+        self._ctx = ctx
+        self._target = target
+        self._memory_limit_bytes = memory_limit_bytes
+        self.conn = None
+        self.process = None
+
+    def ensure_started(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            return
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._target, self._memory_limit_bytes),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        if not parent_conn.poll(STARTUP_TIMEOUT):
+            self.kill()
+            raise ExtractionError("提取进程启动超时")
+        try:
+            parent_conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise ExtractionError("提取进程启动失败")
+
+    def kill(self) -> None:
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.join(timeout=2)
+            except Exception:
+                pass
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.process = None
+        self.conn = None
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+        self.kill()
+
+
+class ExtractionService:
+    """Text extraction in worker processes with a hard per-file timeout and memory cap.
+
+    Each worker process handles one file at a time. If a file exceeds its
+    timeout (per extension, see `config.EXTRACT_TIMEOUTS`) the worker is
+    killed and replaced, so one pathological document cannot hang the flow.
+    The memory cap uses RLIMIT_AS and therefore only applies on POSIX.
+
+    `submit` returns a `concurrent.futures.Future`, so the service can be used
+    wherever an executor was used before.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[str], str],
+        max_workers: Optional[int] = None,
+        *,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+    ):
+        self._target = target
+        self._max_workers = max(1, int(max_workers or os.cpu_count() or 2))
+        self._timeouts = {k.lower(): float(v) for k, v in (timeouts or config.EXTRACT_TIMEOUTS).items()}
+        self._default_timeout = float(default_timeout or config.EXTRACT_TIMEOUT_DEFAULT)
+        limit_mb = config.EXTRACT_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+        self._memory_limit_bytes = max(0, int(limit_mb)) * 1024 * 1024
+
+        # spawn: forking a process that already runs UI/AI threads is not safe.
+        ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = [
+            _Worker(ctx, target, self._memory_limit_bytes) for _ in range(self._max_workers)
+        ]
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for w in self._workers:
+            self._idle.put(w)
+        self._dispatch = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._closed = threading.Event()
+
+    def __enter__(self) -> "ExtractionService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    def timeout_for(self, path: str) -> float:
+        ext = os.path.splitext(path)[1].lower()
+        return self._timeouts.get(ext, self._default_timeout)
+
+    def _run(self, path: str) -> str:
+        if self._closed.is_set():
+            raise ExtractionError("提取服务已关闭")
+        worker = self._idle.get()
+        try:
+            worker.ensure_started()
+            timeout = self.timeout_for(path)
+            worker.conn.send(path)
+            if not worker.conn.poll(timeout):
+                worker.kill()
+                raise ExtractionTimeout(f"提取超时（{timeout:g}秒）：{os.path.basename(path)}")
+            try:
+                status, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                # Child died (e.g. killed by the memory cap); start a fresh one next time.
+                worker.kill()
+                raise ExtractionError(f"提取进程异常退出（可能超出内存限制）：{os.path.basename(path)}")
+            if status != "ok":
+                raise ExtractionError(str(payload))
+            return str(payload or "")
+        finally:
+            self._idle.put(worker)
+
+    def submit(self, path: str) -> Future:
+        return self._dispatch.submit(self._run, path)
+
+    def extract(self, path: str) -> str:
+        return self._run(path)
+
+    def shutdown(self, *, wait: bool = False, cancel_futures: bool = True) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._dispatch.shutdown(wait=False, cancel_futures=cancel_futures)
+        stoppers = [threading.Thread(target=w.stop, daemon=True) for w in self._workers]
+        for t in stoppers:
+            # Busy workers are killed; idle ones get a clean exit message.
+            t.start()
+        if wait:
+            for t in stoppers:
+                t.join()
@@ -17,6 +17,17 @@ def get_file_metadata(file_path):
         print(f"警告：无法读取文件 '{file_path}' 的元数据: {e}")
         return None
 
+def unique_path(path, suffix):
+    """返回不存在的路径：`<stem><suffix><ext>`，已存在时依次尝试 `<stem><suffix>_1<ext>`、`_2`……"""
+    parent, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    candidate = os.path.join(parent, f"{stem}{suffix}{ext}")
+    i = 1
+    while os.path.exists(candidate):
+        candidate = os.path.join(parent, f"{stem}{suffix}_{i}{ext}")
+        i += 1
+    return candidate
+
 def get_directory_structure(path, base_path=None):
     """
     递归地为给定路径创建目录结构的字典。
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+CACHE_DIR = os.path.join(".autosniffer_history", "cache", "images")
+_READ_CHUNK = 1024 * 1024
+_HASH_BITS = 64  # dhash() with the default size
+
+
+def dhash(img: Image.Image, size: int = 8) -> int:
+    """Difference hash: 64-bit fingerprint that survives resizing and recompression."""
+    small = img.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (1 if pixels[offset + col] > pixels[offset + col + 1] else 0)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def content_key(abs_path: str, variant: str = "") -> str:
+    """SHA-1 of the file bytes plus the thumbnail settings (`variant`)."""
+    h = hashlib.sha1(variant.encode("utf-8"))
+    with open(abs_path, "rb") as f:
+        while True:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ImagePayloadCache:
+    """On-disk cache of encoded image payloads (base64 JPEG + dHash) by content hash.
+
+    One small JSON file per image under `.autosniffer_history/cache/images`.
+    Hits touch the file, and `prune` removes the least recently used files
+    once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, root_path: str, *, max_bytes: int):
+        self.dir = os.path.join(root_path, CACHE_DIR)
+        self.max_bytes = max(0, int(max_bytes))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        if self.max_bytes <= 0:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("payload"), str):
+            return None
+        return data["payload"], int(data.get("dhash") or 0)
+
+    def put(self, key: str, payload: str, hash_value: int) -> None:
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"dhash": hash_value, "payload": payload}, f)
+            os.replace(tmp, path)
+        except OSError:
+            # The cache is only an optimization; a read-only folder just means no reuse.
+            pass
+
+    def prune(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        try:
+            entries = [e for e in os.scandir(self.dir) if e.is_file() and e.name.endswith(".json")]
+        except OSError:
+            return
+        stats = []
+        for e in entries:
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def _bands(count: int) -> List[Tuple[int, int]]:
+    """Split the hash into `count` contiguous bit ranges as (shift, mask)."""
+    width, extra = divmod(_HASH_BITS, count)
+    bands, shift = [], 0
+    for k in range(count):
+        bits = width + (1 if k < extra else 0)
+        bands.append((shift, (1 << bits) - 1))
+        shift += bits
+    return bands
+
+
+class NearDuplicateIndex:
+    """Thread-safe dHash index that lets near-identical images share one result.
+
+    `claim(hash)` returns (future, owner): the first image of a group owns the
+    future and must resolve it; later images within `max_distance` bits get
+    the same future and wait for its result. A negative distance disables
+    sharing.
+
+    Hashes are bucketed by `max_distance + 1` bands: two hashes within
+    `max_distance` bits agree exactly on at least one band (pigeonhole), so a
+    lookup only compares entries that share a band instead of the whole index.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = int(max_distance)
+        self._lock = threading.Lock()
+        self._hashes: List[int] = []
+        self._futures: List[Future] = []
+        # With max_distance >= 64 every hash matches; plain scanning is fine there.
+        self._bands = _bands(self.max_distance + 1) if 0 <= self.max_distance < _HASH_BITS else []
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self.shared = 0
+
+    def _candidates(self, hash_value: int) -> Iterable[int]:
+        if not self._bands:
+            return range(len(self._hashes))
+        found = set()
+        for (shift, mask), bucket in zip(self._bands, self._buckets):
+            found.update(bucket.get((hash_value >> shift) & mask, ()))
+        # Oldest first, so an image joins the same group as with a full scan.
+        return sorted(found)
+
+    def claim(self, hash_value: int) -> Tuple[Future, bool]:
+        with self._lock:
+            if self.max_distance < 0:
+                return Future(), True
+            for i in self._candidates(hash_value):
+                if hamming(self._hashes[i], hash_value) <= self.max_distance:
+                    self.shared += 1
+                    return self._futures[i], False
+            fut = Future()
+            i = len(self._hashes)
+            self._hashes.append(hash_value)
+            self._futures.append(fut)
+            for (shift, mask), bucket in zip(self._bands, self._buckets):
+                bucket.setdefault((hash_value >> shift) & mask, []).append(i)
+            return fut, True
@@ -0,0 +1,225 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+_current = threading.local()
+
+
+class JobCancelled(RuntimeError):
+    pass
+
+
+class CancelToken:
+    """Per-job cancellation flag. Calling the token returns whether it was cancelled,
+    so it can be passed directly as a `should_stop` callback."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled("任务已取消")
+
+
+class Job:
+    def __init__(self, job_id: str, name: str, token: CancelToken):
+        self.id = job_id
+        self.name = name
+        self.token = token
+        self.status = JOB_QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: str = ""
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def cancel(self) -> None:
+        self.token.cancel()
+        if self.future is not None:
+            self.future.cancel()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the job ends; returns its result or raises its exception."""
+        return self.future.result(timeout=timeout) if self.future is not None else self.result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def current_job() -> Optional[Job]:
+    """The job running on this thread, if any."""
+    return getattr(_current, "job", None)
+
+
+def current_token() -> Optional[CancelToken]:
+    job = current_job()
+    return job.token if job is not None else None
+
+
+def report_progress(stage: str, done: int, total: int, **extra: Any) -> None:
+    """Report progress for the current job (no-op outside a job)."""
+    job = current_job()
+    manager = getattr(_current, "manager", None)
+    if job is None or manager is None:
+        return
+    job.progress = {"stage": stage, "done": done, "total": total, **extra}
+    manager._emit(job, "progress")
+
+
+class JobManager:
+    """Runs named jobs on a worker pool with a FIFO queue.
+
+    Each job gets its own `CancelToken`; inside the job, `current_token()` /
+    `report_progress()` reach it through a thread-local, so workflow code can
+    stay unaware of the manager. Listeners receive (job, event) with event in
+    {"queued", "started", "progress", "finished"}. Used by the UI and the CLI.
+
+    Workers are daemon threads, so a job still running when the app exits does
+    not keep the process alive; callers that must finish (the CLI) wait on the
+    jobs or call `shutdown(wait=True)`.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._ids = itertools.count(1)
+        self._listeners: List[Callable[[Job, str], None]] = []
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"job_{i}", daemon=True)
+            for i in range(max(1, int(max_workers)))
+        ]
+        for t in self._workers:
+            t.start()
+
+    def subscribe(self, listener: Callable[[Job, str], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _emit(self, job: Job, event: str) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(job, event)
+            except Exception:
+                # A broken listener must not take down the job.
+                pass
+
+    def submit(self, name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+        if self._closed:
+            raise RuntimeError("任务管理器已关闭")
+        job = Job(f"{next(self._ids)}", name, CancelToken())
+        job.future = Future()
+        with self._lock:
+            self._jobs[job.id] = job
+        self._emit(job, "queued")
+        self._queue.put((job, fn, args, kwargs))
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, fn, args, kwargs = item
+            if not job.future.set_running_or_notify_cancel():
+                # Cancelled while queued.
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                self._emit(job, "finished")
+                continue
+            try:
+                job.future.set_result(self._run(job, fn, args, kwargs))
+            except BaseException as e:
+                job.future.set_exception(e)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        if job.token.cancelled:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            self._emit(job, "finished")
+            return None
+        _current.job = job
+        _current.manager = self
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        self._emit(job, "started")
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = JOB_CANCELLED if job.token.cancelled else JOB_DONE
+            return job.result
+        except JobCancelled:
+            job.status = JOB_CANCELLED
+            return None
+        except BaseException as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            raise
+        finally:
+            job.finished_at = time.time()
+            _current.job = None
+            _current.manager = None
+            self._emit(job, "finished")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def active(self) -> List[Job]:
+        return [j for j in self.jobs() if j.status in (JOB_QUEUED, JOB_RUNNING)]
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def cancel_all(self) -> int:
+        active = self.active()
+        for job in active:
+            job.cancel()
+        return len(active)
+
+    def shutdown(self, *, wait: bool = True, cancel: bool = False) -> None:
+        if cancel:
+            self.cancel_all()
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for t in self._workers:
+                t.join()
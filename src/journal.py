@@ -0,0 +1,314 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+JOURNAL_VERSION = 2
+
+# Line types in the append-only journal (.jsonl)
+LINE_HEADER = "header"
+LINE_MOVE = "move"
+LINE_DECISIONS = "decisions"
+LINE_END = "end"
+
+INDEX_FILE = "index.json"
+_index_lock = threading.Lock()
+
+
+class JournalWriter:
+    """Append-only JSONL journal for a single run.
+
+    Every call to `append_moves` writes one line per record and then flushes +
+    fsyncs once, so a crash loses at most the batch that was in flight. The
+    writer never keeps records in memory; `finalize` compacts the JSONL file
+    into the classic `<run_id>.json` layout that undo already understands.
+    """
+
+    def __init__(self, path: str, header: Optional[Dict[str, Any]] = None, *, append: bool = False):
+        self.path = path
+        self.run_id = os.path.splitext(os.path.basename(path))[0]
+        self._closed = False
+        # Undoable ("moved") records and decision checkpoints in the file, including
+        # those written before a resume; a journal with neither can be discarded.
+        self.moved = 0
+        self.decisions = 0
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        torn = False
+        if append and exists:
+            for obj in iter_journal_lines(path):
+                if obj.get("type") == LINE_MOVE and obj.get("status") == "moved":
+                    self.moved += 1
+                elif obj.get("type") == LINE_DECISIONS:
+                    self.decisions += 1
+        if append and exists:
+            # A crash can leave a partial last line; start appending on a fresh line.
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._fh = open(path, "a" if append else "w", encoding="utf-8")
+        if torn:
+            self._fh.write("\n")
+        if not (append and exists):
+            head = dict(header or {})
+            head["type"] = LINE_HEADER
+            head.setdefault("id", self.run_id)
+            head.setdefault("version", JOURNAL_VERSION)
+            head.setdefault("created_at", datetime.now().isoformat(timespec="seconds"))
+            self._write_lines([head])
+            update_index_entry(
+                os.path.dirname(path),
+                self.run_id,
+                file=os.path.basename(path),
+                kind=head.get("kind", "organize"),
+                created_at=head["created_at"],
+                complete=False,
+                undone=False,
+            )
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _write_lines(self, lines: Iterable[Dict[str, Any]]) -> None:
+        if self._closed:
+            raise ValueError("journal 已关闭")
+        for obj in lines:
+            self._fh.write(json.dumps(obj, ensure_ascii=False))
+            self._fh.write("\n")
+        self._fh.flush()
+        try:
+            os.fsync(self._fh.fileno())
+        except OSError:
+            # fsync may be unsupported on some network drives; flush is still done.
+            pass
+
+    def append_moves(self, records: List[Dict[str, Any]]) -> None:
+        """Append one batch of move records and fsync once for the whole batch."""
+        if not records:
+            return
+        self._write_lines({"type": LINE_MOVE, **r} for r in records)
+        self.moved += sum(1 for r in records if r.get("status") == "moved")
+
+    def append_decisions(self, items: List[Dict[str, str]]) -> None:
+        """Checkpoint AI decisions ({relative_path, destination}) before the batch is moved."""
+        if not items:
+            return
+        self._write_lines([{"type": LINE_DECISIONS, "items": list(items)}])
+        self.decisions += 1
+
+    def append_event(self, event_type: str, **data: Any) -> None:
+        self._write_lines([{"type": event_type, **data}])
+
+    def close(self) -> None:
+        """Close without compaction (the run stays resumable/undoable as JSONL)."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._fh.close()
+        except Exception:
+            pass
+
+    def discard(self) -> None:
+        """Close, delete the file and drop the index entry (for runs that changed nothing)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        remove_index_entry(os.path.dirname(self.path), self.run_id)
+
+    def finalize(self, **footer: Any) -> str:
+        """Write the end marker, compact into `<run_id>.json` and return its path."""
+        end = {"finished_at": datetime.now().isoformat(timespec="seconds"), **footer}
+        self._write_lines([{"type": LINE_END, **end}])
+        self.close()
+        out_path = compact_journal(self.path)
+        update_index_entry(os.path.dirname(out_path), self.run_id, file=os.path.basename(out_path), complete=True)
+        return out_path
+
+
+def iter_journal_lines(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield parsed JSONL lines, ignoring a torn last line left by a crash."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(obj, dict):
+                yield obj
+
+
+def _strip_type(obj: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in obj.items() if k != "type"}
+
+
+def compact_journal(jsonl_path: str) -> str:
+    """Stream a JSONL journal into `<run_id>.json` and remove the JSONL file.
+
+    Moves are streamed record by record, so memory stays bounded by the header
+    and footer rather than by the number of moved files.
+    """
+    base, _ = os.path.splitext(jsonl_path)
+    out_path = base + ".json"
+    tmp_path = out_path + ".tmp"
+
+    header: Dict[str, Any] = {}
+    footer: Dict[str, Any] = {}
+    for obj in iter_journal_lines(jsonl_path):
+        t = obj.get("type")
+        if t == LINE_HEADER:
+            header = _strip_type(obj)
+        elif t == LINE_END:
+            footer = _strip_type(obj)
+
+    head = dict(header)
+    head.setdefault("id", os.path.basename(base))
+    head["version"] = JOURNAL_VERSION
+    head["complete"] = bool(footer)
+    deleted_empty_folders = footer.pop("deleted_empty_folders", []) or []
+
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("{\n")
+        for key, value in {**head, **footer}.items():
+            out.write(f"  {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)},\n")
+        out.write('  "moves": [')
+        first = True
+        for obj in iter_journal_lines(jsonl_path):
+            if obj.get("type") != LINE_MOVE:
+                continue
+            out.write("\n    " if first else ",\n    ")
+            out.write(json.dumps(_strip_type(obj), ensure_ascii=False))
+            first = False
+        out.write("\n  ],\n" if not first else "],\n")
+        out.write(f'  "deleted_empty_folders": {json.dumps(deleted_empty_folders, ensure_ascii=False)}\n')
+        out.write("}\n")
+        out.flush()
+        os.fsync(out.fileno())
+
+    os.replace(tmp_path, out_path)
+    try:
+        os.remove(jsonl_path)
+    except OSError:
+        pass
+    return out_path
+
+
+def read_journal(path: str) -> Dict[str, Any]:
+    """Load a journal in either compacted (.json) or append-only (.jsonl) form."""
+    if not path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    journal: Dict[str, Any] = {"moves": [], "complete": False}
+    for obj in iter_journal_lines(path):
+        t = obj.get("type")
+        if t == LINE_HEADER:
+            journal.update(_strip_type(obj))
+        elif t == LINE_MOVE:
+            journal["moves"].append(_strip_type(obj))
+        elif t == LINE_END:
+            journal.update(_strip_type(obj))
+            journal["complete"] = True
+    journal.setdefault("id", os.path.splitext(os.path.basename(path))[0])
+    journal.setdefault("deleted_empty_folders", [])
+    return journal
+
+
+# --- Journal index ---
+#
+# `.autosniffer_history/index.json` lists every journal with its state so undo
+# never has to glob + stat the whole history directory:
+#   {"version": 1, "journals": {run_id: {file, kind, created_at, complete, undone, undo_report}}}
+
+
+def _index_path(history: str) -> str:
+    return os.path.join(history, INDEX_FILE)
+
+
+def _is_journal_file(p: Path) -> bool:
+    return p.is_file() and p.suffix in (".json", ".jsonl") and p.name != INDEX_FILE and not p.stem.endswith("__undo")
+
+
+def rebuild_index(history: str) -> Dict[str, Any]:
+    """Rebuild the index from the files on disk (only needed once for old history dirs)."""
+    journals: Dict[str, Dict[str, Any]] = {}
+    for p in Path(history).iterdir():
+        if not _is_journal_file(p):
+            continue
+        run_id = p.stem
+        prev = journals.get(run_id)
+        # A compacted .json wins over a leftover .jsonl of the same run.
+        if prev and prev["file"].endswith(".json"):
+            continue
+        journals[run_id] = {
+            "file": p.name,
+            "kind": "organize",
+            "created_at": datetime.fromtimestamp(p.stat().st_mtime).isoformat(timespec="seconds"),
+            "complete": p.suffix == ".json",
+            "undone": os.path.exists(os.path.join(history, f"{run_id}__undo.json")),
+        }
+    index = {"version": 1, "journals": journals}
+    _save_index(history, index)
+    return index
+
+
+def _save_index(history: str, index: Dict[str, Any]) -> None:
+    path = _index_path(history)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def load_index(history: str) -> Dict[str, Any]:
+    with _index_lock:
+        try:
+            with open(_index_path(history), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if isinstance(index, dict) and isinstance(index.get("journals"), dict):
+                return index
+        except (OSError, ValueError):
+            pass
+        return rebuild_index(history)
+
+
+def update_index_entry(history: str, run_id: str, **fields: Any) -> None:
+    with _index_lock:
+        try:
+            with open(_index_path(history), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if not isinstance(index, dict) or not isinstance(index.get("journals"), dict):
+                raise ValueError("invalid index")
+        except (OSError, ValueError):
+            index = rebuild_index(history)
+        entry = index["journals"].setdefault(run_id, {})
+        entry.update(fields)
+        _save_index(history, index)
+
+
+def remove_index_entry(history: str, run_id: str) -> None:
+    with _index_lock:
+        try:
+            with open(_index_path(history), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if not isinstance(index, dict) or not isinstance(index.get("journals"), dict):
+                raise ValueError("invalid index")
+        except (OSError, ValueError):
+            index = rebuild_index(history)
+        if index["journals"].pop(run_id, None) is not None:
+            _save_index(history, index)
+
+
+def list_journals(history: str) -> List[Dict[str, Any]]:
+    """Return index entries (with `id`), oldest first."""
+    journals = load_index(history).get("journals") or {}
+    entries = [{"id": run_id, **entry} for run_id, entry in journals.items()]
+    entries.sort(key=lambda e: (str(e.get("created_at") or ""), e["id"]))
+    return entries
@@ -0,0 +1,132 @@
+import os
+from typing import Iterator, List, Optional
+
+try:
+    import docx
+    HAS_DOCX = True
+except ImportError:
+    HAS_DOCX = False
+
+try:
+    import PyPDF2
+    HAS_PDF = True
+except ImportError:
+    HAS_PDF = False
+
+try:
+    from pptx import Presentation
+    HAS_PPTX = True
+except ImportError:
+    HAS_PPTX = False
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".json", ".log", ".py", ".js", ".html", ".htm", ".xml", ".ini", ".yaml", ".yml"}
+EXCEL_EXTENSIONS = {".xlsx", ".xls", ".xlsm"}
+
+# Rows per sheet read from Excel; header row + this many rows is plenty for a prompt.
+EXCEL_NROWS = 200
+_TEXT_CHUNK = 64 * 1024
+
+
+def _iter_pdf(path: str) -> Iterator[str]:
+    reader = PyPDF2.PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def _iter_docx(path: str) -> Iterator[str]:
+    document = docx.Document(path)
+    for para in document.paragraphs:
+        yield para.text
+    for table in document.tables:
+        for row in table.rows:
+            yield " ".join(cell.text for cell in row.cells)
+
+
+def _iter_pptx(path: str) -> Iterator[str]:
+    prs = Presentation(path)
+    for slide in prs.slides:
+        parts: List[str] = []
+        for shape in slide.shapes:
+            if getattr(shape, "has_text_frame", False) and shape.has_text_frame:
+                parts.append(shape.text_frame.text)
+        yield "\n".join(parts)
+
+
+def _iter_excel(path: str, nrows: int) -> Iterator[str]:
+    with pd.ExcelFile(path) as book:
+        for sheet in book.sheet_names:
+            df = book.parse(sheet, nrows=nrows)
+            yield f"[{sheet}]"
+            yield " ".join(str(c) for c in df.columns)
+            for row in df.itertuples(index=False):
+                yield " ".join(str(v) for v in row if str(v) != "nan")
+
+
+def _iter_text(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(_TEXT_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_text_chunks(file_path: str, *, excel_nrows: int = EXCEL_NROWS) -> Optional[Iterator[str]]:
+    """Return a lazy iterator of text chunks (page / paragraph / slide / row), or
+    None if this module has no streaming reader for the file type."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf" and HAS_PDF:
+        return _iter_pdf(file_path)
+    if ext == ".docx" and HAS_DOCX:
+        return _iter_docx(file_path)
+    if ext == ".pptx" and HAS_PPTX:
+        return _iter_pptx(file_path)
+    if ext in EXCEL_EXTENSIONS and HAS_PANDAS:
+        return _iter_excel(file_path, excel_nrows)
+    if ext in TEXT_EXTENSIONS:
+        return _iter_text(file_path)
+    return None
+
+
+def extract_text_lazy(file_path: str, *, max_words: int = 1000, max_length: int = 50000) -> Optional[str]:
+    """Extract text chunk by chunk and stop as soon as the word or character
+    budget is met, so the cost per file does not grow with document size.
+
+    Falls back to `extract.extract_text_from_file` for types without a
+    streaming reader. Returns None if the file cannot be read.
+    """
+    if not os.path.exists(file_path):
+        return None
+    chunks = iter_text_chunks(file_path)
+    if chunks is None:
+        from extract import extract_text_from_file
+        return extract_text_from_file(file_path, max_length=max_length)
+
+    parts: List[str] = []
+    words = 0
+    length = 0
+    try:
+        for chunk in chunks:
+            chunk = (chunk or "").strip()
+            if not chunk:
+                continue
+            parts.append(chunk)
+            words += len(chunk.split())
+            length += len(chunk) + 1
+            if words >= max_words or length >= max_length:
+                break
+    except Exception:
+        # A broken page/slide late in the file should not discard what was read.
+        if not parts:
+            return None
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+    return "\n".join(parts)[:max_length]
@@ -0,0 +1,270 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+_lock = threading.Lock()
+_collectors: List["Trace"] = []
+
+TOKEN_KINDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+
+class Trace:
+    """Spans recorded while a `collect()` block is active.
+
+    Spans from every thread are delivered (pipelines use helper threads), so
+    two runs collecting at the same time see each other's spans. Aggregates are
+    always exact; individual spans are kept up to `max_spans`.
+    """
+
+    def __init__(self, name: str, *, max_spans: int = 100_000):
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.max_spans = max_spans
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._tokens: Dict[str, int] = {k: 0 for k in TOKEN_KINDS}
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            total = self._totals.setdefault(span["name"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] += span["duration"]
+            total["max_seconds"] = max(total["max_seconds"], span["duration"])
+            attrs = span["attrs"]
+            for kind in TOKEN_KINDS:
+                if isinstance(attrs.get(kind), int):
+                    self._tokens[kind] += attrs[kind]
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            wall = (self.finished_at or time.time()) - self.started_at
+            return {
+                "name": self.name,
+                "wall_seconds": round(wall, 4),
+                "spans": {
+                    name: {
+                        "count": int(t["count"]),
+                        "seconds": round(t["seconds"], 4),
+                        "max_seconds": round(t["max_seconds"], 4),
+                    }
+                    for name, t in sorted(self._totals.items(), key=lambda kv: -kv[1]["seconds"])
+                },
+                "tokens": dict(self._tokens),
+                "dropped_spans": self.dropped,
+            }
+
+    def format_summary(self) -> str:
+        """Short multi-line text for the UI log / CLI."""
+        s = self.summary()
+        lines = [f"耗时统计（{s['name']}，总计 {s['wall_seconds']:.2f}s）："]
+        for name, t in s["spans"].items():
+            lines.append(f"  {name}: {t['seconds']:.3f}s / {t['count']} 次（最长 {t['max_seconds']:.3f}s）")
+        tokens = s["tokens"]
+        if any(tokens.values()):
+            lines.append(
+                f"  tokens: 输入 {tokens['prompt_tokens']}（缓存 {tokens['cached_tokens']}），输出 {tokens['completion_tokens']}"
+            )
+        return "\n".join(lines)
+
+    def to_trace_events(self) -> Dict[str, Any]:
+        """Chrome trace-event JSON (opens in chrome://tracing or Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            events = [
+                {
+                    "name": sp["name"],
+                    "ph": "X",
+                    "ts": int(sp["start"] * 1_000_000),
+                    "dur": int(sp["duration"] * 1_000_000),
+                    "pid": pid,
+                    "tid": sp["tid"],
+                    "args": sp["attrs"],
+                }
+                for sp in self.spans
+            ]
+            names = {sp["tid"]: sp["thread"] for sp in self.spans}
+        events += [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in names.items()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": self.summary()}
+
+    def write(self, directory: str, *, prefix: Optional[str] = None) -> Dict[str, str]:
+        """Write `<prefix>.trace.json` and `<prefix>.prom` into `directory`; returns both paths."""
+        os.makedirs(directory, exist_ok=True)
+        if prefix:
+            base = os.path.join(directory, prefix)
+        else:
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started_at))
+            base = reserve_prefix(os.path.join(directory, f"{stamp}_{self.name}"), (".trace.json", ".prom"))
+        trace_path = f"{base}.trace.json"
+        prom_path = f"{base}.prom"
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_trace_events(), f, ensure_ascii=False)
+        with open(prom_path, "w", encoding="utf-8") as f:
+            f.write(to_prometheus())
+        return {"trace": trace_path, "prometheus": prom_path}
+
+
+def reserve_prefix(base: str, exts: Iterable[str]) -> str:
+    """Return `base` (or `base_2`, `base_3`, ...) with no existing `<prefix><ext>` files.
+
+    The first extension is created exclusively, so runs finishing in the same
+    second (timestamps have one-second resolution) never overwrite each other.
+    """
+    exts = list(exts)
+    n = 1
+    while True:
+        prefix = base if n == 1 else f"{base}_{n}"
+        n += 1
+        if any(os.path.exists(prefix + ext) for ext in exts[1:]):
+            continue
+        try:
+            open(prefix + exts[0], "x").close()
+        except FileExistsError:
+            continue
+        return prefix
+
+
+class _Registry:
+    """Process-wide cumulative counters for the Prometheus export."""
+
+    def __init__(self):
+        self.span_seconds: Dict[str, float] = {}
+        self.span_count: Dict[str, int] = {}
+        self.tokens: Dict[tuple, int] = {}
+
+    def add(self, span: Dict[str, Any]) -> None:
+        name = span["name"]
+        self.span_seconds[name] = self.span_seconds.get(name, 0.0) + span["duration"]
+        self.span_count[name] = self.span_count.get(name, 0) + 1
+        model = str(span["attrs"].get("model") or "")
+        for kind in TOKEN_KINDS:
+            value = span["attrs"].get(kind)
+            if isinstance(value, int):
+                key = (kind, model)
+                self.tokens[key] = self.tokens.get(key, 0) + value
+
+
+_registry = _Registry()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def to_prometheus() -> str:
+    """Cumulative process metrics in the Prometheus text exposition format."""
+    with _lock:
+        seconds = dict(_registry.span_seconds)
+        counts = dict(_registry.span_count)
+        tokens = dict(_registry.tokens)
+    lines = [
+        "# HELP autosniffer_span_seconds_total Time spent in each instrumented stage.",
+        "# TYPE autosniffer_span_seconds_total counter",
+    ]
+    lines += [f'autosniffer_span_seconds_total{{span="{_escape(n)}"}} {v:.6f}' for n, v in sorted(seconds.items())]
+    lines += [
+        "# HELP autosniffer_span_count_total Number of times each instrumented stage ran.",
+        "# TYPE autosniffer_span_count_total counter",
+    ]
+    lines += [f'autosniffer_span_count_total{{span="{_escape(n)}"}} {v}' for n, v in sorted(counts.items())]
+    lines += [
+        "# HELP autosniffer_ai_tokens_total Tokens reported by the model API.",
+        "# TYPE autosniffer_ai_tokens_total counter",
+    ]
+    lines += [
+        f'autosniffer_ai_tokens_total{{kind="{kind}",model="{_escape(model)}"}} {v}'
+        for (kind, model), v in sorted(tokens.items())
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def record(name: str, start: float, duration: float, attrs: Optional[Dict[str, Any]] = None) -> None:
+    span = {
+        "name": name,
+        "start": start,
+        "duration": duration,
+        "thread": threading.current_thread().name,
+        "tid": threading.get_ident(),
+        "attrs": dict(attrs or {}),
+    }
+    with _lock:
+        _registry.add(span)
+        collectors = list(_collectors)
+    for trace in collectors:
+        trace.add(span)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block. The yielded dict can be filled with more attributes
+    (e.g. token counts) before the block ends; errors are recorded too."""
+    start_wall = time.time()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record(name, start_wall, time.perf_counter() - start, attrs)
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of `span` for whole functions."""
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def collect(name: str, **kwargs: Any) -> Iterator[Trace]:
+    """Collect spans from all threads into a new `Trace` for the duration of the block."""
+    trace = Trace(name, **kwargs)
+    with _lock:
+        _collectors.append(trace)
+    try:
+        yield trace
+    finally:
+        trace.finished_at = time.time()
+        with _lock:
+            _collectors.remove(trace)
+
+
+def usage_attrs(usage: Any) -> Dict[str, int]:
+    """Token counts from an OpenAI-style `usage` object or dict (missing fields are omitted)."""
+    if usage is None:
+        return {}
+
+    def get(obj: Any, key: str) -> Any:
+        return obj.get(key) if isinstance(obj, dict) else getattr(obj, key, None)
+
+    out: Dict[str, int] = {}
+    for key in ("prompt_tokens", "completion_tokens"):
+        value = get(usage, key)
+        if isinstance(value, int):
+            out[key] = value
+    details = get(usage, "prompt_tokens_details")
+    cached = get(details, "cached_tokens") if details is not None else None
+    if isinstance(cached, int):
+        out["cached_tokens"] = cached
+    return out
@@ -0,0 +1,405 @@
+"""Local stand-in for an OpenAI-compatible `/v1/chat/completions` endpoint.
+
+Answers the prompts in `config.py` (and the single-image rename prompt) with
+deterministic, well-formed replies, so the stage-1, stage-2 and rename
+pipelines can be benchmarked and load-tested without network access:
+
+    python -m src.mock_server --port 8000 --latency uniform:50,300 --rate-limit-rate 0.05
+    AUTOSNIFFER_API_BASE_URL=http://127.0.0.1:8000/v1 AUTOSNIFFER_API_KEY=mock python main.py ./test_files
+
+Latency specs (milliseconds): "fixed:80", "uniform:20,200", "normal:120,40",
+"lognormal:4.5,0.5" (parameters of the underlying normal, in ln-ms).
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import config
+
+# Extension -> category keywords; a folder whose name contains a keyword wins.
+_CATEGORIES: List[Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = [
+    ("文档", (".doc", ".docx", ".pdf", ".txt", ".md", ".rtf", ".odt"), ("文档", "资料", "论文", "doc")),
+    ("表格", (".xls", ".xlsx", ".xlsm", ".csv"), ("表格", "数据", "sheet")),
+    ("演示文稿", (".ppt", ".pptx", ".key"), ("演示", "ppt", "slide")),
+    ("图片", (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".heic"), ("图片", "照片", "图像", "image")),
+    ("音视频", (".mp3", ".wav", ".flac", ".mp4", ".mov", ".mkv", ".avi"), ("音", "视频", "media")),
+    ("压缩包", (".zip", ".rar", ".7z", ".tar", ".gz"), ("压缩", "归档", "archive")),
+    ("代码", (".py", ".js", ".ts", ".java", ".c", ".cpp", ".go", ".rs", ".html", ".css"), ("代码", "code")),
+]
+_GENERIC_NAME = re.compile(
+    r"^(\d+|img_?\d+|dsc_?\d+|新建.*|final.*|备份.*|资料|文档|说明|untitled.*|copy.*)(\(\d+\))?$",
+    re.IGNORECASE,
+)
+_UNSAFE = re.compile(r'[<>:"/\\|?*\s]+')
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _category(name: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    ext = os.path.splitext(name or "")[1].lower()
+    for label, exts, keywords in _CATEGORIES:
+        if ext in exts:
+            return label, keywords
+    return None
+
+
+def _pick_folder(file_info: Dict[str, Any], allowed: List[str]) -> str:
+    if not allowed:
+        return "其他"
+    rel = str(file_info.get("relative_path") or file_info.get("name") or "")
+    found = _category(str(file_info.get("name") or rel))
+    if found:
+        for folder in allowed:
+            if any(k.lower() in folder.lower() for k in found[1]):
+                return folder
+    # No category match: spread deterministically so moves hit every folder.
+    return allowed[int(_digest(rel)[:8], 16) % len(allowed)]
+
+
+def _iter_file_nodes(node: Any):
+    if isinstance(node, dict):
+        if node.get("type") == "file":
+            yield node
+        for child in node.get("children") or []:
+            yield from _iter_file_nodes(child)
+
+
+def _describe(seed_text: str, fallback: str) -> str:
+    words = _UNSAFE.sub("", (seed_text or "").strip())[:12]
+    return words or f"{fallback}{_digest(seed_text or fallback)[:6]}"
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Return a sampler of delays in seconds for a latency spec (see module docstring)."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        ms = values[0] if values else 0.0
+        return lambda rng: ms / 1000.0
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1]) / 1000.0
+    raise ValueError(f"无法解析的延迟配置：{spec}")
+
+
+class MockResponder:
+    """Builds deterministic replies for the prompts used by `AIService`."""
+
+    def __init__(self):
+        token = "<<USER_REQUIREMENTS>>"
+        self._routes: List[Tuple[str, str]] = []
+        for kind, prompt in [
+            ("stage1", config.SYSTEM_PROMPT_STAGE1_FOLDERS),
+            ("stage2", config.SYSTEM_PROMPT_STAGE2_DESTINATION),
+            ("stage2_batch", config.SYSTEM_PROMPT_STAGE2_BATCH_DESTINATION),
+            ("detect_ambiguous", config.SYSTEM_PROMPT_RENAME_DETECT_AMBIGUOUS),
+            ("rename_prefix", config.SYSTEM_PROMPT_RENAME_SUGGEST_PREFIX),
+            ("rename_prefix_batch", config.SYSTEM_PROMPT_RENAME_SUGGEST_PREFIX_BATCH),
+            ("images_batch", config.SYSTEM_PROMPT_RENAME_DESCRIBE_IMAGES_BATCH),
+            ("legacy_plan", config.SYSTEM_PROMPT),
+        ]:
+            # The part before the requirements placeholder survives `_apply_user_requirements`.
+            head = prompt.split(token)[0].strip()
+            self._routes.append((kind, head))
+
+    def classify(self, system_prompt: str, user_parts: List[Dict[str, Any]]) -> str:
+        text = (system_prompt or "").strip()
+        for kind, head in self._routes:
+            if head and text.startswith(head):
+                return kind
+        if any(p.get("type") == "image_url" for p in user_parts):
+            return "image"
+        return "unknown"
+
+    @staticmethod
+    def _last_json(texts: List[str]) -> Dict[str, Any]:
+        for t in reversed(texts):
+            try:
+                obj = json.loads(t)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(obj, dict):
+                return obj
+        return {}
+
+    def reply(self, kind: str, texts: List[str], user_parts: List[Dict[str, Any]]) -> str:
+        payload = self._last_json(texts)
+        if kind == "stage1":
+            labels = {c[0] for c in (_category(n.get("name", "")) for n in _iter_file_nodes(payload)) if c}
+            folders = [label for label, _, _ in _CATEGORIES if label in labels] + ["其他"]
+            return json.dumps({"folders": folders}, ensure_ascii=False)
+        if kind == "stage2":
+            allowed = list(payload.get("allowed_folders") or [])
+            return json.dumps({"destination": _pick_folder(payload.get("file") or {}, allowed)}, ensure_ascii=False)
+        if kind == "stage2_batch":
+            allowed = list(payload.get("allowed_folders") or [])
+            assignments = [
+                {"relative_path": f.get("relative_path", ""), "destination": _pick_folder(f, allowed)}
+                for f in payload.get("files") or []
+                if isinstance(f, dict)
+            ]
+            return json.dumps({"assignments": assignments}, ensure_ascii=False)
+        if kind == "detect_ambiguous":
+            items = [
+                {"relative_path": n.get("relative_path", ""), "reason": "文件名缺少主题信息"}
+                for n in _iter_file_nodes(payload)
+                if _GENERIC_NAME.match(os.path.splitext(str(n.get("name") or ""))[0])
+            ]
+            return json.dumps({"ambiguous_files": items[:30]}, ensure_ascii=False)
+        if kind == "rename_prefix":
+            snippet = str(payload.get("content_snippet") or "")
+            name = str((payload.get("file") or {}).get("name") or "")
+            return json.dumps({"description": _describe(snippet or name, "文件")}, ensure_ascii=False)
+        if kind == "rename_prefix_batch":
+            items = [
+                {
+                    "relative_path": f.get("relative_path", ""),
+                    "description": _describe(str(f.get("content_snippet") or f.get("name") or ""), "文件"),
+                }
+                for f in payload.get("files") or []
+                if isinstance(f, dict)
+            ]
+            return json.dumps({"descriptions": items}, ensure_ascii=False)
+        images = [p["image_url"].get("url", "") for p in user_parts if p.get("type") == "image_url"]
+        if kind == "images_batch":
+            items = [{"index": n, "description": f"图片{_digest(u)[:6]}"} for n, u in enumerate(images, start=1)]
+            return json.dumps({"descriptions": items}, ensure_ascii=False)
+        if kind == "image":
+            return json.dumps({"description": f"图片{_digest(images[0] if images else '')[:6]}"}, ensure_ascii=False)
+        if kind == "legacy_plan":
+            nodes = list(_iter_file_nodes(payload))
+            folders = sorted({_category(n.get("name", ""))[0] if _category(n.get("name", "")) else "其他" for n in nodes})
+            lines = ["@echo off", 'cd /d "%~dp0"'] + [f'mkdir "{f}" 2>nul' for f in folders]
+            for n in nodes:
+                found = _category(n.get("name", ""))
+                src = str(n.get("relative_path") or "").replace("/", "\\")
+                lines.append(f'move "{src}" "{found[0] if found else "其他"}\\" >nul 2>nul')
+            return "\n".join(lines)
+        return json.dumps({"error": "unknown prompt"}, ensure_ascii=False)
+
+
+class MockChatServer:
+    """Threaded HTTP server implementing `/v1/chat/completions` (and `/v1/models`).
+
+    Failure injection: `error_rate` answers 500, `rate_limit_rate` answers 429
+    with Retry-After, and `concurrency_limit` answers 429 for requests beyond
+    that many in flight (like a provider's per-key limit). All randomness comes
+    from one RNG seeded with `seed`, so a run is reproducible for a fixed
+    request order.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        concurrency_limit: int = 0,
+        seed: int = 0,
+    ):
+        self._sample_latency = parse_latency(latency)
+        self.error_rate = max(0.0, float(error_rate))
+        self.rate_limit_rate = max(0.0, float(rate_limit_rate))
+        self.concurrency_limit = max(0, int(concurrency_limit))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._responder = MockResponder()
+        self.stats: Dict[str, Any] = {"requests": 0, "errors": 0, "rate_limited": 0, "by_prompt": {}}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "MockChatServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> "MockChatServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _draw(self) -> Tuple[float, float]:
+        with self._lock:
+            return self._sample_latency(self._rng), self._rng.random()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def handle_completion(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """Return (status, json_body, extra_headers) for one chat completion request."""
+        delay, roll = self._draw()
+        with self._lock:
+            self.stats["requests"] += 1
+            limited = roll < self.rate_limit_rate or (
+                self.concurrency_limit and self._in_flight >= self.concurrency_limit
+            )
+            if limited:
+                self.stats["rate_limited"] += 1
+            else:
+                self._in_flight += 1
+        if limited:
+            return 429, _error_body("rate_limit_exceeded", "Too many requests (mock)"), {"Retry-After": "1"}
+        try:
+            time.sleep(delay)
+            if roll < self.rate_limit_rate + self.error_rate:
+                self._count("errors")
+                return 500, _error_body("server_error", "Injected failure (mock)"), {}
+
+            system_prompt = ""
+            texts: List[str] = []
+            parts: List[Dict[str, Any]] = []
+            for message in body.get("messages") or []:
+                content = message.get("content")
+                if message.get("role") == "system":
+                    system_prompt = str(content or "")
+                elif isinstance(content, list):
+                    parts.extend(p for p in content if isinstance(p, dict))
+                    texts.extend(str(p.get("text") or "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+                else:
+                    texts.append(str(content or ""))
+            kind = self._responder.classify(system_prompt, parts)
+            self._count_prompt(kind)
+            answer = self._responder.reply(kind, texts, parts)
+            prompt_tokens = _estimate_tokens(system_prompt) + sum(_estimate_tokens(t) for t in texts) + 85 * sum(
+                1 for p in parts if p.get("type") == "image_url"
+            )
+            completion_tokens = _estimate_tokens(answer)
+            return 200, {
+                "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": str(body.get("model") or "mock"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }, {}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _count_prompt(self, kind: str) -> None:
+        with self._lock:
+            by_prompt = self.stats["by_prompt"]
+            by_prompt[kind] = by_prompt.get(kind, 0) + 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+                pass
+
+            def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+                else:
+                    self._send(404, _error_body("not_found", self.path))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, _error_body("not_found", self.path))
+                    return
+                try:
+                    body = json.loads(raw.decode("utf-8") or "{}")
+                except ValueError:
+                    self._send(400, _error_body("invalid_request_error", "请求体不是有效的 JSON"))
+                    return
+                status, payload, headers = server.handle_completion(body)
+                self._send(status, payload, headers)
+
+        return Handler
+
+
+def _error_body(code: str, message: str) -> Dict[str, Any]:
+    return {"error": {"message": message, "type": code, "code": code}}
+
+
+def _estimate_tokens(text: str) -> int:
+    # Rough: CJK ~1 token per char, other text ~4 chars per token.
+    text = text or ""
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="本地模拟 OpenAI 兼容接口（/v1/chat/completions），用于离线压测")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="fixed:0", help='延迟分布（毫秒），如 "uniform:50,300"')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--concurrency-limit", type=int, default=0, help="超过该并发数的请求返回 429（0 表示不限制）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = MockChatServer(
+        args.host,
+        args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        concurrency_limit=args.concurrency_limit,
+        seed=args.seed,
+    )
+    print(f"模拟接口已启动：{server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats, ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .metrics import reserve_prefix
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval.
+
+    cProfile only sees the thread it is enabled on, while the pipelines fan
+    out to helper threads; sampling `sys._current_frames()` covers all of
+    them. Results are kept as collapsed stacks ("thread;outer;...;inner" ->
+    count), the input format of flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = max(0.001, float(interval))
+        self.counts: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        # Collapsed-stack lines are "frames count": no spaces inside frames.
+        return f"{module}:{code.co_name}:{code.co_firstlineno}".replace(" ", "_")
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+            key = ";".join([names.get(ident, str(ident)).replace(" ", "_")] + stack[::-1])
+            self.counts[key] = self.counts.get(key, 0) + 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_run(name: str, out_dir: str, *, interval: float = 0.005) -> Iterator[Dict[str, str]]:
+    """Profile the block with cProfile (calling thread) and a stack sampler (all threads).
+
+    On exit writes `<ts>_<name>.prof` (pstats; e.g. `snakeviz`, `python -m pstats`)
+    and `<ts>_<name>.collapsed` (flamegraph input) to `out_dir`; a numeric
+    suffix keeps runs that end in the same second apart. The yielded
+    dict is filled with both paths once the block ends.
+    """
+    paths: Dict[str, str] = {}
+    profiler = cProfile.Profile()
+    sampler = StackSampler(interval)
+    sampler.start()
+    profiler.enable()
+    try:
+        yield paths
+    finally:
+        profiler.disable()
+        sampler.stop()
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        prefix = reserve_prefix(os.path.join(out_dir, f"{stamp}_{name}"), (".prof", ".collapsed"))
+        profiler.dump_stats(f"{prefix}.prof")
+        sampler.write_collapsed(f"{prefix}.collapsed")
+        paths.update(profile=f"{prefix}.prof", collapsed=f"{prefix}.collapsed")
@@ -0,0 +1,307 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+HISTORY_DIR = ".autosniffer_history"
+
+
+def _split(rel: str) -> List[str]:
+    parts = [p for p in str(rel or "").replace("\\", "/").split("/") if p and p != "."]
+    return parts
+
+
+def _join(parts: Iterable[str]) -> str:
+    return "/".join(parts)
+
+
+class VirtualTree:
+    """In-memory directory tree built from a `scan_directory` structure.
+
+    Paths are "/"-separated and relative to the scanned root ("" is the root).
+    Name comparisons follow the host filesystem (`os.path.normcase`), so
+    conflict detection matches what `os.path.exists` would report on disk.
+    """
+
+    def __init__(self):
+        # dir rel path -> {normcased name: (display name, "file" | "directory")}
+        self._dirs: Dict[str, Dict[str, Tuple[str, str]]] = {"": {}}
+
+    @classmethod
+    def from_structure(cls, structure: Dict[str, Any]) -> "VirtualTree":
+        tree = cls()
+
+        def walk(node: Dict[str, Any], parent: List[str]):
+            for child in node.get("children", []) or []:
+                if not isinstance(child, dict):
+                    continue
+                name = str(child.get("name") or "")
+                if not name:
+                    continue
+                path = parent + [name]
+                if child.get("type") == "directory":
+                    tree.makedirs(_join(path))
+                    walk(child, path)
+                elif child.get("type") == "file":
+                    tree._add(_join(parent), name, "file")
+
+        if isinstance(structure, dict):
+            walk(structure, [])
+        return tree
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return os.path.normcase(name)
+
+    def _add(self, dir_rel: str, name: str, kind: str) -> None:
+        self._dirs.setdefault(dir_rel, {})[self._key(name)] = (name, kind)
+
+    def _lookup(self, rel: str) -> Optional[Tuple[str, str]]:
+        parts = _split(rel)
+        if not parts:
+            return ("", "directory")
+        parent = self._resolve_dir(parts[:-1])
+        if parent is None:
+            return None
+        return self._dirs.get(parent, {}).get(self._key(parts[-1]))
+
+    def _resolve_dir(self, parts: List[str]) -> Optional[str]:
+        """Map a possibly differently-cased path onto the stored directory key."""
+        current = ""
+        for part in parts:
+            entry = self._dirs.get(current, {}).get(self._key(part))
+            if not entry or entry[1] != "directory":
+                return None
+            current = _join(_split(current) + [entry[0]])
+        return current
+
+    def exists(self, rel: str) -> bool:
+        return self._lookup(rel) is not None
+
+    def isdir(self, rel: str) -> bool:
+        entry = self._lookup(rel)
+        return bool(entry and entry[1] == "directory")
+
+    def listdir(self, rel: str) -> List[str]:
+        key = self._resolve_dir(_split(rel))
+        if key is None:
+            raise FileNotFoundError(rel)
+        return [name for name, _ in self._dirs.get(key, {}).values()]
+
+    def makedirs(self, rel: str) -> bool:
+        """Create `rel` and missing parents; return True if the leaf was newly created."""
+        current = ""
+        created = False
+        for part in _split(rel):
+            entry = self._dirs.get(current, {}).get(self._key(part))
+            if entry is None:
+                self._add(current, part, "directory")
+                entry = (part, "directory")
+                created = True
+            elif entry[1] != "directory":
+                raise FileExistsError(rel)
+            else:
+                created = False
+            current = _join(_split(current) + [entry[0]])
+            self._dirs.setdefault(current, {})
+        return created
+
+    def move_file(self, src_rel: str, dst_rel: str) -> None:
+        src_parts = _split(src_rel)
+        dst_parts = _split(dst_rel)
+        src_dir = self._resolve_dir(src_parts[:-1])
+        dst_dir = self._resolve_dir(dst_parts[:-1])
+        if src_dir is None or self._key(src_parts[-1]) not in self._dirs.get(src_dir, {}):
+            raise FileNotFoundError(src_rel)
+        if dst_dir is None:
+            raise FileNotFoundError(dst_rel)
+        del self._dirs[src_dir][self._key(src_parts[-1])]
+        self._add(dst_dir, dst_parts[-1], "file")
+
+    def rmdir(self, rel: str) -> None:
+        parts = _split(rel)
+        key = self._resolve_dir(parts)
+        if key is None:
+            raise FileNotFoundError(rel)
+        if self._dirs.get(key):
+            raise OSError(f"目录非空: {rel}")
+        del self._dirs[key]
+        parent = _join(_split(key)[:-1])
+        self._dirs.get(parent, {}).pop(self._key(_split(key)[-1]), None)
+
+    def directories(self) -> List[str]:
+        return [d for d in self._dirs if d]
+
+
+def unique_path(tree: VirtualTree, rel: str, suffix: str) -> str:
+    """Virtual counterpart of `OrganizerWorkflow._unique_path`."""
+    parts = _split(rel)
+    stem, ext = os.path.splitext(parts[-1])
+    parent = parts[:-1]
+    candidate = _join(parent + [f"{stem}{suffix}{ext}"])
+    i = 1
+    while tree.exists(candidate):
+        candidate = _join(parent + [f"{stem}{suffix}_{i}{ext}"])
+        i += 1
+    return candidate
+
+
+def simulate_moves(
+    tree: VirtualTree,
+    file_items: List[Dict[str, Any]],
+    destinations: List[str],
+    *,
+    on_conflict: str = "rename",
+    vacated_dirs: Optional[Set[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Apply moves to the virtual tree with the same rules as `move_files_python`.
+
+    Returns records in the same shape: {src_rel, intended_dst_folder,
+    intended_dst_rel, final_dst_rel, status, error, conflict}.
+    """
+    results: List[Dict[str, Any]] = []
+    for item, dst_folder in zip(file_items, destinations):
+        src_rel = _join(_split(str(item.get("relative_path") or "")))
+        name = str(item.get("name") or (_split(src_rel) or [""])[-1])
+        safe_folder = (dst_folder or "").strip().strip("\\/")
+        if not safe_folder:
+            safe_folder = "其他"
+        tree.makedirs(safe_folder)
+        intended = _join(_split(safe_folder) + [name])
+
+        record: Dict[str, Any] = {
+            "src_rel": src_rel,
+            "intended_dst_folder": safe_folder,
+            "intended_dst_rel": intended,
+            "final_dst_rel": "",
+            "status": "pending",
+            "error": "",
+            "conflict": False,
+        }
+        if not tree.exists(src_rel):
+            record["status"] = "skipped"
+            record["error"] = "源文件不存在（可能已被移动/删除）"
+            results.append(record)
+            continue
+
+        final = intended
+        if tree.exists(final):
+            record["conflict"] = True
+            if on_conflict == "rename":
+                final = unique_path(tree, final, "__conflict")
+            else:
+                record["status"] = "failed"
+                record["error"] = "目标已存在"
+                results.append(record)
+                continue
+
+        tree.move_file(src_rel, final)
+        record["status"] = "moved"
+        record["final_dst_rel"] = final
+        if vacated_dirs is not None:
+            vacated_dirs.add(_join(_split(src_rel)[:-1]))
+        results.append(record)
+    return results
+
+
+def simulate_cleanup(
+    tree: VirtualTree,
+    *,
+    exclude: Optional[List[str]] = None,
+    candidates: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """Remove empty directories bottom-up, mirroring `cleanup_empty_folders`.
+
+    With `candidates` only those directories and their ancestors are checked.
+    """
+    excluded = {HISTORY_DIR}
+    for x in exclude or []:
+        v = str(x or "").strip().strip("\\/")
+        if v:
+            excluded.add(v.replace("\\", "/"))
+
+    if candidates is None:
+        dirs = tree.directories()
+    else:
+        found: Set[str] = set()
+        for rel in candidates:
+            parts = _split(rel)
+            while parts:
+                found.add(_join(parts))
+                parts = parts[:-1]
+        dirs = list(found)
+
+    removed: List[str] = []
+    # Deepest first, like os.walk(topdown=False)
+    for rel in sorted(dirs, key=lambda d: d.count("/"), reverse=True):
+        top_name = rel.split("/", 1)[0]
+        if top_name in excluded or rel in excluded:
+            continue
+        if tree.isdir(rel) and not tree.listdir(rel):
+            tree.rmdir(rel)
+            removed.append(rel)
+    removed.sort(key=lambda s: (s.count("/"), len(s)))
+    return removed
+
+
+def simulate_stage2(
+    structure: Dict[str, Any],
+    allowed_folders: List[str],
+    file_items: List[Dict[str, Any]],
+    destinations: List[str],
+    *,
+    on_conflict: str = "rename",
+) -> Dict[str, Any]:
+    """Dry-run stage 2 (create folders, move, clean up) without touching the disk."""
+    if len(file_items or []) != len(destinations or []):
+        raise ValueError("file_items 与 destinations 长度不一致")
+    tree = VirtualTree.from_structure(structure)
+
+    created: List[str] = []
+    for f in allowed_folders or []:
+        name = (f or "").strip().strip("\\/")
+        if name and not tree.exists(name):
+            tree.makedirs(name)
+            created.append(name)
+
+    # Same targeted cleanup as `run_stage2`: vacated directories plus the target folders.
+    vacated: Set[str] = set(f.strip().strip("\\/") for f in allowed_folders or [] if (f or "").strip())
+    moves = simulate_moves(tree, file_items, destinations, on_conflict=on_conflict, vacated_dirs=vacated)
+    removed = simulate_cleanup(tree, candidates=vacated)
+    return {
+        "created_folders": created,
+        "moves": moves,
+        "removed_empty_folders": removed,
+        "summary": {
+            "files": len(moves),
+            "moved": sum(1 for m in moves if m["status"] == "moved"),
+            "conflicts": sum(1 for m in moves if m["conflict"]),
+            "skipped": sum(1 for m in moves if m["status"] == "skipped"),
+            "failed": sum(1 for m in moves if m["status"] == "failed"),
+            "created_folders": len(created),
+            "removed_empty_folders": len(removed),
+        },
+    }
+
+
+def format_diff(diff: Dict[str, Any], *, limit: int = 200) -> str:
+    """Render a dry-run result as a short, diff-like text."""
+    s = diff.get("summary") or {}
+    lines = [
+        f"# 将移动 {s.get('moved', 0)} 个文件，冲突改名 {s.get('conflicts', 0)}，"
+        f"跳过 {s.get('skipped', 0)}，失败 {s.get('failed', 0)}",
+    ]
+    for folder in diff.get("created_folders") or []:
+        lines.append(f"+ {folder}/")
+    shown = 0
+    for m in diff.get("moves") or []:
+        if shown >= limit:
+            lines.append(f"... 其余 {len(diff['moves']) - shown} 项省略")
+            break
+        if m["status"] == "moved":
+            mark = "  # 冲突改名" if m["conflict"] else ""
+            lines.append(f"  {m['src_rel']}  ->  {m['final_dst_rel']}{mark}")
+        else:
+            lines.append(f"! {m['src_rel']}: {m['error']}")
+        shown += 1
+    for folder in diff.get("removed_empty_folders") or []:
+        lines.append(f"- {folder}/")
+    return "\n".join(lines)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+CACHE_DIR = os.path.join(".autosniffer_history", "cache")
+CACHE_FILE = "snippets.json"
+# Bump when the snippet extraction changes so stale snippets are not reused.
+CACHE_VERSION = 1
+
+
+class SnippetCache:
+    """Disk-backed LRU cache of rename content snippets for one root folder.
+
+    Entries are keyed by (relative path, size, mtime), so an edited file misses
+    automatically. The cache is loaded once, kept in memory, evicted by total
+    text size (least recently used first) and written back by `save`.
+    """
+
+    def __init__(self, root_path: str, *, max_bytes: int):
+        self.path = os.path.join(root_path, CACHE_DIR, CACHE_FILE)
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total = 0
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def fingerprint(rel_path: str, abs_path: str) -> Optional[str]:
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            return None
+        rel = str(rel_path or "").replace("\\", "/").strip("/")
+        raw = f"{CACHE_VERSION}|{rel}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        items = data.get("entries") or []
+        # Stored oldest-used first, so OrderedDict order is the LRU order.
+        for entry in items:
+            if not isinstance(entry, dict) or not isinstance(entry.get("text"), str):
+                continue
+            key = str(entry.get("key") or "")
+            if key:
+                self._entries[key] = {"text": entry["text"], "used": entry.get("used", 0)}
+                self._total += self._size(entry["text"])
+        self._evict()
+
+    @staticmethod
+    def _size(text: str) -> int:
+        return len(text.encode("utf-8"))
+
+    def _evict(self) -> None:
+        while self._entries and self._total > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self._total -= self._size(old["text"])
+            self._dirty = True
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if not key or self.max_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["used"] = int(time.time())
+            self._dirty = True
+            self.hits += 1
+            return entry["text"]
+
+    def put(self, key: Optional[str], text: str) -> None:
+        if not key or self.max_bytes <= 0 or not isinstance(text, str):
+            return
+        size = self._size(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= self._size(old["text"])
+            self._entries[key] = {"text": text, "used": int(time.time())}
+            self._total += size
+            self._dirty = True
+            self._evict()
+
+    def save(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": CACHE_VERSION,
+                "entries": [{"key": k, **v} for k, v in self._entries.items()],
+            }
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            # The cache is only an optimization; a read-only folder just means no reuse.
+            pass
@@ -0,0 +1,87 @@
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+def _rel(node: Dict[str, Any]) -> str:
+    rel = str(node.get("relative_path") or "").replace("\\", "/")
+    return "" if rel == "." else rel
+
+
+class StructureIndex:
+    """Read-only view over a `scan_directory` structure for lazy previews.
+
+    Directories are indexed by relative path ("" is the root) so a tree view
+    can page through one directory's children at a time instead of rendering
+    the whole structure. Building the index only walks directory nodes.
+    """
+
+    def __init__(self, structure: Dict[str, Any]):
+        self.root = structure if isinstance(structure, dict) else {}
+        self._dirs: Dict[str, Dict[str, Any]] = {}
+        self._sorted: Dict[str, List[Dict[str, Any]]] = {}
+        self.file_count = 0
+        self.dir_count = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            self._dirs[_rel(node)] = node
+            for child in node.get("children") or []:
+                if not isinstance(child, dict):
+                    continue
+                if child.get("type") == "directory":
+                    self.dir_count += 1
+                    stack.append(child)
+                else:
+                    self.file_count += 1
+
+    @staticmethod
+    def _entry(node: Dict[str, Any]) -> Dict[str, Any]:
+        is_dir = node.get("type") == "directory"
+        return {
+            "name": str(node.get("name") or ""),
+            "type": "directory" if is_dir else "file",
+            "relative_path": _rel(node),
+            "child_count": len(node.get("children") or []) if is_dir else 0,
+        }
+
+    def children(self, dir_rel: str = "", *, offset: int = 0, limit: int = 200) -> Tuple[List[Dict[str, Any]], int]:
+        """Return (entries[offset:offset+limit], total) for one directory; directories first."""
+        key = str(dir_rel or "").replace("\\", "/").strip("/")
+        kids = self._sorted.get(key)
+        if kids is None:
+            node = self._dirs.get(key)
+            if node is None:
+                return [], 0
+            kids = [c for c in node.get("children") or [] if isinstance(c, dict)]
+            kids.sort(key=lambda c: (c.get("type") != "directory", str(c.get("name") or "").lower()))
+            # Sorted once per directory, then paged from the cache.
+            self._sorted[key] = kids
+        page = kids[max(0, offset): max(0, offset) + max(0, limit)]
+        return [self._entry(c) for c in page], len(kids)
+
+    def entry(self, dir_rel: str) -> Dict[str, Any]:
+        node = self._dirs.get(str(dir_rel or "").replace("\\", "/").strip("/"))
+        return self._entry(node) if node is not None else {}
+
+    def _walk(self) -> Iterator[Dict[str, Any]]:
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for child in node.get("children") or []:
+                if not isinstance(child, dict):
+                    continue
+                yield child
+                if child.get("type") == "directory":
+                    stack.append(child)
+
+    def search(self, query: str, *, limit: int = 200) -> Tuple[List[Dict[str, Any]], bool]:
+        """Case-insensitive substring search on names; returns (matches, truncated)."""
+        q = str(query or "").strip().lower()
+        if not q:
+            return [], False
+        out: List[Dict[str, Any]] = []
+        for node in self._walk():
+            if q in str(node.get("name") or "").lower():
+                if len(out) >= limit:
+                    return out, True
+                out.append(self._entry(node))
+        return out, False
@@ -1,21 +1,52 @@
 import json
 import os
+import re
 import shutil
 import base64
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 from io import BytesIO
 
 from PIL import Image, ImageOps
 
-from extract import extract_text_from_file
-
 from . import file_ops
+from . import metrics
 from .ai_service import AIService
 from . import cmd_executor
 from . import config
+from . import simulate
+from .extract_service import ExtractionService
+from .lazy_extract import extract_text_lazy
+from .snippet_cache import SnippetCache
+from .image_cache import ImagePayloadCache, NearDuplicateIndex, content_key, dhash
+from .journal import JournalWriter, iter_journal_lines, list_journals, read_journal, update_index_entry
+
+
+# Camera/phone default names (IMG_1234, DSC01234, PXL_20240501_...) carry no meaning of their own.
+_GENERIC_IMAGE_NAME = re.compile(
+    r"^(img|dsc|dscn|dscf|pxl|mvimg|dji|gopr|sam|wp|photo|image|mmexport|wx_camera|p)[-_ ]?\d[\d_-]*$"
+    r"|^\d[\d_ -]*$",
+    re.IGNORECASE,
+)
+_SCREENSHOT_NAME = re.compile(r"screenshot|screen[ _-]?shot|屏幕截图|截屏|截图|snipaste", re.IGNORECASE)
+# Common screen sizes (either orientation) for PNGs without camera EXIF.
+_SCREEN_SIZES = {
+    (1280, 720), (1366, 768), (1440, 900), (1536, 864), (1600, 900), (1920, 1080),
+    (1920, 1200), (2560, 1440), (2560, 1600), (2880, 1800), (3840, 2160),
+    (750, 1334), (828, 1792), (1080, 1920), (1080, 2340), (1080, 2400),
+    (1170, 2532), (1179, 2556), (1242, 2688), (1284, 2778), (1290, 2796), (1440, 3200),
+}
+_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_DATETIME = 0x0132
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
 
 
 @dataclass
@@ -24,6 +55,7 @@ class ExecutionResult:
     stdout: str
     stderr: str
     executed_file: str
+    moves: List[Dict[str, Any]] = field(default_factory=list)
 
 
 class OrganizerWorkflow:
@@ -50,11 +82,15 @@ class OrganizerWorkflow:
     @staticmethod
     def scan_directory(root_path: str) -> Dict[str, Any]:
         root_path = OrganizerWorkflow.validate_root_path(root_path)
-        return file_ops.get_directory_structure(root_path)
+        with metrics.span("scan"):
+            return file_ops.get_directory_structure(root_path)
 
     @staticmethod
     def format_structure_json(structure: Dict[str, Any]) -> str:
-        return json.dumps(structure, indent=4, ensure_ascii=False)
+        with metrics.span("json_encode") as attrs:
+            text = json.dumps(structure, indent=4, ensure_ascii=False)
+            attrs["chars"] = len(text)
+            return text
 
     def plan_with_ai(self, directory_json: str) -> str:
         if not directory_json or not directory_json.strip():
@@ -108,11 +144,16 @@ class OrganizerWorkflow:
                 )
                 return
             for child in node.get("children", []) or []:
+                # Never organize our own journals (a live .jsonl is written during stage 2).
+                if child.get("type") == "directory" and child.get("name") == ".autosniffer_history":
+                    continue
                 walk(child)
 
-        walk(structure)
-        # stable order
-        files.sort(key=lambda x: str(x.get("relative_path") or ""))
+        with metrics.span("flatten") as attrs:
+            walk(structure)
+            # stable order
+            files.sort(key=lambda x: str(x.get("relative_path") or ""))
+            attrs["files"] = len(files)
         return files
 
     def stage2_choose_destination(
@@ -227,7 +268,7 @@ class OrganizerWorkflow:
         timeout_seconds: int = 300,
         model: Optional[str] = None,
     ) -> Tuple[List[Dict[str, Any]], List[ExecutionResult]]:
-        """Stage2 batched: one AI call per N files, then execute ONE bat per batch containing N move commands."""
+        """Stage2 batched: one AI call per N files, then execute ONE script per batch containing N move commands."""
         root_path = OrganizerWorkflow.validate_root_path(root_path)
         all_files = self.flatten_files(structure)
         decisions: List[Dict[str, Any]] = []
@@ -262,18 +303,29 @@ class OrganizerWorkflow:
     def _now_id() -> str:
         return datetime.now().strftime("%Y%m%d_%H%M%S")
 
+    @classmethod
+    def _reserve_run_id(cls, history: str, ext: str) -> str:
+        """Claim a fresh run id by creating `<run_id><ext>` exclusively.
+
+        Ids have one-second resolution, so runs started within the same second
+        get `_2`, `_3`, ... appended instead of overwriting each other.
+        """
+        base = cls._now_id()
+        n = 1
+        while True:
+            run_id = base if n == 1 else f"{base}_{n}"
+            n += 1
+            if any(os.path.exists(os.path.join(history, run_id + e)) for e in (".json", ".jsonl")):
+                continue
+            try:
+                open(os.path.join(history, run_id + ext), "x", encoding="utf-8").close()
+            except FileExistsError:
+                continue
+            return run_id
+
     @staticmethod
     def _unique_path(path: str, suffix: str) -> str:
-        p = Path(path)
-        parent = p.parent
-        stem = p.stem
-        ext = p.suffix
-        candidate = parent / f"{stem}{suffix}{ext}"
-        i = 1
-        while candidate.exists():
-            candidate = parent / f"{stem}{suffix}_{i}{ext}"
-            i += 1
-        return str(candidate)
+        return file_ops.unique_path(path, suffix)
 
     def create_folders_python(self, root_path: str, folders: List[str]) -> List[str]:
         """Create top-level folders and return the list that were newly created (relative names)."""
@@ -283,12 +335,13 @@ class OrganizerWorkflow:
             name = (f or "").strip().strip("\\/")
             if not name:
                 continue
-            abs_dir = os.path.join(root_path, name)
+            abs_dir = self._abs_path(root_path, name)
             if not os.path.exists(abs_dir):
                 os.makedirs(abs_dir, exist_ok=True)
                 created.append(name)
         return created
 
+    @metrics.timed("move")
     def move_files_python(
         self,
         root_path: str,
@@ -296,9 +349,13 @@ class OrganizerWorkflow:
         destinations: List[str],
         *,
         on_conflict: str = "rename",
+        vacated_dirs: Optional[Set[str]] = None,
     ) -> List[Dict[str, Any]]:
         """Move a batch of files with conflict handling.
 
+        If `vacated_dirs` is given, the relative directory of every moved source
+        is added to it, so cleanup can later check only those directories.
+
         Returns per-file records:
           {src_rel, intended_dst_folder, intended_dst_rel, final_dst_rel, status, error, conflict}
         """
@@ -308,21 +365,21 @@ class OrganizerWorkflow:
 
         results: List[Dict[str, Any]] = []
         for item, dst_folder in zip(file_items, destinations):
-            src_rel = str(item.get("relative_path") or "").replace("/", "\\")
+            src_rel = self._norm_rel(item.get("relative_path"))
             name = str(item.get("name") or os.path.basename(src_rel) or "")
-            safe_folder = (dst_folder or "").strip().strip("\\/")
+            safe_folder = self._norm_rel(dst_folder).strip().strip("/")
             if not safe_folder:
                 safe_folder = "其他"
 
-            src_abs = os.path.join(root_path, src_rel)
-            dst_dir_abs = os.path.join(root_path, safe_folder)
+            src_abs = self._abs_path(root_path, src_rel)
+            dst_dir_abs = self._abs_path(root_path, safe_folder)
             os.makedirs(dst_dir_abs, exist_ok=True)
             intended_dst_abs = os.path.join(dst_dir_abs, name)
 
             record: Dict[str, Any] = {
-                "src_rel": src_rel.replace("\\", "/"),
+                "src_rel": src_rel,
                 "intended_dst_folder": safe_folder,
-                "intended_dst_rel": os.path.join(safe_folder, name).replace("\\", "/"),
+                "intended_dst_rel": f"{safe_folder}/{name}",
                 "final_dst_rel": "",
                 "status": "pending",
                 "error": "",
@@ -350,6 +407,8 @@ class OrganizerWorkflow:
                 shutil.move(src_abs, final_dst_abs)
                 record["status"] = "moved"
                 record["final_dst_rel"] = os.path.relpath(final_dst_abs, root_path).replace("\\", "/")
+                if vacated_dirs is not None:
+                    vacated_dirs.add(os.path.dirname(record["src_rel"]))
             except Exception as e:
                 record["status"] = "failed"
                 record["error"] = str(e)
@@ -357,10 +416,257 @@ class OrganizerWorkflow:
 
         return results
 
+    # --- Stage 2 runner (journaled, resumable) ---
+
+    @staticmethod
+    def _norm_rel(rel: Any) -> str:
+        return str(rel or "").replace("\\", "/")
+
+    def load_resume_state(self, root_path: str) -> Optional[Dict[str, Any]]:
+        """Return the checkpoint of the newest run if it was interrupted, else None.
+
+        State: {journal_path, run_id, allowed_folders, created_folders,
+                moved: {src_rel: final_dst_rel}, decisions: {relative_path: destination}}
+        """
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        history = self._history_dir(root_path)
+        entries = list_journals(history)
+        if not entries:
+            return None
+        last = entries[-1]
+        latest = Path(history) / str(last.get("file") or "")
+        if last.get("complete") or last.get("undone") or latest.suffix != ".jsonl" or not latest.is_file():
+            return None
+
+        state: Dict[str, Any] = {
+            "journal_path": str(latest),
+            "run_id": latest.stem,
+            "allowed_folders": [],
+            "created_folders": [],
+            "moved": {},
+            "decisions": {},
+        }
+        for obj in iter_journal_lines(str(latest)):
+            t = obj.get("type")
+            if t == "header":
+                if obj.get("kind", "organize") != "organize":
+                    return None
+                state["allowed_folders"] = list(obj.get("allowed_folders") or [])
+                state["created_folders"] = list(obj.get("created_folders") or [])
+            elif t == "decisions":
+                for it in obj.get("items") or []:
+                    if isinstance(it, dict) and it.get("relative_path"):
+                        state["decisions"][self._norm_rel(it["relative_path"])] = str(it.get("destination") or "")
+            elif t == "move":
+                if obj.get("status") in ("moved", "skipped"):
+                    state["moved"][self._norm_rel(obj.get("src_rel"))] = self._norm_rel(obj.get("final_dst_rel"))
+            elif t == "end":
+                return None
+        return state
+
+    def run_stage2(
+        self,
+        root_path: str,
+        file_items: List[Dict[str, Any]],
+        allowed_folders: List[str],
+        *,
+        batch_size: int = 5,
+        model: Optional[str] = None,
+        user_requirements: Optional[str] = None,
+        created_folders: Optional[List[str]] = None,
+        resume_state: Optional[Dict[str, Any]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> Dict[str, Any]:
+        """Classify and move files batch by batch, checkpointing every batch in the journal.
+
+        With `resume_state` (from `load_resume_state`) the interrupted journal is
+        appended to: files it already moved are skipped and its cached AI
+        decisions are reused, so only unclassified files go to the model.
+
+        `on_progress(stage, done, total)` is called with stage in
+        {"classify", "move", "batch_done"}.
+
+        Returns: {journal_path, stopped, total, already_done, reused_decisions,
+                  moved, failed, deleted_empty_folders}
+        `journal_path` is "" when the run left nothing to resume or undo.
+        """
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        stop = should_stop or (lambda: False)
+        progress = on_progress or (lambda stage, done, total: None)
+        batch_size = max(1, int(batch_size or 1))
+        fallback = "其他" if "其他" in allowed_folders else allowed_folders[-1]
+
+        moved_src: Set[str] = set()
+        moved_dst: Set[str] = set()
+        cached: Dict[str, str] = {}
+        # Cleanup only looks at directories this run emptied plus the target folders.
+        vacated: Set[str] = set(allowed_folders)
+        if resume_state:
+            moved = resume_state.get("moved") or {}
+            moved_src = set(moved.keys())
+            vacated.update(os.path.dirname(k) for k in moved_src)
+            moved_dst = {v for v in moved.values() if v}
+            cached = dict(resume_state.get("decisions") or {})
+            journal = JournalWriter(str(resume_state["journal_path"]), append=True)
+            journal.append_event("resume", resumed_at=datetime.now().isoformat(timespec="seconds"))
+        else:
+            journal = self.open_journal(
+                root_path,
+                created_folders=created_folders,
+                allowed_folders=allowed_folders,
+            )
+
+        # After a rescan, already-moved files show up at their destination; skip both sides.
+        pending = [
+            it
+            for it in file_items
+            if self._norm_rel(it.get("relative_path")) not in moved_src
+            and self._norm_rel(it.get("relative_path")) not in moved_dst
+        ]
+        summary: Dict[str, Any] = {
+            "journal_path": journal.path,
+            "stopped": False,
+            "total": len(pending),
+            "already_done": len(file_items) - len(pending),
+            "reused_decisions": 0,
+            "moved": 0,
+            "failed": 0,
+            "deleted_empty_folders": [],
+        }
+        total = len(pending)
+        done = 0
+        try:
+            for batch in self.chunk_list(pending, batch_size):
+                if stop():
+                    summary["stopped"] = True
+                    return summary
+
+                decided: Dict[str, str] = {}
+                need_ai: List[Dict[str, Any]] = []
+                for it in batch:
+                    rel = self._norm_rel(it.get("relative_path"))
+                    if rel in cached:
+                        decided[rel] = cached.pop(rel)
+                        summary["reused_decisions"] += 1
+                    else:
+                        need_ai.append(it)
+
+                if need_ai:
+                    progress("classify", done, total)
+                    ai_destinations = self.stage2_choose_destinations_batch(
+                        need_ai,
+                        allowed_folders,
+                        model=model,
+                        user_requirements=user_requirements,
+                    )
+                    checkpoint = []
+                    for it, dst in zip(need_ai, ai_destinations):
+                        rel = self._norm_rel(it.get("relative_path"))
+                        decided[rel] = dst
+                        checkpoint.append({"relative_path": rel, "destination": dst})
+                    journal.append_decisions(checkpoint)
+
+                if stop():
+                    summary["stopped"] = True
+                    return summary
+
+                destinations: List[str] = []
+                for it in batch:
+                    dst = decided.get(self._norm_rel(it.get("relative_path")), "")
+                    destinations.append(dst if dst in allowed_folders else fallback)
+
+                progress("move", done, total)
+                records = self.move_files_python(
+                    root_path,
+                    batch,
+                    destinations,
+                    on_conflict="rename",
+                    vacated_dirs=vacated,
+                )
+                journal.append_moves(records)
+                summary["moved"] += sum(1 for r in records if r.get("status") == "moved")
+                summary["failed"] += sum(1 for r in records if r.get("status") == "failed")
+
+                done = min(total, done + len(batch))
+                progress("batch_done", done, total)
+
+            deleted = self.cleanup_empty_folders(root_path, candidates=vacated)
+            summary["deleted_empty_folders"] = deleted
+            if journal.moved:
+                summary["journal_path"] = journal.finalize(deleted_empty_folders=deleted)
+            else:
+                # Nothing was moved, so there is nothing to undo: leave no history entry.
+                journal.discard()
+                summary["journal_path"] = ""
+            return summary
+        finally:
+            if not journal.closed and not journal.moved and not journal.decisions:
+                # Stopped or failed before the first checkpoint: nothing to resume or undo.
+                journal.discard()
+                summary["journal_path"] = ""
+            else:
+                journal.close()
+
+    # --- Dry run (virtual filesystem, no disk changes) ---
+
+    @staticmethod
+    def simulate_stage2(
+        structure: Dict[str, Any],
+        allowed_folders: List[str],
+        file_items: List[Dict[str, Any]],
+        destinations: List[str],
+        *,
+        on_conflict: str = "rename",
+    ) -> Dict[str, Any]:
+        """Apply planned folders + moves + cleanup to an in-memory copy of the scan.
+
+        Returns: {created_folders, moves, removed_empty_folders, summary}; move
+        records have the same shape as `move_files_python` results.
+        """
+        return simulate.simulate_stage2(structure, allowed_folders, file_items, destinations, on_conflict=on_conflict)
+
+    def dry_run_stage2(
+        self,
+        structure: Dict[str, Any],
+        allowed_folders: List[str],
+        *,
+        batch_size: int = 5,
+        model: Optional[str] = None,
+        user_requirements: Optional[str] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Classify with AI like `run_stage2`, then simulate instead of moving.
+
+        Returns the simulation result (plus `diff_text`), or None if stopped.
+        """
+        stop = should_stop or (lambda: False)
+        progress = on_progress or (lambda stage, done, total: None)
+        file_items = self.flatten_files(structure)
+        total = len(file_items)
+        destinations: List[str] = []
+        for batch in self.chunk_list(file_items, max(1, int(batch_size or 1))):
+            if stop():
+                return None
+            progress("classify", len(destinations), total)
+            destinations.extend(
+                self.stage2_choose_destinations_batch(
+                    batch,
+                    allowed_folders,
+                    model=model,
+                    user_requirements=user_requirements,
+                )
+            )
+            progress("batch_done", len(destinations), total)
+        result = self.simulate_stage2(structure, allowed_folders, file_items, destinations)
+        result["diff_text"] = simulate.format_diff(result)
+        return result
+
     def write_journal(self, root_path: str, journal: Dict[str, Any]) -> str:
         root_path = OrganizerWorkflow.validate_root_path(root_path)
         history = self._history_dir(root_path)
-        run_id = str(journal.get("id") or self._now_id())
+        run_id = str(journal.get("id") or self._reserve_run_id(history, ".json"))
         journal["id"] = run_id
         journal.setdefault("version", 1)
         journal.setdefault("created_at", datetime.now().isoformat(timespec="seconds"))
@@ -368,12 +674,53 @@ class OrganizerWorkflow:
         path = os.path.join(history, f"{run_id}.json")
         with open(path, "w", encoding="utf-8") as f:
             json.dump(journal, f, ensure_ascii=False, indent=2)
+        update_index_entry(
+            history,
+            run_id,
+            file=os.path.basename(path),
+            kind=journal.get("kind", "organize"),
+            created_at=journal["created_at"],
+            complete=True,
+            undone=False,
+        )
         return path
 
-    def cleanup_empty_folders(self, root_path: str, *, exclude: Optional[List[str]] = None) -> List[str]:
+    def open_journal(
+        self,
+        root_path: str,
+        *,
+        run_id: Optional[str] = None,
+        created_folders: Optional[List[str]] = None,
+        allowed_folders: Optional[List[str]] = None,
+        kind: str = "organize",
+    ) -> JournalWriter:
+        """Start an append-only journal for a run; records are fsynced per batch."""
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        history = self._history_dir(root_path)
+        run_id = str(run_id or self._reserve_run_id(history, ".jsonl"))
+        header = {
+            "id": run_id,
+            "kind": kind,
+            "root_path": root_path,
+            "created_folders": list(created_folders or []),
+            "allowed_folders": list(allowed_folders or []),
+        }
+        return JournalWriter(os.path.join(history, f"{run_id}.jsonl"), header)
+
+    @metrics.timed("cleanup")
+    def cleanup_empty_folders(
+        self,
+        root_path: str,
+        *,
+        exclude: Optional[List[str]] = None,
+        candidates: Optional[Iterable[str]] = None,
+    ) -> List[str]:
         """Delete empty folders under root_path and return removed folder relative paths.
 
         Notes:
+        - With `candidates` (e.g. directories vacated by the move engine), only those
+          directories and their ancestors are checked, so the cost is proportional to
+          the change. Without it the whole tree is walked.
         - Traverses bottom-up so nested empty folders are removed safely.
         - Always excludes `.autosniffer_history`.
         """
@@ -385,6 +732,30 @@ class OrganizerWorkflow:
                 excluded.add(v)
 
         removed: List[str] = []
+
+        if candidates is not None:
+            dirs: Set[str] = set()
+            for rel in candidates:
+                parts = [p for p in str(rel or "").replace("\\", "/").split("/") if p and p != "."]
+                while parts:
+                    dirs.add("/".join(parts))
+                    parts = parts[:-1]
+            # Deepest first so a directory emptied by removing its child is removed too.
+            for rel_norm in sorted(dirs, key=lambda d: d.count("/"), reverse=True):
+                top_name = rel_norm.split("/", 1)[0]
+                if top_name in excluded or rel_norm in excluded:
+                    continue
+                abs_dir = self._abs_path(root_path, rel_norm)
+                try:
+                    if os.path.isdir(abs_dir) and not os.listdir(abs_dir):
+                        os.rmdir(abs_dir)
+                        removed.append(rel_norm)
+                except Exception:
+                    # best-effort cleanup
+                    pass
+            removed.sort(key=lambda s: (s.count("/"), len(s)))
+            return removed
+
         history_abs = os.path.join(root_path, ".autosniffer_history")
 
         for dirpath, dirnames, filenames in os.walk(root_path, topdown=False):
@@ -458,40 +829,39 @@ class OrganizerWorkflow:
 
     @staticmethod
     def _resize_image_if_needed(image_path: str, max_width: int = 1920, max_height: int = 1080) -> Image.Image:
-        """Resize image if larger than specified dimensions (1080p)."""
+        """Downscale an image to fit max_width x max_height without a full-size decode.
+
+        JPEGs are decoded at reduced scale via `draft` (DCT scaling), then
+        `thumbnail` shrinks with `reduce` + a cheap filter; EXIF orientation is
+        applied to the small image only.
+        """
         with Image.open(image_path) as opened:
+            if opened.format == "JPEG":
+                opened.draft("RGB", (max_width, max_height))
+            # reducing_gap lets Pillow use integer `reduce` for most of the shrink.
+            opened.thumbnail((max_width, max_height), Image.Resampling.BILINEAR, reducing_gap=2.0)
             img = ImageOps.exif_transpose(opened)
             img.load()
-
-        width, height = img.size
-
-        # Check if resize is needed
-        if width <= max_width and height <= max_height:
-            return img
-
-        # Calculate new dimensions maintaining aspect ratio
-        ratio = min(max_width / width, max_height / height)
-        new_width = max(1, int(width * ratio))
-        new_height = max(1, int(height * ratio))
-
-        # Resize using high-quality filter
-        resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        return resized
+        return img
 
     @staticmethod
-    def _image_to_base64(img: Image.Image, format: str = "JPEG", *, quality: int = 75) -> str:
-        """Convert PIL Image to base64 string."""
+    def _image_to_base64(img: Image.Image, format: str = "JPEG", *, quality: int = 75, optimize: bool = False) -> str:
+        """Convert PIL Image to base64 string.
+
+        `optimize` (extra Huffman pass) is off by default: it costs CPU and saves
+        little on small thumbnails.
+        """
         buffered = BytesIO()
         # Convert RGBA to RGB for JPEG
         if img.mode == 'RGBA' and format.upper() == 'JPEG':
             rgb_img = Image.new('RGB', img.size, (255, 255, 255))
             rgb_img.paste(img, mask=img.split()[3] if len(img.split()) == 4 else None)
-            rgb_img.save(buffered, format=format, quality=quality, optimize=True)
+            rgb_img.save(buffered, format=format, quality=quality, optimize=optimize)
         else:
             # Ensure JPEG is RGB
             if format.upper() == 'JPEG' and img.mode != 'RGB':
                 img = img.convert('RGB')
-            img.save(buffered, format=format, quality=quality, optimize=True)
+            img.save(buffered, format=format, quality=quality, optimize=optimize)
         img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
         return img_str
 
@@ -514,6 +884,175 @@ class OrganizerWorkflow:
         prefix = self._ai_service.suggest_prefix_for_rename(payload, model=model, user_requirements=user_requirements)
         return self._sanitize_filename_component(prefix, max_len=32)
 
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token estimate: CJK characters ~1 token each, other text ~4 characters per token."""
+        cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+        return cjk + (len(text) - cjk) // 4 + 1
+
+    @classmethod
+    def _pack_by_budget(cls, sizes: List[Tuple[int, int]], max_items: int, budget: int) -> List[List[int]]:
+        """Greedily pack (key, cost) pairs into groups under `max_items` and `budget`."""
+        groups: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for key, cost in sizes:
+            if current and (len(current) >= max_items or used + cost > budget):
+                groups.append(current)
+                current, used = [], 0
+            current.append(key)
+            used += cost
+        if current:
+            groups.append(current)
+        return groups
+
+    def rename_suggest_prefixes_batch(
+        self,
+        items: List[Tuple[Dict[str, Any], str]],
+        model: Optional[str] = None,
+        *,
+        user_requirements: Optional[str] = None,
+        max_files: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        words_per_file: Optional[int] = None,
+        max_rounds: int = 2,
+    ) -> List[Union[str, Exception]]:
+        """Suggest prefixes for several (file_item, content_snippet) pairs with few requests.
+
+        Snippets are cut to `words_per_file` and packed into requests under
+        `max_files` / `token_budget`. Files whose description is missing or
+        invalid are re-queued for another round; after `max_rounds` each one
+        falls back to a single `rename_suggest_prefix` call.
+
+        Returns sanitized prefixes aligned with `items` ("" if none could be
+        produced); a file whose single fallback call failed gets the exception.
+        """
+        max_files = max(1, int(max_files or config.RENAME_BATCH_MAX_FILES))
+        budget = max(1, int(token_budget or config.RENAME_BATCH_TOKEN_BUDGET))
+        words = max(1, int(words_per_file or config.RENAME_BATCH_WORDS_PER_FILE))
+
+        entries: List[Dict[str, Any]] = []
+        for fi, snippet in items:
+            entries.append(
+                {
+                    "relative_path": str(fi.get("relative_path") or ""),
+                    "name": fi.get("name"),
+                    "extension": fi.get("extension"),
+                    "content_snippet": self._truncate_words(snippet, threshold_words=words, max_words=words),
+                }
+            )
+        costs = [self._estimate_tokens(json.dumps(e, ensure_ascii=False)) for e in entries]
+
+        prefixes: List[Union[str, Exception]] = [""] * len(items)
+        todo = list(range(len(items)))
+        for _ in range(max(1, max_rounds)):
+            if not todo:
+                break
+            missing: List[int] = []
+            for group in self._pack_by_budget([(i, costs[i]) for i in todo], max_files, budget):
+                try:
+                    got = self._ai_service.suggest_prefixes_for_rename_batch(
+                        {"files": [entries[i] for i in group]},
+                        model=model,
+                        user_requirements=user_requirements,
+                    )
+                except Exception:
+                    missing.extend(group)
+                    continue
+                # Match by relative_path; fall back to position when the model garbled paths.
+                by_path = {g["relative_path"]: g["description"] for g in got if g.get("relative_path")}
+                positional = len(got) == len(group)
+                for pos, i in enumerate(group):
+                    desc = by_path.get(entries[i]["relative_path"])
+                    if desc is None and positional:
+                        desc = got[pos]["description"]
+                    prefix = self._sanitize_filename_component(desc or "", max_len=32)
+                    if prefix:
+                        prefixes[i] = prefix
+                    else:
+                        missing.append(i)
+            todo = missing
+
+        for i in todo:
+            try:
+                prefixes[i] = self.rename_suggest_prefix(
+                    items[i][0],
+                    items[i][1],
+                    model=model,
+                    user_requirements=user_requirements,
+                )
+            except Exception as e:
+                prefixes[i] = e
+        return prefixes
+
+    @staticmethod
+    def _payload_pixels(image_base64: str) -> int:
+        """Pixel count of an encoded thumbnail (header only, no decode)."""
+        try:
+            with Image.open(BytesIO(base64.b64decode(image_base64))) as img:
+                w, h = img.size
+            return w * h
+        except Exception:
+            side = config.RENAME_IMAGE_MAX_SIDE
+            return side * side
+
+    def rename_describe_images_batch(
+        self,
+        items: List[Tuple[Dict[str, Any], str]],
+        model: Optional[str] = None,
+        *,
+        user_requirements: Optional[str] = None,
+        max_files: Optional[int] = None,
+        pixel_budget: Optional[int] = None,
+    ) -> List[Union[str, Exception]]:
+        """Describe several (file_item, image_base64) pairs with few vision requests.
+
+        Images are packed into requests under `max_files` / `pixel_budget`
+        (image tokens grow with pixels). A request whose reply cannot be
+        parsed, or images left without a description, fall back to single
+        `_describe_image_payload` calls.
+
+        Returns sanitized prefixes aligned with `items` ("" if none could be
+        produced); an image whose single fallback call failed gets the exception.
+        """
+        max_files = max(1, int(max_files or config.RENAME_IMAGE_BATCH_MAX_FILES))
+        budget = max(1, int(pixel_budget or config.RENAME_IMAGE_BATCH_MAX_PIXELS))
+        prefixes: List[Union[str, Exception]] = [""] * len(items)
+        costs = [(i, self._payload_pixels(b64)) for i, (_, b64) in enumerate(items)]
+
+        missing: List[int] = []
+        for group in self._pack_by_budget(costs, max_files, budget):
+            if len(group) == 1:
+                missing.extend(group)
+                continue
+            try:
+                got = self._ai_service.describe_images_for_rename_batch(
+                    [(items[i][1], items[i][0]) for i in group],
+                    model=model,
+                    user_requirements=user_requirements,
+                )
+            except Exception:
+                missing.extend(group)
+                continue
+            for i, desc in zip(group, got):
+                prefix = self._sanitize_filename_component(desc or "", max_len=32)
+                if prefix:
+                    prefixes[i] = prefix
+                else:
+                    missing.append(i)
+
+        for i in missing:
+            try:
+                prefixes[i] = self._describe_image_payload(
+                    items[i][1],
+                    items[i][0],
+                    model=model,
+                    user_requirements=user_requirements,
+                )
+            except Exception as e:
+                prefixes[i] = e
+        return prefixes
+
     def rename_suggest_prefix_for_image(
         self,
         root_path: str,
@@ -524,18 +1063,114 @@ class OrganizerWorkflow:
     ) -> str:
         """Use multimodal AI to generate prefix for image files."""
         root_path = OrganizerWorkflow.validate_root_path(root_path)
-        rel = (file_item.get("relative_path") or "").replace("/", "\\")
-        abs_path = os.path.join(root_path, rel)
+        abs_path = self._abs_path(root_path, str(file_item.get("relative_path") or ""))
         
         if not os.path.exists(abs_path):
             raise ValueError(f"图片文件不存在: {abs_path}")
         
-        # Resize if needed and convert to base64
-        img = self._resize_image_if_needed(abs_path, max_width=1920, max_height=1080)
-        
+        if config.RENAME_IMAGE_METADATA_PREFIX and not self._normalize_requirements(user_requirements):
+            local = self.rename_prefix_from_metadata(abs_path)
+            if local:
+                return local
+        image_base64 = self._encode_image_for_rename(abs_path)
+        return self._describe_image_payload(image_base64, file_item, model=model, user_requirements=user_requirements)
+
+    @staticmethod
+    def _normalize_requirements(user_requirements: Optional[str]) -> str:
+        return (user_requirements or "").strip()
+
+    @classmethod
+    def rename_prefix_from_metadata(cls, abs_path: str) -> str:
+        """Propose an image prefix from local metadata, or "" to escalate to the vision model.
+
+        Only confident cases are handled: screenshots (by name, or a PNG at a
+        common screen size without camera EXIF) become "截图_<date>", and
+        generic camera names (IMG_1234, DSC01234, ...) with an EXIF capture date
+        become "<date>_<camera model>". Everything else returns "".
+        """
+        stem = os.path.splitext(os.path.basename(abs_path))[0].strip()
+        is_screenshot_name = bool(_SCREENSHOT_NAME.search(stem))
+        is_generic = bool(_GENERIC_IMAGE_NAME.match(stem))
+        if not (is_screenshot_name or is_generic):
+            return ""
+        try:
+            with Image.open(abs_path) as img:
+                size = img.size
+                fmt = img.format
+                exif = img.getexif()
+        except Exception:
+            return ""
+
+        taken = ""
+        raw_date = exif.get_ifd(_EXIF_IFD).get(_TAG_DATETIME_ORIGINAL) or exif.get(_TAG_DATETIME)
+        if isinstance(raw_date, str):
+            m = re.match(r"(\d{4})[:\-](\d{2})[:\-](\d{2})", raw_date.strip())
+            if m and m.group(1) != "0000":
+                taken = "".join(m.groups())
+        model = str(exif.get(_TAG_MODEL) or "").strip().strip("\x00")
+        make = str(exif.get(_TAG_MAKE) or "").strip().strip("\x00")
+
+        looks_like_screen = fmt == "PNG" and not model and (size in _SCREEN_SIZES or size[::-1] in _SCREEN_SIZES)
+        if is_screenshot_name or (is_generic and looks_like_screen):
+            if not taken:
+                try:
+                    taken = datetime.fromtimestamp(os.path.getmtime(abs_path)).strftime("%Y%m%d")
+                except OSError:
+                    return "截图"
+            return f"截图_{taken}"
+
+        if taken and (model or make):
+            # "Apple iPhone 13" style: avoid repeating the make when the model already has it.
+            camera = model if make and make.split()[0].lower() in model.lower() else f"{make} {model}".strip()
+            return cls._sanitize_filename_component(f"{taken}_{camera}", max_len=32)
+        return ""
+
+    @classmethod
+    def _encode_image_for_rename(cls, abs_path: str) -> str:
+        return cls._encode_image_with_hash(abs_path)[0]
+
+    @classmethod
+    def _prepare_rename_image(
+        cls, abs_path: str, cache: Optional[ImagePayloadCache], use_metadata: bool
+    ) -> Tuple[str, Any]:
+        """Encode-stage job: ("meta", prefix) when metadata suffices, else ("image", (payload, dhash))."""
+        if use_metadata:
+            prefix = cls.rename_prefix_from_metadata(abs_path)
+            if prefix:
+                return "meta", prefix
+        return "image", cls._encode_image_with_hash(abs_path, cache)
+
+    @classmethod
+    def _encode_image_with_hash(
+        cls, abs_path: str, cache: Optional[ImagePayloadCache] = None
+    ) -> Tuple[str, int]:
+        """Return (base64 JPEG thumbnail, dHash), served from `cache` when the file content is known."""
+        # Small thumbnail: vision models need far less than 1080p to name a photo.
+        side = config.RENAME_IMAGE_MAX_SIDE
+        quality = config.RENAME_IMAGE_QUALITY
+        key = None
+        if cache is not None:
+            key = content_key(abs_path, f"{side}:{quality}")
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+
+        img = cls._resize_image_if_needed(abs_path, max_width=side, max_height=side)
         # Always encode to JPEG for maximum compatibility with OpenAI-style multimodal APIs.
-        image_base64 = self._image_to_base64(img, format='JPEG', quality=75)
-        
+        payload = cls._image_to_base64(img, format='JPEG', quality=quality)
+        hash_value = dhash(img)
+        if cache is not None and key:
+            cache.put(key, payload, hash_value)
+        return payload, hash_value
+
+    def _describe_image_payload(
+        self,
+        image_base64: str,
+        file_item: Dict[str, Any],
+        model: Optional[str] = None,
+        *,
+        user_requirements: Optional[str] = None,
+    ) -> str:
         # Call multimodal AI service (returns `description` preferred as filename prefix)
         model_to_use = (model or config.MODEL_NAME_IMAGE or "").strip() or None
         description = self._ai_service.describe_image_for_rename(
@@ -548,10 +1183,259 @@ class OrganizerWorkflow:
 
     def rename_extract_content(self, root_path: str, file_relative_path: str) -> str:
         root_path = OrganizerWorkflow.validate_root_path(root_path)
-        rel = (file_relative_path or "").replace("/", "\\")
-        abs_path = os.path.join(root_path, rel)
-        text = extract_text_from_file(abs_path, max_length=50000) or ""
-        return self._truncate_words(text, threshold_words=100, max_words=1000)
+        abs_path = self._abs_path(root_path, file_relative_path)
+        return _extract_snippet_for_rename(abs_path)
+
+    @staticmethod
+    def _create_extract_pool(max_workers: Optional[int]) -> Any:
+        """Extraction backend with `submit(path)` / `shutdown(...)`: worker processes
+        with per-file timeouts, or threads where multiprocessing is unavailable."""
+        try:
+            return ExtractionService(_extract_snippet_for_rename, max_workers=max_workers)
+        except (OSError, NotImplementedError, ImportError, ValueError):
+            # No multiprocessing available (sandboxed/frozen environments): stay in-process.
+            pool = ThreadPoolExecutor(max_workers=max_workers or 4)
+            return _InProcessExtractor(pool)
+
+    def rename_build_preview(
+        self,
+        root_path: str,
+        file_items: List[Dict[str, Any]],
+        *,
+        model: Optional[str] = None,
+        image_model: Optional[str] = None,
+        user_requirements: Optional[str] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+        extract_workers: Optional[int] = None,
+        encode_workers: int = 4,
+        ai_concurrency: int = 4,
+        text_batch_size: Optional[int] = None,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Build rename previews with a pipelined extract -> encode -> AI flow.
+
+        Text extraction runs in worker processes with per-file timeouts
+        (`ExtractionService`, CPU-bound parsing), image
+        resize/encode in a thread pool, and model calls in `ai_concurrency`
+        worker threads fed by a queue, so disk, CPU and network overlap. Text
+        snippets that are ready together are sent as one batched request (up to
+        `text_batch_size` files, see `rename_suggest_prefixes_batch`).
+        Extracted snippets are cached per file fingerprint (`SnippetCache`), so
+        regenerating a preview skips extraction for unchanged files. Image
+        payloads are cached by content hash, near-duplicate images (dHash
+        within `config.RENAME_IMAGE_DEDUP_DISTANCE` bits) share one vision call,
+        and ready images are described several per request
+        (`rename_describe_images_batch`). Images that local metadata can name
+        (`rename_prefix_from_metadata`) skip the vision model entirely.
+
+        `on_result(index, item)` is called as soon as each file is done (in
+        completion order); item = {relative_path, prefix, old_name, new_name, error}.
+        Returns the items in input order; entries are None for files not
+        processed because `should_stop()` became true.
+        """
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        stop = should_stop or (lambda: False)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_items)
+        if not file_items:
+            return results
+
+        text_model = model
+        vision_model = image_model or model
+        batch_files = max(1, int(text_batch_size or config.RENAME_BATCH_MAX_FILES))
+        image_batch_files = max(1, int(config.RENAME_IMAGE_BATCH_MAX_FILES))
+        ai_queue: "queue.Queue[Optional[Tuple[int, Dict[str, Any], str, Any, Optional[BaseException]]]]" = queue.Queue()
+        results_lock = threading.Lock()
+
+        def emit(index: int, fi: Dict[str, Any], prefix: str, error: str = "") -> None:
+            name = str(fi.get("name") or "")
+            item = {
+                "relative_path": str(fi.get("relative_path") or ""),
+                "prefix": prefix,
+                "old_name": name,
+                "new_name": f"{prefix}_{name}",
+                "error": error,
+            }
+            with results_lock:
+                results[index] = item
+            if on_result:
+                on_result(index, item)
+
+        def wait_leader(shared: Future) -> bool:
+            """Wait for a near-duplicate group's result; False on stop or timeout."""
+            deadline = time.monotonic() + config.RENAME_IMAGE_DEDUP_WAIT_SECONDS
+            while not shared.done():
+                remaining = deadline - time.monotonic()
+                if stop() or remaining <= 0:
+                    return False
+                wait([shared], timeout=min(0.2, remaining))
+            return True
+
+        def handle_images(jobs) -> None:
+            owned = []
+            waiting = []
+            for index, fi, _, payload, err in jobs:
+                if err is not None:
+                    emit(index, fi, "识别失败", str(err))
+                    continue
+                image_base64, hash_value = payload
+                shared, owner = dup_index.claim(hash_value)
+                if owner:
+                    owned.append((fi, image_base64, shared))
+                waiting.append((index, fi, shared, image_base64))
+            if owned:
+                try:
+                    prefixes = self.rename_describe_images_batch(
+                        [(fi, b64) for fi, b64, _ in owned],
+                        model=vision_model,
+                        user_requirements=user_requirements,
+                    )
+                except Exception as e:
+                    prefixes = [e] * len(owned)
+                for (_, _, shared), prefix in zip(owned, prefixes):
+                    if isinstance(prefix, Exception):
+                        shared.set_exception(prefix)
+                    else:
+                        shared.set_result(prefix)
+            # Near-duplicates wait for the first image of their group (resolved above or in flight).
+            for index, fi, shared, image_base64 in waiting:
+                if wait_leader(shared):
+                    try:
+                        prefix = shared.result()
+                    except Exception as e:
+                        prefix = e
+                elif stop():
+                    continue
+                else:
+                    # The leader's request is taking too long: describe this image on its own.
+                    prefix = self.rename_describe_images_batch(
+                        [(fi, image_base64)],
+                        model=vision_model,
+                        user_requirements=user_requirements,
+                    )[0]
+                if isinstance(prefix, Exception):
+                    emit(index, fi, "识别失败", str(prefix))
+                elif prefix:
+                    emit(index, fi, prefix)
+                else:
+                    emit(index, fi, "识别失败", "图片识别未返回描述")
+
+        def handle_texts(jobs) -> None:
+            ready = []
+            for index, fi, _, payload, err in jobs:
+                if err is not None:
+                    emit(index, fi, "生成失败", str(err))
+                elif not str(payload or "").strip():
+                    emit(index, fi, "内容为空")
+                else:
+                    ready.append((index, fi, payload))
+            if not ready:
+                return
+            try:
+                prefixes = self.rename_suggest_prefixes_batch(
+                    [(fi, payload) for _, fi, payload in ready],
+                    model=text_model,
+                    user_requirements=user_requirements,
+                )
+            except Exception as e:
+                for index, fi, _ in ready:
+                    emit(index, fi, "生成失败", str(e))
+                return
+            for (index, fi, _), prefix in zip(ready, prefixes):
+                if isinstance(prefix, Exception):
+                    emit(index, fi, "生成失败", str(prefix))
+                else:
+                    emit(index, fi, prefix or "未命名")
+
+        def ai_worker() -> None:
+            while True:
+                job = ai_queue.get()
+                if job is None:
+                    return
+                if stop():
+                    continue
+                # Gather more jobs that are ready (short window) into batched requests.
+                texts, images, finished = [], [], False
+                (texts if job[2] == "text" else images).append(job)
+                while len(texts) < batch_files and len(images) < image_batch_files:
+                    try:
+                        nxt = ai_queue.get(timeout=0.05)
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        finished = True
+                        break
+                    (texts if nxt[2] == "text" else images).append(nxt)
+                if texts:
+                    handle_texts(texts)
+                if images:
+                    handle_images(images)
+                if finished:
+                    return
+
+        snippet_cache = SnippetCache(root_path, max_bytes=int(config.SNIPPET_CACHE_MAX_MB * 1024 * 1024))
+        text_keys: Dict[int, Optional[str]] = {}
+        image_cache = ImagePayloadCache(root_path, max_bytes=int(config.IMAGE_CACHE_MAX_MB * 1024 * 1024))
+        dup_index = NearDuplicateIndex(config.RENAME_IMAGE_DEDUP_DISTANCE)
+        # Personal requirements may ask for content-based names, so leave those to the model.
+        use_metadata = config.RENAME_IMAGE_METADATA_PREFIX and not self._normalize_requirements(user_requirements)
+        extract_pool = None
+        encode_pool = ThreadPoolExecutor(max_workers=max(1, encode_workers))
+        ai_threads = [threading.Thread(target=ai_worker, daemon=True) for _ in range(max(1, ai_concurrency))]
+        for t in ai_threads:
+            t.start()
+
+        pending: Dict[Future, Tuple[int, Dict[str, Any], str]] = {}
+        try:
+            for index, fi in enumerate(file_items):
+                abs_path = self._abs_path(root_path, str(fi.get("relative_path") or ""))
+                if self._is_image_file(str(fi.get("name") or abs_path)):
+                    fut = encode_pool.submit(self._prepare_rename_image, abs_path, image_cache, use_metadata)
+                    pending[fut] = (index, fi, "image")
+                else:
+                    key = snippet_cache.fingerprint(str(fi.get("relative_path") or ""), abs_path)
+                    cached = snippet_cache.get(key)
+                    if cached is not None:
+                        ai_queue.put((index, fi, "text", cached, None))
+                        continue
+                    if extract_pool is None:
+                        extract_pool = self._create_extract_pool(extract_workers)
+                    text_keys[index] = key
+                    fut = extract_pool.submit(abs_path)
+                    pending[fut] = (index, fi, "text")
+
+            # The calling thread connects stage 1 to the AI queue in completion order.
+            waiting = set(pending)
+            while waiting:
+                if stop():
+                    for fut in waiting:
+                        fut.cancel()
+                    break
+                done, waiting = wait(waiting, timeout=0.2, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    index, fi, kind = pending.pop(fut)
+                    try:
+                        payload = fut.result()
+                        if kind == "text" and payload:
+                            snippet_cache.put(text_keys.get(index), payload)
+                        elif kind == "image":
+                            source, payload = payload
+                            if source == "meta":
+                                emit(index, fi, payload)
+                                continue
+                        ai_queue.put((index, fi, kind, payload, None))
+                    except Exception as e:
+                        ai_queue.put((index, fi, kind, None, e))
+        finally:
+            for _ in ai_threads:
+                ai_queue.put(None)
+            encode_pool.shutdown(wait=False, cancel_futures=True)
+            if extract_pool is not None:
+                extract_pool.shutdown(wait=False, cancel_futures=True)
+            snippet_cache.save()
+            image_cache.prune()
+            for t in ai_threads:
+                t.join()
+        return results
 
     def rename_apply_prefix(self, root_path: str, file_relative_path: str, prefix: str) -> Dict[str, Any]:
         """Rename a file by prepending '<prefix>_' to the original filename.
@@ -559,9 +1443,8 @@ class OrganizerWorkflow:
         Returns: {old_rel, new_rel, status, error, conflict}
         """
         root_path = OrganizerWorkflow.validate_root_path(root_path)
-        rel = (file_relative_path or "").replace("/", "\\")
-        old_abs = os.path.join(root_path, rel)
-        old_rel_norm = rel.replace("\\", "/")
+        old_rel_norm = self._norm_rel(file_relative_path)
+        old_abs = self._abs_path(root_path, old_rel_norm)
 
         if not os.path.exists(old_abs):
             return {"old_rel": old_rel_norm, "new_rel": "", "status": "skipped", "error": "文件不存在", "conflict": False}
@@ -595,51 +1478,221 @@ class OrganizerWorkflow:
         except Exception as e:
             return {"old_rel": old_rel_norm, "new_rel": "", "status": "failed", "error": str(e), "conflict": conflict}
 
-    def load_last_journal(self, root_path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    def _rename_group(
+        self,
+        root_path: str,
+        dir_rel: str,
+        items: List[Tuple[str, str]],
+        stop: Callable[[], bool],
+        on_moved: Callable[[List[Dict[str, Any]]], None],
+        journal_batch: int = 32,
+    ) -> List[Dict[str, Any]]:
+        """Apply (relative_path, prefix) renames inside one directory.
+
+        The directory is listed once and conflicts are resolved against that
+        in-memory name set. Groups never share a directory, so they can run in
+        parallel. Records use the journal move layout (src_rel -> final_dst_rel)
+        so the undo engine can reverse them; successful ones are handed to
+        `on_moved` every `journal_batch` renames, like the per-batch journal of
+        the move flow.
+        """
+        dir_abs = self._abs_path(root_path, dir_rel)
+        try:
+            existing = os.listdir(dir_abs)
+        except OSError:
+            existing = []
+        taken = {n.lower() for n in existing}
+
+        results: List[Dict[str, Any]] = []
+        unjournaled: List[Dict[str, Any]] = []
+        for rel, prefix in items:
+            old_name = os.path.basename(rel)
+            record: Dict[str, Any] = {
+                "op": "rename",
+                "src_rel": rel,
+                "intended_dst_rel": "",
+                "final_dst_rel": "",
+                "status": "pending",
+                "error": "",
+                "conflict": False,
+            }
+            if stop():
+                break
+            safe_prefix = self._sanitize_filename_component(prefix, max_len=32)
+            if not safe_prefix:
+                record.update(status="skipped", error="prefix 为空")
+                results.append(record)
+                continue
+            if old_name.lower() not in taken:
+                record.update(status="skipped", error="文件不存在")
+                results.append(record)
+                continue
+
+            new_name = f"{safe_prefix}_{old_name}"
+            record["intended_dst_rel"] = f"{dir_rel}/{new_name}" if dir_rel else new_name
+            if new_name.lower() in taken:
+                record["conflict"] = True
+                # Add suffix to avoid overwriting
+                stem, ext = os.path.splitext(new_name)
+                i = 1
+                while f"{stem}__dup{i}{ext}".lower() in taken:
+                    i += 1
+                new_name = f"{stem}__dup{i}{ext}"
+
+            try:
+                os.rename(os.path.join(dir_abs, old_name), os.path.join(dir_abs, new_name))
+                taken.discard(old_name.lower())
+                taken.add(new_name.lower())
+                record["status"] = "moved"
+                record["final_dst_rel"] = f"{dir_rel}/{new_name}" if dir_rel else new_name
+                unjournaled.append(record)
+            except FileNotFoundError:
+                record.update(status="skipped", error="文件不存在")
+            except Exception as e:
+                record.update(status="failed", error=str(e))
+            results.append(record)
+            if len(unjournaled) >= journal_batch:
+                on_moved(unjournaled)
+                unjournaled = []
+        on_moved(unjournaled)
+        return results
+
+    def rename_apply_batch(
+        self,
+        root_path: str,
+        items: List[Dict[str, Any]],
+        *,
+        max_workers: int = 8,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[str, Any]:
+        """Apply rename previews ({relative_path, prefix}) in bulk and journal them.
+
+        Renames are grouped by parent directory (listed once each) and groups
+        run in parallel. Renamed files are appended to a "rename" journal in
+        small fsynced batches, so the run can be reverted with `undo_last` /
+        `undo_to`. The journal is only created once the first file is renamed.
+
+        Returns: {journal_path, stopped, total, renamed, conflicts, failed, skipped, results}
+        (`journal_path` is "" when nothing was renamed)
+        results: [{old_rel, new_rel, status, error, conflict}] with status in
+        {"renamed", "skipped", "failed"}.
+        """
         root_path = OrganizerWorkflow.validate_root_path(root_path)
-        history = self._history_dir(root_path)
-        candidates = [p for p in Path(history).glob("*.json") if p.is_file()]
-        if not candidates:
-            return None
-        candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-        latest = candidates[0]
-        with open(latest, "r", encoding="utf-8") as f:
-            obj = json.load(f)
-        return str(latest), obj
+        stop = should_stop or (lambda: False)
+        progress = on_progress or (lambda done, total: None)
+
+        groups: Dict[str, List[Tuple[str, str]]] = {}
+        for it in items:
+            rel = self._norm_rel(it.get("relative_path")).strip("/")
+            if rel:
+                groups.setdefault(os.path.dirname(rel), []).append((rel, str(it.get("prefix") or "")))
+        total = sum(len(g) for g in groups.values())
+
+        journal: Optional[JournalWriter] = None
+        journal_lock = threading.Lock()
+
+        def journal_moves(moved: List[Dict[str, Any]]) -> None:
+            nonlocal journal
+            if not moved:
+                return
+            with journal_lock:
+                if journal is None:
+                    journal = self.open_journal(root_path, kind="rename")
+                journal.append_moves(moved)
 
-    def undo_last(self, root_path: str, *, on_conflict: str = "rename") -> Dict[str, Any]:
+        records: List[Dict[str, Any]] = []
+        try:
+            workers = max(1, min(int(max_workers or 1), len(groups) or 1))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self._rename_group, root_path, d, g, stop, journal_moves) for d, g in groups.items()]
+                for fut in as_completed(futures):
+                    records.extend(fut.result())
+                    progress(len(records), total)
+            journal_path = journal.finalize(stopped=stop()) if journal is not None else ""
+        finally:
+            if journal is not None:
+                journal.close()
+
+        results = [
+            {
+                "old_rel": r["src_rel"],
+                "new_rel": r["final_dst_rel"],
+                "status": "renamed" if r["status"] == "moved" else r["status"],
+                "error": r["error"],
+                "conflict": r["conflict"],
+            }
+            for r in records
+        ]
+        return {
+            "journal_path": journal_path,
+            "stopped": len(records) < total,
+            "total": total,
+            "renamed": sum(1 for r in results if r["status"] == "renamed"),
+            "conflicts": sum(1 for r in results if r["status"] == "renamed" and r["conflict"]),
+            "failed": sum(1 for r in results if r["status"] == "failed"),
+            "skipped": sum(1 for r in results if r["status"] == "skipped"),
+            "results": results,
+        }
+
+    # --- Undo engine (indexed, multi-level, parallel per target directory) ---
+
+    @staticmethod
+    def _abs_path(root_path: str, rel: str) -> str:
+        parts = [p for p in str(rel or "").replace("\\", "/").split("/") if p]
+        return os.path.join(root_path, *parts)
+
+    def list_journals(self, root_path: str) -> List[Dict[str, Any]]:
+        """Return journal index entries (oldest first): {id, file, kind, created_at, complete, undone, ...}."""
         root_path = OrganizerWorkflow.validate_root_path(root_path)
-        loaded = self.load_last_journal(root_path)
-        if not loaded:
-            raise ValueError("未找到可撤销的历史记录（.autosniffer_history 为空）")
-        journal_path, journal = loaded
+        return list_journals(self._history_dir(root_path))
 
-        moves = journal.get("moves") or []
-        if not isinstance(moves, list) or not moves:
-            raise ValueError("历史记录中没有 moves")
+    @staticmethod
+    def _journal_has_moves(journal: Dict[str, Any]) -> bool:
+        moves = journal.get("moves")
+        return isinstance(moves, list) and any(isinstance(m, dict) and m.get("status") == "moved" for m in moves)
 
-        undo_results: List[Dict[str, Any]] = []
-        moved_count = 0
-        restored_count = 0
-        conflict_count = 0
-        fail_count = 0
+    def load_last_journal(self, root_path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Load the newest journal that has not been undone yet.
 
-        # Reverse order is safer
-        for m in reversed(moves):
-            if not isinstance(m, dict):
-                continue
-            if m.get("status") != "moved":
-                continue
-            moved_count += 1
+        Journals without any moved file (e.g. a run stopped before its first
+        batch) are marked undone on the way, so they never block older runs.
+        """
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        history = self._history_dir(root_path)
+        pending = [e for e in list_journals(history) if not e.get("undone")]
+        for entry in reversed(pending):
+            path = os.path.join(history, str(entry.get("file") or ""))
+            journal = read_journal(path)
+            if self._journal_has_moves(journal):
+                return path, journal
+            update_index_entry(history, entry["id"], undone=True)
+        return None
+
+    def _undo_group(
+        self,
+        root_path: str,
+        target_dir_rel: str,
+        moves: List[Dict[str, Any]],
+        on_conflict: str,
+    ) -> List[Dict[str, Any]]:
+        """Restore all moves whose original location is `target_dir_rel`.
 
+        The target directory is listed once; conflicts are resolved against that
+        in-memory name set, so no per-file `exists` probing is needed. Groups never
+        share a target directory, which makes them safe to run in parallel.
+        """
+        target_dir_abs = self._abs_path(root_path, target_dir_rel)
+        try:
+            taken = {n.lower() for n in os.listdir(target_dir_abs)}
+        except FileNotFoundError:
+            taken = set()
+            os.makedirs(target_dir_abs, exist_ok=True)
+
+        results: List[Dict[str, Any]] = []
+        for m in moves:
             src_rel = str(m.get("src_rel") or "")
             final_dst_rel = str(m.get("final_dst_rel") or m.get("intended_dst_rel") or "")
-            if not src_rel or not final_dst_rel:
-                continue
-
-            current_abs = os.path.join(root_path, final_dst_rel.replace("/", "\\"))
-            target_abs = os.path.join(root_path, src_rel.replace("/", "\\"))
-
             record = {
                 "from": final_dst_rel,
                 "to": src_rel,
@@ -648,37 +1701,84 @@ class OrganizerWorkflow:
                 "error": "",
                 "conflict": False,
             }
-
-            try:
-                if not os.path.exists(current_abs):
-                    record["status"] = "skipped"
-                    record["error"] = "待撤销文件不存在（可能已被改动）"
-                    undo_results.append(record)
+            current_abs = self._abs_path(root_path, final_dst_rel)
+            name = os.path.basename(src_rel.replace("\\", "/"))
+            final_name = name
+            if name.lower() in taken:
+                record["conflict"] = True
+                if on_conflict != "rename":
+                    record["status"] = "failed"
+                    record["error"] = "原位置已存在同名文件"
+                    results.append(record)
                     continue
-
-                final_target_abs = target_abs
-                if os.path.exists(final_target_abs):
-                    record["conflict"] = True
-                    conflict_count += 1
-                    if on_conflict == "rename":
-                        final_target_abs = self._unique_path(final_target_abs, "__undo_conflict")
-                    else:
-                        record["status"] = "failed"
-                        record["error"] = "原位置已存在同名文件"
-                        fail_count += 1
-                        undo_results.append(record)
-                        continue
-
-                os.makedirs(os.path.dirname(final_target_abs), exist_ok=True)
-                shutil.move(current_abs, final_target_abs)
+                stem, ext = os.path.splitext(name)
+                final_name = f"{stem}__undo_conflict{ext}"
+                i = 1
+                while final_name.lower() in taken:
+                    final_name = f"{stem}__undo_conflict_{i}{ext}"
+                    i += 1
+
+            final_target_abs = os.path.join(target_dir_abs, final_name)
+            try:
+                try:
+                    os.rename(current_abs, final_target_abs)
+                except FileNotFoundError:
+                    raise
+                except OSError:
+                    # Cross-device or platform quirks: fall back to a full move.
+                    shutil.move(current_abs, final_target_abs)
+                taken.add(final_name.lower())
                 record["status"] = "restored"
                 record["final_to"] = os.path.relpath(final_target_abs, root_path).replace("\\", "/")
-                restored_count += 1
+            except FileNotFoundError:
+                record["status"] = "skipped"
+                record["error"] = "待撤销文件不存在（可能已被改动）"
             except Exception as e:
                 record["status"] = "failed"
                 record["error"] = str(e)
-                fail_count += 1
-            undo_results.append(record)
+            results.append(record)
+        return results
+
+    def undo_journal(
+        self,
+        root_path: str,
+        journal_path: str,
+        *,
+        on_conflict: str = "rename",
+        max_workers: int = 8,
+    ) -> Dict[str, Any]:
+        """Undo a single journal and mark it as undone in the index."""
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        journal = read_journal(journal_path)
+
+        # A journal without moved files is still marked undone (its folder bookkeeping
+        # is replayed below) so that `undo_to` can roll back past it.
+        moves = journal.get("moves") or []
+        if not isinstance(moves, list):
+            raise ValueError("历史记录中没有 moves")
+
+        # Reverse order is safer; group by original directory so each group owns its target.
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        moved_count = 0
+        for m in reversed(moves):
+            if not isinstance(m, dict) or m.get("status") != "moved":
+                continue
+            moved_count += 1
+            src_rel = str(m.get("src_rel") or "")
+            if not src_rel or not (m.get("final_dst_rel") or m.get("intended_dst_rel")):
+                continue
+            groups.setdefault(os.path.dirname(src_rel.replace("\\", "/")), []).append(m)
+
+        undo_results: List[Dict[str, Any]] = []
+        workers = max(1, min(int(max_workers or 1), len(groups) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._undo_group, root_path, d, ms, on_conflict) for d, ms in groups.items()]
+            for fut in futures:
+                undo_results.extend(fut.result())
+
+        restored_count = sum(1 for r in undo_results if r["status"] == "restored")
+        conflict_count = sum(1 for r in undo_results if r["conflict"])
+        fail_count = sum(1 for r in undo_results if r["status"] == "failed")
 
         # Try remove empty folders that were created by this run
         removed_dirs: List[str] = []
@@ -686,7 +1786,7 @@ class OrganizerWorkflow:
         if isinstance(created_folders, list):
             # deeper first (though these are top-level, keep safe)
             for folder in sorted([str(x) for x in created_folders if str(x).strip()], key=len, reverse=True):
-                abs_dir = os.path.join(root_path, folder.strip().strip("\\/"))
+                abs_dir = self._abs_path(root_path, folder.strip().strip("\\/"))
                 try:
                     if os.path.isdir(abs_dir) and not os.listdir(abs_dir):
                         os.rmdir(abs_dir)
@@ -702,7 +1802,7 @@ class OrganizerWorkflow:
                 rel_clean = rel.strip().strip("\\/")
                 if not rel_clean or rel_clean == ".autosniffer_history":
                     continue
-                abs_dir = os.path.join(root_path, rel_clean.replace("/", "\\"))
+                abs_dir = self._abs_path(root_path, rel_clean)
                 try:
                     if os.path.exists(abs_dir) and not os.path.isdir(abs_dir):
                         continue
@@ -723,24 +1823,120 @@ class OrganizerWorkflow:
             "restored_empty_folders": restored_empty_dirs,
             "undo_results": undo_results,
         }
-        report_path = os.path.join(os.path.dirname(journal_path), f"{Path(journal_path).stem}__undo.json")
+        history = os.path.dirname(journal_path)
+        run_id = Path(journal_path).stem
+        report_path = os.path.join(history, f"{run_id}__undo.json")
         with open(report_path, "w", encoding="utf-8") as f:
             json.dump(report, f, ensure_ascii=False, indent=2)
+        update_index_entry(history, run_id, undone=True, undo_report=os.path.basename(report_path))
         return {"report_path": report_path, **report}
 
-    @staticmethod
-    def execute_script(script_content: str, working_dir: str, timeout_seconds: int = 300) -> ExecutionResult:
+    def undo_journals(
+        self,
+        root_path: str,
+        journal_ids: List[str],
+        *,
+        on_conflict: str = "rename",
+        max_workers: int = 8,
+    ) -> Dict[str, Any]:
+        """Undo several journals in dependency order (newest first).
+
+        A later run may have moved files that an earlier run placed, so runs are
+        always rolled back from the newest to the oldest.
+        """
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        history = self._history_dir(root_path)
+        entries = {e["id"]: e for e in list_journals(history)}
+        order = [e["id"] for e in list_journals(history)]
+        wanted = [str(x) for x in journal_ids or []]
+        missing = [x for x in wanted if x not in entries]
+        if missing:
+            raise ValueError(f"未找到历史记录：{', '.join(missing)}")
+        wanted.sort(key=order.index, reverse=True)
+
+        reports: List[Dict[str, Any]] = []
+        for run_id in wanted:
+            path = os.path.join(history, str(entries[run_id].get("file") or ""))
+            reports.append(self.undo_journal(root_path, path, on_conflict=on_conflict, max_workers=max_workers))
+        return {
+            "journals": [r["journal"] for r in reports],
+            "restored": sum(r["restored"] for r in reports),
+            "conflicts": sum(r["conflicts"] for r in reports),
+            "failed": sum(r["failed"] for r in reports),
+            "removed_empty_folders": [d for r in reports for d in r["removed_empty_folders"]],
+            "report_paths": [r["report_path"] for r in reports],
+            "reports": reports,
+        }
+
+    def undo_to(self, root_path: str, journal_id: str, *, on_conflict: str = "rename", max_workers: int = 8) -> Dict[str, Any]:
+        """Roll back `journal_id` and every newer journal that is not undone yet."""
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        entries = self.list_journals(root_path)
+        ids = [e["id"] for e in entries]
+        if journal_id not in ids:
+            raise ValueError(f"未找到历史记录：{journal_id}")
+        selected = [e["id"] for e in entries[ids.index(journal_id) :] if not e.get("undone")]
+        if not selected:
+            raise ValueError("所选历史记录及之后的记录均已撤销")
+        return self.undo_journals(root_path, selected, on_conflict=on_conflict, max_workers=max_workers)
+
+    def undo_last(self, root_path: str, *, on_conflict: str = "rename", max_workers: int = 8) -> Dict[str, Any]:
+        root_path = OrganizerWorkflow.validate_root_path(root_path)
+        loaded = self.load_last_journal(root_path)
+        if not loaded:
+            raise ValueError("未找到可撤销的历史记录（.autosniffer_history 为空或均已撤销）")
+        journal_path, _ = loaded
+        return self.undo_journal(root_path, journal_path, on_conflict=on_conflict, max_workers=max_workers)
+
+    def execute_script(
+        self,
+        script_content: str,
+        working_dir: str,
+        timeout_seconds: int = 300,
+        *,
+        backend: Optional[str] = None,
+    ) -> ExecutionResult:
+        """Run a generated mkdir/move script.
+
+        The default "native" backend interprets the script in-process and routes
+        folder moves through `move_files_python`, so conflicts are kept and the
+        records can be journaled; "powershell" runs it as a .bat (Windows only).
+        """
         if not script_content or not script_content.strip():
             raise ValueError("script_content 不能为空")
         working_dir = OrganizerWorkflow.validate_root_path(working_dir)
-        result = cmd_executor.execute_cmd_with_powershell(
+        result = cmd_executor.execute_cmd(
             script_content,
             working_dir=working_dir,
             timeout=timeout_seconds,
+            backend=backend or config.SCRIPT_BACKEND,
+            move_files=lambda items, dests: self.move_files_python(working_dir, items, dests),
         )
+        return_code = result.get("return_code")
         return ExecutionResult(
-            return_code=int(result.get("return_code") or -1),
+            return_code=int(-1 if return_code is None else return_code),
             stdout=str(result.get("stdout") or ""),
             stderr=str(result.get("stderr") or ""),
             executed_file=str(result.get("executed_file") or ""),
+            moves=list(result.get("moves") or []),
         )
+
+
+def _extract_snippet_for_rename(abs_path: str) -> str:
+    """Process-pool worker: extract text and keep the words used for the rename prompt."""
+    # Lazy extraction stops reading once 1000 words are in, like `_truncate_words` below.
+    text = extract_text_lazy(abs_path, max_words=1000, max_length=50000) or ""
+    return OrganizerWorkflow._truncate_words(text, threshold_words=100, max_words=1000)
+
+
+class _InProcessExtractor:
+    """Thread-pool stand-in for `ExtractionService` (no timeouts)."""
+
+    def __init__(self, pool: ThreadPoolExecutor):
+        self._pool = pool
+
+    def submit(self, path: str) -> Future:
+        return self._pool.submit(_extract_snippet_for_rename, path)
+
+    def shutdown(self, *, wait: bool = False, cancel_futures: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
@@ -0,0 +1,35 @@
+import os
+
+from src import cmd_executor, config
+
+
+def _legacy_sample_script() -> str:
+    # The sample script in the legacy single-stage prompt, as a model would echo it back.
+    body = config.SYSTEM_PROMPT.split("###输出样例：", 1)[1]
+    return body.strip().strip('"').strip()
+
+
+def test_legacy_sample_script_moves_each_file_once(tmp_path):
+    script = _legacy_sample_script()
+    names = [
+        "almirall论文翻译.docx", "214.pptx", "5-上海交通大学PPT模板.pptx", "2504生日.docx",
+        "2025年新生机械赛赛事手册（初版）.pdf", "复旦大道.jpg", "星空大草坪.jpg", "黄昏桥边.jpg",
+        "交大校歌（宣传用）.mp3", "a.docx", "notes", "run.bat",
+    ]
+    for name in names:
+        (tmp_path / name).write_bytes(b"x")
+
+    result = cmd_executor.execute_cmd_native(script, working_dir=str(tmp_path))
+
+    assert result["return_code"] == 0, result["stderr"]
+    assert sorted(os.listdir(tmp_path / "其他")) == ["a.docx", "notes"]
+    assert sorted(os.listdir(tmp_path / "校园风景")) == ["星空大草坪.jpg", "黄昏桥边.jpg"]
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_file()) == ["run.bat"]
+    assert len(result["moves"]) == len(names) - 1
+
+
+def test_parse_script_skips_redirect_only_lines():
+    ops, errors = cmd_executor.parse_script('mkdir "a" 2>nul\n>nul\n2>nul\nmove "x.txt" "a\\" >nul')
+
+    assert errors == []
+    assert ops == [("mkdir", "a"), ("move", "x.txt", "a\\", "")]
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from src.image_cache import NearDuplicateIndex, hamming  # noqa: E402
+
+
+def _brute_force_groups(hashes, max_distance):
+    leaders, groups = [], []
+    for h in hashes:
+        match = next((i for i, known in enumerate(leaders) if hamming(known, h) <= max_distance), None)
+        if match is None:
+            leaders.append(h)
+            match = len(leaders) - 1
+        groups.append(match)
+    return groups
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 4, 10, 64])
+def test_banded_lookup_matches_full_scan(max_distance):
+    rng = random.Random(max_distance)
+    bases = [rng.getrandbits(64) for _ in range(40)]
+    hashes = []
+    for _ in range(600):
+        h = rng.choice(bases)
+        for bit in rng.sample(range(64), rng.randint(0, 6)):
+            h ^= 1 << bit
+        hashes.append(h)
+
+    index = NearDuplicateIndex(max_distance)
+    futures, leaders = [], []
+    for h in hashes:
+        fut, owner = index.claim(h)
+        if owner:
+            leaders.append(fut)
+        futures.append(leaders.index(fut))
+
+    assert futures == _brute_force_groups(hashes, max_distance)
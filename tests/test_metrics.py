@@ -0,0 +1,21 @@
+from src import metrics
+from src.profiling import profile_run
+
+
+def test_traces_written_in_the_same_second_do_not_overwrite(tmp_path):
+    first = metrics.Trace("scan").write(str(tmp_path))
+    second = metrics.Trace("scan").write(str(tmp_path))
+
+    assert first["trace"] != second["trace"]
+    assert first["prometheus"] != second["prometheus"]
+    assert len(list(tmp_path.iterdir())) == 4
+
+
+def test_profiles_written_in_the_same_second_do_not_overwrite(tmp_path):
+    with profile_run("scan", str(tmp_path)) as first:
+        pass
+    with profile_run("scan", str(tmp_path)) as second:
+        pass
+
+    assert first["profile"] != second["profile"]
+    assert len(list(tmp_path.iterdir())) == 4
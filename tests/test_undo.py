@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("openai")
+
+from src.workflow import OrganizerWorkflow  # noqa: E402
+
+
+class _NoAI:
+    def choose_destinations_batch_stage2(self, payload, model=None, user_requirements=None):
+        raise AssertionError("AI should not be called")
+
+
+def _write(path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x")
+
+
+def test_empty_journal_does_not_block_undo(tmp_path):
+    root = str(tmp_path)
+    _write(os.path.join(root, "a", "f.txt"))
+    wf = OrganizerWorkflow(_NoAI())
+
+    records = wf.move_files_python(root, [{"relative_path": "a/f.txt", "name": "f.txt"}], ["docs"])
+    journal = wf.open_journal(root, run_id="20240101_000000", allowed_folders=["docs"])
+    journal.append_moves(records)
+    journal.finalize(deleted_empty_folders=[])
+
+    # A newer run that finished without moving anything (old trees may still contain these).
+    wf.open_journal(root, run_id="20240101_000001", allowed_folders=["docs"]).finalize(deleted_empty_folders=[])
+
+    report = wf.undo_last(root)
+
+    assert report["restored"] == 1
+    assert os.path.isfile(os.path.join(root, "a", "f.txt"))
+    assert all(e["undone"] for e in wf.list_journals(root))
+    with pytest.raises(ValueError):
+        wf.undo_last(root)
+
+
+def test_undo_to_rolls_back_past_empty_journal(tmp_path):
+    root = str(tmp_path)
+    _write(os.path.join(root, "a", "f.txt"))
+    wf = OrganizerWorkflow(_NoAI())
+
+    records = wf.move_files_python(root, [{"relative_path": "a/f.txt", "name": "f.txt"}], ["docs"])
+    journal = wf.open_journal(root, run_id="20240101_000000", allowed_folders=["docs"])
+    journal.append_moves(records)
+    journal.finalize(deleted_empty_folders=[])
+    wf.open_journal(root, run_id="20240101_000001", allowed_folders=["docs"]).finalize(deleted_empty_folders=[])
+
+    report = wf.undo_to(root, "20240101_000000")
+
+    assert report["restored"] == 1
+    assert os.path.isfile(os.path.join(root, "a", "f.txt"))
+
+
+def test_stage2_without_moves_leaves_no_journal(tmp_path):
+    root = str(tmp_path)
+    _write(os.path.join(root, "a", "f.txt"))
+    wf = OrganizerWorkflow(_NoAI())
+
+    summary = wf.run_stage2(
+        root,
+        [{"relative_path": "a/f.txt", "name": "f.txt"}],
+        ["docs"],
+        should_stop=lambda: True,
+    )
+
+    assert summary["stopped"] and summary["journal_path"] == ""
+    assert wf.list_journals(root) == []
+
+
+def test_rename_without_renames_leaves_no_journal(tmp_path):
+    root = str(tmp_path)
+    _write(os.path.join(root, "a", "f.txt"))
+    wf = OrganizerWorkflow(_NoAI())
+
+    stopped = wf.rename_apply_batch(root, [{"relative_path": "a/f.txt", "prefix": "报告"}], should_stop=lambda: True)
+    missing = wf.rename_apply_batch(root, [{"relative_path": "a/gone.txt", "prefix": "报告"}])
+
+    assert stopped["journal_path"] == "" and missing["journal_path"] == ""
+    assert wf.list_journals(root) == []
+
+
+def test_rename_is_journaled_and_undoable(tmp_path):
+    root = str(tmp_path)
+    items = []
+    for i in range(70):
+        _write(os.path.join(root, "a", f"f{i}.txt"))
+        items.append({"relative_path": f"a/f{i}.txt", "prefix": "报告"})
+    wf = OrganizerWorkflow(_NoAI())
+
+    summary = wf.rename_apply_batch(root, items)
+
+    assert summary["renamed"] == 70 and summary["journal_path"]
+    assert wf.undo_last(root)["restored"] == 70
+    assert sorted(os.listdir(os.path.join(root, "a"))) == sorted(f"f{i}.txt" for i in range(70))
+
+
+def test_journals_opened_in_the_same_second_get_distinct_ids(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    wf = OrganizerWorkflow(_NoAI())
+    monkeypatch.setattr(OrganizerWorkflow, "_now_id", staticmethod(lambda: "20240101_000000"))
+
+    first = wf.open_journal(root, allowed_folders=["docs"])
+    second = wf.open_journal(root, allowed_folders=["docs"])
+    third = wf.write_journal(root, {"moves": []})
+
+    assert first.run_id == "20240101_000000"
+    assert second.run_id == "20240101_000000_2"
+    assert os.path.basename(third) == "20240101_000000_3.json"
+    first.discard()
+    second.discard()
@@ -1,13 +1,278 @@
+import multiprocessing
 import threading
+import time
 import os
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import flet as ft
 
 from src.workflow import OrganizerWorkflow
+from src.tree_index import StructureIndex
+from src.jobs import Job, JobManager, current_token
 from src.ai_service import AIService
 from src import config
+from src import metrics
+from src.profiling import profile_run
+
+# Upper bound on pushes to the Flet client while workers are producing updates.
+UI_MAX_UPDATES_PER_SEC = 10
+
+# Jobs wrapped by the optional profiler (config.PROFILE_ENABLED / hidden settings toggle).
+PROFILED_JOBS = {"scan", "stage2", "rename_preview"}
+
+# Jobs of different tabs ("lanes") can run side by side, one job per lane at a time.
+JOB_LANES = {
+    "scan": "organize",
+    "plan_folders": "organize",
+    "create_folders": "organize",
+    "stage2": "organize",
+    "dry_run": "organize",
+    "undo": "organize",
+    "detect_ambiguous": "rename",
+    "rename_preview": "rename",
+    "apply_rename": "rename",
+}
+# Jobs that change files never overlap with another job on the same folder.
+WRITING_JOBS = {"create_folders", "stage2", "apply_rename", "undo"}
+
+
+class UiUpdateDispatcher:
+    """Coalesce control changes from worker threads into rate-limited updates.
+
+    Workers change control properties and call `touch(*controls)`; a
+    background thread pushes the dirty controls with `page.update(*controls)`
+    at most `max_fps` times per second, so only changed controls are sent.
+    `defer(key, fn)` registers a render step run just before the next push
+    (the latest per key wins), so expensive text building happens once per frame.
+    """
+
+    def __init__(self, page: ft.Page, max_fps: int = UI_MAX_UPDATES_PER_SEC):
+        self._page = page
+        self._interval = 1.0 / max(1, int(max_fps))
+        self._lock = threading.Lock()
+        self._dirty: Dict[int, Any] = {}
+        self._renders: Dict[str, Callable[[], None]] = {}
+        self._wake = threading.Event()
+        self._last = 0.0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def touch(self, *controls: Any) -> None:
+        with self._lock:
+            for c in controls:
+                self._dirty[id(c)] = c
+        self._wake.set()
+
+    def defer(self, key: str, fn: Callable[[], None], *controls: Any) -> None:
+        with self._lock:
+            self._renders[key] = fn
+            for c in controls:
+                self._dirty[id(c)] = c
+        self._wake.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            renders = list(self._renders.values())
+            dirty = list(self._dirty.values())
+            self._renders.clear()
+            self._dirty.clear()
+        for fn in renders:
+            try:
+                fn()
+            except Exception:
+                pass
+        if not dirty:
+            return
+        self._last = time.monotonic()
+        try:
+            self._page.update(*dirty)
+        except Exception:
+            # A control not yet mounted cannot be updated on its own; push the page.
+            try:
+                self._page.update()
+            except Exception:
+                pass
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            delay = self._last + self._interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
+
+
+class LogRing:
+    """Bounded log view: keeps the newest `max_lines` rows as controls.
+
+    Older rows are dropped from the control tree (the ListView itself only
+    builds visible rows), so memory and update cost stay constant. Every line
+    is also appended to `spill_path` when set, keeping the full history.
+    """
+
+    def __init__(self, view: ft.ListView, *, max_lines: int, spill_path: Optional[str] = None):
+        self.view = view
+        self.max_lines = max(50, int(max_lines))
+        self.spill_path = spill_path
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._spill = None
+
+    def _write_spill(self, line: str) -> None:
+        if not self.spill_path:
+            return
+        try:
+            if self._spill is None:
+                os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+                self._spill = open(self.spill_path, "a", encoding="utf-8", buffering=1)
+            self._spill.write(line + "\n")
+        except OSError:
+            # Logging to disk is best effort; keep the on-screen log working.
+            self.spill_path = None
+
+    def append(self, line: str, color: Optional[str] = None) -> bool:
+        """Add a row; returns True the first time older rows had to be dropped."""
+        with self._lock:
+            self._write_spill(line)
+            self.view.controls.append(ft.Text(line, selectable=True, color=color))
+            excess = len(self.view.controls) - self.max_lines
+            if excess <= 0:
+                return False
+            del self.view.controls[:excess]
+            first_drop = self.dropped == 0
+            self.dropped += excess
+            return first_drop
+
+
+class TreePreview:
+    """Lazy directory tree for the scan result.
+
+    Only the root's children are rendered at first; a directory's children
+    are added when it is expanded, `PAGE_SIZE` at a time, and search shows
+    matching entries only. The preview therefore costs a few hundred rows no
+    matter how large the scan is.
+    """
+
+    PAGE_SIZE = 200
+
+    def __init__(self, label: str):
+        self.index: Optional[StructureIndex] = None
+        self.expanded: set = set()
+        self.search_field = ft.TextField(
+            label="搜索文件/文件夹（回车）",
+            dense=True,
+            expand=True,
+            on_submit=self._on_search,
+        )
+        self.summary = ft.Text("尚未分析目录", size=12, color=ft.Colors.GREY_700)
+        self.list = ft.ListView(height=220, spacing=0, item_extent=26)
+        self.control = ft.Container(
+            content=ft.Column(
+                controls=[
+                    ft.Text(label),
+                    ft.Row(controls=[self.search_field]),
+                    self.summary,
+                    self.list,
+                ],
+                spacing=4,
+                tight=True,
+            ),
+            border=ft.border.all(1, ft.Colors.GREY_300),
+            border_radius=8,
+            padding=8,
+        )
+
+    def set_index(self, index: Optional[StructureIndex]) -> None:
+        """Reset the view to a new scan (safe to call from a worker thread; caller pushes the update)."""
+        self.index = index
+        self.expanded = set()
+        self.search_field.value = ""
+        if index is None:
+            self.summary.value = "尚未分析目录"
+            self.list.controls = []
+            return
+        self.summary.value = f"共 {index.dir_count} 个文件夹，{index.file_count} 个文件（点击文件夹展开）"
+        self.list.controls = self._page_rows("", 0, 0)
+
+    def _row(self, entry: Dict[str, Any], depth: int, *, label: Optional[str] = None) -> ft.Control:
+        is_dir = entry["type"] == "directory"
+        rel = entry["relative_path"]
+        if is_dir:
+            mark = "▾" if rel in self.expanded else "▸"
+            text = f"{mark} {label or entry['name']}/  ({entry['child_count']})"
+        else:
+            text = f"   {label or entry['name']}"
+        row = ft.Container(
+            content=ft.Text(text, size=13, no_wrap=True, selectable=not is_dir),
+            padding=ft.padding.only(left=4 + depth * 16),
+            data={"rel": rel, "depth": depth, "kind": entry["type"]},
+        )
+        if is_dir:
+            row.on_click = lambda e, r=row: self._toggle(r)
+        return row
+
+    def _page_rows(self, dir_rel: str, depth: int, offset: int) -> List[ft.Control]:
+        entries, total = self.index.children(dir_rel, offset=offset, limit=self.PAGE_SIZE)
+        rows = [self._row(e, depth) for e in entries]
+        remaining = total - offset - len(entries)
+        if remaining > 0:
+            more = ft.Container(
+                content=ft.Text(f"… 显示更多（剩余 {remaining} 项）", size=12, color=ft.Colors.BLUE),
+                padding=ft.padding.only(left=4 + depth * 16),
+                data={"rel": dir_rel, "depth": depth, "kind": "more", "offset": offset + len(entries)},
+            )
+            more.on_click = lambda e, m=more: self._more(m)
+            rows.append(more)
+        return rows
+
+    def _toggle(self, row: ft.Control) -> None:
+        if self.index is None:
+            return
+        controls = self.list.controls
+        pos = next((i for i, c in enumerate(controls) if c is row), -1)
+        if pos < 0:
+            return
+        rel, depth = row.data["rel"], row.data["depth"]
+        if rel in self.expanded:
+            self.expanded.discard(rel)
+            end = pos + 1
+            while end < len(controls) and controls[end].data["depth"] > depth:
+                if controls[end].data["kind"] == "directory":
+                    self.expanded.discard(controls[end].data["rel"])
+                end += 1
+            del controls[pos + 1:end]
+        else:
+            self.expanded.add(rel)
+            controls[pos + 1:pos + 1] = self._page_rows(rel, depth + 1, 0)
+        # Rebuild the row so its ▸/▾ marker follows the new state.
+        controls[pos] = self._row(self.index.entry(rel), depth)
+        self.list.update()
+
+    def _more(self, more: ft.Control) -> None:
+        controls = self.list.controls
+        pos = next((i for i, c in enumerate(controls) if c is more), -1)
+        if pos < 0 or self.index is None:
+            return
+        data = more.data
+        controls[pos:pos + 1] = self._page_rows(data["rel"], data["depth"], data["offset"])
+        self.list.update()
+
+    def _on_search(self, e) -> None:
+        if self.index is None:
+            return
+        query = (self.search_field.value or "").strip()
+        if not query:
+            self.set_index(self.index)
+        else:
+            matches, truncated = self.index.search(query, limit=self.PAGE_SIZE)
+            self.expanded = set()
+            self.list.controls = [self._row(m, 0, label=m["relative_path"]) for m in matches]
+            self.summary.value = (
+                f"搜索“{query}”：{len(matches)}{'+' if truncated else ''} 项（清空搜索框并回车返回目录树）"
+            )
+        self.summary.update()
+        self.list.update()
 
 
 def main(page: ft.Page):
@@ -26,18 +291,21 @@ def main(page: ft.Page):
     directory_json_text: str = ""
     folders: List[str] = []
     files: List[Dict[str, Any]] = []
-    stop_event: Optional[threading.Event] = None
+    jobs = JobManager(max_workers=len(set(JOB_LANES.values())))
+    # lane -> (root_path, writes) of the job running in it.
+    running: Dict[str, Tuple[str, bool]] = {}
     last_created_folders: List[str] = []
 
     ambiguous_files: List[Dict[str, Any]] = []
     rename_preview_items: List[Dict[str, Any]] = []
 
-    is_busy_flag: bool = False
+    ui = UiUpdateDispatcher(page)
 
-    def log(message: str):
+    def log(message: str, color: Optional[str] = None):
         ts = datetime.now().strftime("%H:%M:%S")
-        logs.controls.append(ft.Text(f"[{ts}] {message}", selectable=True))
-        page.update()
+        if log_ring.append(f"[{ts}] {message}", color=color) and log_ring.spill_path:
+            log_ring.append(f"[{ts}] 日志较多，仅显示最近 {log_ring.max_lines} 条；完整日志：{log_ring.spill_path}")
+        ui.touch(logs)
 
     def _ui_call(fn):
         try:
@@ -106,6 +374,13 @@ def main(page: ft.Page):
     def _root_path_for_rename() -> str:
         return (root_path_field_rename.value or root_path_field.value or "").strip()
 
+    def _undo_target() -> Tuple[str, str]:
+        """(lane, root_path) for undo. Rename journals are written under the rename
+        root, so undo follows the current tab."""
+        if tabs.tabs[tabs.selected_index or 0] is rename_tab:
+            return "rename", _root_path_for_rename()
+        return "organize", _root_path_for_workflow()
+
     def _has_scan_results() -> bool:
         return bool(structure_obj is not None and (directory_json_text or "").strip())
 
@@ -119,10 +394,12 @@ def main(page: ft.Page):
 
     def refresh_action_states():
         """Enable/disable buttons based on user progress to reduce confusion."""
-        busy = bool(is_busy_flag)
-
         workflow_root = _root_path_for_workflow()
         rename_root = _root_path_for_rename()
+        organize_busy = lane_blocked("organize", workflow_root)
+        organize_write_busy = lane_blocked("organize", workflow_root, writes=True)
+        rename_busy = lane_blocked("rename", rename_root)
+        rename_write_busy = lane_blocked("rename", rename_root, writes=True)
         scanned = _has_scan_results()
         api_ok = _api_key_present()
         current_folders = _folders_from_field()
@@ -130,10 +407,10 @@ def main(page: ft.Page):
         folders_exist = _folders_exist_on_disk(workflow_root, current_folders)
 
         # --- File organizing tab (4 main buttons) ---
-        scan_btn.disabled = busy or (not workflow_root)
+        scan_btn.disabled = organize_busy or (not workflow_root)
         scan_btn.tooltip = "请先选择目标目录" if (not workflow_root) else "分析目标目录结构"
 
-        plan_folders_btn.disabled = busy or (not scanned) or (not api_ok)
+        plan_folders_btn.disabled = organize_busy or (not scanned) or (not api_ok)
         if not scanned:
             plan_folders_btn.tooltip = "请先点击“分析目录”"
         elif not api_ok:
@@ -141,7 +418,7 @@ def main(page: ft.Page):
         else:
             plan_folders_btn.tooltip = "根据目录结构生成分类文件夹列表"
 
-        create_folders_btn.disabled = busy or (not scanned) or (not folders_ok) or (not workflow_root)
+        create_folders_btn.disabled = organize_write_busy or (not scanned) or (not folders_ok) or (not workflow_root)
         if not scanned:
             create_folders_btn.tooltip = "请先点击“分析目录”"
         elif not folders_ok:
@@ -150,7 +427,7 @@ def main(page: ft.Page):
             create_folders_btn.tooltip = "在目标目录中创建分类文件夹（不移动文件）"
 
         stage2_ready = scanned and api_ok and folders_ok and bool(workflow_root) and folders_exist
-        start_stage2_btn.disabled = busy or (not stage2_ready)
+        start_stage2_btn.disabled = organize_write_busy or (not stage2_ready)
         if not scanned:
             start_stage2_btn.tooltip = "请先点击“分析目录”"
         elif not api_ok:
@@ -162,11 +439,18 @@ def main(page: ft.Page):
         else:
             start_stage2_btn.tooltip = "按批调用 AI 并实际移动文件"
 
+        dry_run_ready = scanned and api_ok and folders_ok
+        dry_run_btn.disabled = organize_busy or (not dry_run_ready)
+        if not dry_run_ready:
+            dry_run_btn.tooltip = "请先分析目录、填写 API Key 并生成目录列表"
+        else:
+            dry_run_btn.tooltip = "调用 AI 归类并在内存中模拟移动与清理，不改动磁盘"
+
         # --- Rename tab actions ---
-        scan_btn_rename.disabled = busy or (not rename_root)
+        scan_btn_rename.disabled = organize_busy or (not rename_root)
         scan_btn_rename.tooltip = "请先选择目标目录" if (not rename_root) else "分析目标目录结构"
 
-        detect_ambiguous_btn.disabled = busy or (not scanned) or (not api_ok)
+        detect_ambiguous_btn.disabled = rename_busy or (not scanned) or (not api_ok)
         if not scanned:
             detect_ambiguous_btn.tooltip = "请先点击“分析目录”"
         elif not api_ok:
@@ -174,7 +458,7 @@ def main(page: ft.Page):
         else:
             detect_ambiguous_btn.tooltip = "让 AI 找出命名模糊的文件"
 
-        build_rename_preview_btn.disabled = busy or (not scanned) or (not api_ok) or (not ambiguous_files)
+        build_rename_preview_btn.disabled = rename_busy or (not scanned) or (not api_ok) or (not ambiguous_files)
         if not scanned:
             build_rename_preview_btn.tooltip = "请先点击“分析目录”"
         elif not api_ok:
@@ -184,31 +468,42 @@ def main(page: ft.Page):
         else:
             build_rename_preview_btn.tooltip = "提取内容并生成新名前缀预览"
 
-        apply_rename_btn.disabled = busy or (not rename_preview_items)
+        apply_rename_btn.disabled = rename_write_busy or (not rename_preview_items)
         apply_rename_btn.tooltip = "请先生成重命名预览" if (not rename_preview_items) else "执行重命名（会实际修改文件名）"
 
-        stop_btn.disabled = not busy
+        stop_btn.disabled = not running
         page.update()
 
-    def set_busy(is_busy: bool):
-        nonlocal is_busy_flag
-        is_busy_flag = bool(is_busy)
-
-        pick_dir_btn.disabled = is_busy_flag
-        pick_dir_btn_rename.disabled = is_busy_flag
-
-        timeout_field.disabled = is_busy_flag
-        folders_field.disabled = is_busy_flag
-        api_key_field.disabled = is_busy_flag
-        base_url_field.disabled = is_busy_flag
-        stage1_model_field.disabled = is_busy_flag
-        stage2_model_field.disabled = is_busy_flag
-        image_model_field.disabled = is_busy_flag
-        batch_size_field.disabled = is_busy_flag
-        progress.visible = is_busy_flag
+    def _same_root(a: str, b: str) -> bool:
+        return bool(a and b) and os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+    def lane_blocked(lane: str, root_path: str, *, writes: bool = False) -> bool:
+        """True if a job in `lane` on `root_path` cannot start now."""
+        for other, (job_root, job_writes) in list(running.items()):
+            if other == lane or ((writes or job_writes) and _same_root(root_path, job_root)):
+                return True
+        return False
+
+    def refresh_busy():
+        # Folder pickers and shared settings stay locked while any job runs;
+        # action buttons are handled per lane in `refresh_action_states`.
+        busy = bool(running)
+
+        pick_dir_btn.disabled = busy
+        pick_dir_btn_rename.disabled = busy
+
+        timeout_field.disabled = busy
+        folders_field.disabled = busy
+        api_key_field.disabled = busy
+        base_url_field.disabled = busy
+        stage1_model_field.disabled = busy
+        stage2_model_field.disabled = busy
+        image_model_field.disabled = busy
+        batch_size_field.disabled = busy
+        progress.visible = busy
         # Indeterminate header progress bar + ring = a small, elegant busy animation.
-        progress.value = None if is_busy_flag else 0
-        busy_ring.visible = is_busy_flag
+        progress.value = None if busy else 0
+        busy_ring.visible = busy
 
         refresh_action_states()
 
@@ -236,17 +531,73 @@ def main(page: ft.Page):
             workflow_stage2_model = stage2_model
         return workflow
 
-    def new_stop_event() -> threading.Event:
-        nonlocal stop_event
-        stop_event = threading.Event()
-        return stop_event
+    def report_metrics(trace: metrics.Trace) -> None:
+        summary = trace.summary()
+        if not summary["spans"]:
+            return
+        for line in trace.format_summary().splitlines():
+            log(line)
+        # Per-user directory: read-only runs (scan, dry run, previews) must not write into the chosen folder.
+        if config.METRICS_EXPORT and config.METRICS_DIR:
+            try:
+                paths = trace.write(config.METRICS_DIR)
+                log(f"性能数据已导出：{paths['trace']}")
+            except OSError as ex:
+                log(f"性能数据导出失败：{ex}")
+
+    def run_profiled(name: str, root_path: str, fn, *args):
+        out_dir = os.path.join(root_path, ".autosniffer_history", "profiles")
+        log(f"性能分析已开启：{name}")
+        paths: Dict[str, str] = {}
+        try:
+            with profile_run(name, out_dir, interval=config.PROFILE_SAMPLE_INTERVAL_MS / 1000.0) as paths:
+                return fn(*args)
+        finally:
+            # `profile_run` fills in the paths when its block exits.
+            if paths:
+                log(f"性能分析结果：{paths['profile']}（火焰图数据：{paths['collapsed']}）")
+
+    def start_job(name: str, fn, *args, root_path: str = "", lane: str = "") -> Optional[Job]:
+        """Run an action on the job manager; it gets its own cancellation token.
+
+        `root_path` is the folder the job works on (organize or rename tab).
+        The job occupies its lane (`JOB_LANES`, or `lane`) until it ends, so a
+        job of the other tab can run at the same time.
+        """
+        lane = lane or JOB_LANES[name]
+        writes = name in WRITING_JOBS
+        if lane_blocked(lane, root_path, writes=writes):
+            log("已有任务在运行（同一页面或同一目录），请稍后再试")
+            return None
+        running[lane] = (root_path, writes)
+        refresh_busy()
+        profile = bool(profile_switch.value) and name in PROFILED_JOBS and os.path.isdir(root_path)
+
+        def run(*job_args):
+            try:
+                # Spans from the job and its helper threads are summarized when it ends.
+                with metrics.collect(name) as trace:
+                    try:
+                        if profile:
+                            return run_profiled(name, root_path, fn, *job_args)
+                        return fn(*job_args)
+                    finally:
+                        trace.finished_at = time.time()
+                        report_metrics(trace)
+            finally:
+                running.pop(lane, None)
+                refresh_busy()
+
+        return jobs.submit(name, run, *args)
 
     def should_stop() -> bool:
-        return bool(stop_event and stop_event.is_set())
+        # Only valid on the job thread; helper threads get the job's token passed in
+        # (`should_stop=current_token()`), so each job checks its own cancellation.
+        token = current_token()
+        return bool(token and token.cancelled)
 
     def on_stop_click(_):
-        if stop_event:
-            stop_event.set()
+        if jobs.cancel_all():
             log("已请求停止：将尽快在安全点中断")
         stop_btn.disabled = True
         page.update()
@@ -291,21 +642,8 @@ def main(page: ft.Page):
         on_click=lambda _: picker.get_directory_path(dialog_title="选择要重命名的目录"),
     )
 
-    structure_preview = ft.TextField(
-        label="目录结构（JSON预览）",
-        multiline=True,
-        min_lines=6,
-        max_lines=8,
-        read_only=True,
-    )
-
-    structure_preview_rename = ft.TextField(
-        label="目录结构（JSON预览）",
-        multiline=True,
-        min_lines=6,
-        max_lines=8,
-        read_only=True,
-    )
+    structure_preview = TreePreview("目录结构预览")
+    structure_preview_rename = TreePreview("目录结构预览")
 
     folders_field = ft.TextField(
         label="阶段1：目标分类文件夹（每行一个，可编辑）",
@@ -335,6 +673,13 @@ def main(page: ft.Page):
     busy_ring = ft.ProgressRing(visible=False, width=18, height=18, stroke_width=3)
 
     logs = ft.ListView(expand=True, spacing=6, auto_scroll=True)
+    log_ring = LogRing(
+        logs,
+        max_lines=config.UI_LOG_MAX_LINES,
+        spill_path=(
+            os.path.join(config.UI_LOG_DIR, f"autosniffer-{datetime.now():%Y%m%d}.log") if config.UI_LOG_DIR else None
+        ),
+    )
 
     stage2_current = ft.TextField(
         label="阶段2：当前处理命令（只读）",
@@ -386,6 +731,13 @@ def main(page: ft.Page):
         input_filter=ft.NumbersOnlyInputFilter(),
     )
 
+    # Diagnostics only: hidden unless AUTOSNIFFER_PROFILE is set; Ctrl+Shift+P reveals it.
+    profile_switch = ft.Switch(
+        label="性能分析（诊断用：扫描/阶段2/重命名预览写入 .autosniffer_history/profiles）",
+        value=config.PROFILE_ENABLED,
+        visible=config.PROFILE_ENABLED,
+    )
+
     organize_requirements_field = ft.TextField(
         label="个性化要求（可选）",
         hint_text="例如：优先按项目/客户分类；图片按拍摄地点；不要创建过多分类等",
@@ -419,8 +771,11 @@ def main(page: ft.Page):
                 return
             structure_obj = structure
             directory_json_text = wf.format_structure_json(structure)
-            structure_preview.value = directory_json_text
-            structure_preview_rename.value = directory_json_text
+            # The preview is a lazy tree over the scan result, not the JSON text.
+            structure_index = StructureIndex(structure)
+            structure_preview.set_index(structure_index)
+            structure_preview_rename.set_index(structure_index)
+            ui.touch(structure_preview.control, structure_preview_rename.control)
             files = wf.flatten_files(structure)
             stage2_progress.value = 0
             stage2_progress_text.value = f"待处理文件数：{len(files)}"
@@ -428,16 +783,12 @@ def main(page: ft.Page):
         except Exception as ex:
             log(f"扫描失败: {ex}")
             show_error(str(ex), title="扫描失败")
-        finally:
-            set_busy(False)
 
     def on_scan_click(_):
         if not (root_path_field.value or root_path_field_rename.value):
             log("请先选择目录")
             return
-        set_busy(True)
-        new_stop_event()
-        threading.Thread(target=do_scan, daemon=True).start()
+        start_job("scan", do_scan, root_path=_root_path_for_workflow() or _root_path_for_rename())
 
     def on_scan_click_rename(_):
         on_scan_click(_)
@@ -487,13 +838,9 @@ def main(page: ft.Page):
         except Exception as ex:
             log(f"阶段1失败: {ex}")
             show_error(str(ex), title="阶段1失败")
-        finally:
-            set_busy(False)
 
     def on_plan_folders_click(_):
-        set_busy(True)
-        new_stop_event()
-        threading.Thread(target=do_plan_folders, daemon=True).start()
+        start_job("plan_folders", do_plan_folders)
 
     def do_create_folders():
         nonlocal last_created_folders
@@ -519,8 +866,6 @@ def main(page: ft.Page):
         except Exception as ex:
             log(f"阶段1执行失败: {ex}")
             show_error(str(ex), title="创建文件夹失败")
-        finally:
-            set_busy(False)
 
     def on_create_folders_click(_):
         if not root_path_field.value:
@@ -534,9 +879,7 @@ def main(page: ft.Page):
         def run_after_confirm(e):
             confirm_dialog.open = False
             page.update()
-            set_busy(True)
-            new_stop_event()
-            threading.Thread(target=do_create_folders, daemon=True).start()
+            start_job("create_folders", do_create_folders, root_path=_root_path_for_workflow())
 
         confirm_dialog = ft.AlertDialog(
             modal=True,
@@ -549,12 +892,16 @@ def main(page: ft.Page):
         )
         page.open(confirm_dialog)
 
-    def do_stage2_process():
+    def do_stage2_process(resume_state: Optional[Dict[str, Any]] = None):
         try:
             nonlocal last_created_folders
             wf = ensure_workflow()
             root_path = root_path_field.value or ""
             current_folders = _folders_from_field()
+            if resume_state and resume_state.get("allowed_folders"):
+                # Resume with the folder list the interrupted run was classifying into.
+                current_folders = list(resume_state["allowed_folders"])
+                folders_field.value = "\n".join(current_folders)
             if not current_folders:
                 raise ValueError("请先完成阶段1并确认目录列表")
             if structure_obj is None:
@@ -570,63 +917,55 @@ def main(page: ft.Page):
             if batch_size <= 0:
                 batch_size = 1
 
-            total = len(local_files)
-            done = 0
             stage2_progress.value = 0
-            stage2_progress_text.value = f"准备开始：0/{total}"
-            page.update()
-
-            run_id = wf._now_id()
-            journal_moves: List[Dict[str, Any]] = []
-            log(f"阶段2：开始批处理归类并移动（共 {total} 个文件，每批 {batch_size} 个）...")
-            for batch in wf.chunk_list(local_files, batch_size):
-                if should_stop():
-                    log("阶段2：已停止")
-                    return
-
-                # AI decide destinations for this batch
-                stage2_current.value = f"AI 批处理规划中（{done}/{total}）"
-                stage2_progress_text.value = f"AI 规划中：{done}/{total}"
-                page.update()
-
-                destinations = wf.stage2_choose_destinations_batch(
-                    batch,
-                    current_folders,
-                    model=(stage2_model_field.value or "").strip(),
-                    user_requirements=(organize_requirements_field.value or "").strip() or None,
+            stage2_progress_text.value = f"准备开始：0/{len(local_files)}"
+            ui.touch(stage2_progress, stage2_progress_text)
+
+            def on_progress(stage: str, done: int, total: int):
+                if stage == "classify":
+                    stage2_current.value = f"AI 批处理规划中（{done}/{total}）"
+                    stage2_progress_text.value = f"AI 规划中：{done}/{total}"
+                elif stage == "move":
+                    stage2_current.value = f"执行批处理：移动文件（{done}/{total}）"
+                    stage2_progress_text.value = f"执行中：{done}/{total}"
+                else:
+                    # Count progress by attempted items
+                    stage2_progress.value = done / total if total else 0
+                    stage2_progress_text.value = f"已处理：{done}/{total}"
+                ui.touch(stage2_current, stage2_progress, stage2_progress_text)
+
+            if resume_state:
+                log(
+                    f"阶段2：继续上次中断的运行 {resume_state.get('run_id')}"
+                    f"（已移动 {len(resume_state.get('moved') or {})} 个，已缓存决策 {len(resume_state.get('decisions') or {})} 个）"
                 )
+            log(f"阶段2：开始批处理归类并移动（共 {len(local_files)} 个文件，每批 {batch_size} 个）...")
+            # Each batch is checkpointed to an append-only journal, so a crash or stop
+            # keeps undo information and can be resumed later.
+            summary = wf.run_stage2(
+                root_path,
+                local_files,
+                current_folders,
+                batch_size=batch_size,
+                model=(stage2_model_field.value or "").strip(),
+                user_requirements=(organize_requirements_field.value or "").strip() or None,
+                created_folders=list(last_created_folders or []),
+                resume_state=resume_state,
+                should_stop=current_token(),
+                on_progress=on_progress,
+            )
+            if summary.get("stopped"):
+                if summary.get("journal_path"):
+                    log(f"阶段2：已停止（历史记录已保存，可继续：{summary.get('journal_path')}）")
+                else:
+                    log("阶段2：已停止（尚未处理任何文件）")
+                return
 
-                if should_stop():
-                    log("阶段2：已停止")
-                    return
-
-                stage2_current.value = f"执行批处理：移动 {len(batch)} 个文件"
-                stage2_progress_text.value = f"执行中：{done}/{total}"
-                page.update()
-
-                # Use Python move for per-file journaling and conflict handling.
-                move_records = wf.move_files_python(root_path, batch, destinations, on_conflict="rename")
-                journal_moves.extend(move_records)
-
-                # Count progress by attempted items
-                done = min(total, done + len(batch))
-                stage2_progress.value = done / total if total else 0
-                stage2_progress_text.value = f"已处理：{done}/{total}"
-                page.update()
-
-            # Cleanup empty folders and persist journal for Undo.
-            deleted_empty_folders = wf.cleanup_empty_folders(root_path)
+            deleted_empty_folders = summary.get("deleted_empty_folders") or []
             if deleted_empty_folders:
                 log(f"阶段2：已清理空文件夹 {len(deleted_empty_folders)} 个")
-
-            journal = {
-                "id": run_id,
-                "created_folders": list(last_created_folders or []),
-                "moves": journal_moves,
-                "deleted_empty_folders": deleted_empty_folders,
-            }
-            journal_path = wf.write_journal(root_path, journal)
-            log(f"阶段2：已写入历史记录：{journal_path}")
+            if summary.get("journal_path"):
+                log(f"阶段2：已写入历史记录：{summary.get('journal_path')}")
 
             log("阶段2：全部处理完成")
             show_info("阶段2：全部处理完成")
@@ -636,7 +975,6 @@ def main(page: ft.Page):
         finally:
             stage2_current.value = ""
             stage2_progress_text.value = stage2_progress_text.value or ""
-            set_busy(False)
 
     def on_start_stage2_click(_):
         if not root_path_field.value:
@@ -649,33 +987,91 @@ def main(page: ft.Page):
             log("请先分析目录")
             return
 
+        try:
+            resume_state = ensure_workflow().load_resume_state(root_path_field.value or "")
+        except Exception:
+            resume_state = None
+
         def close_dialog(e):
             confirm_dialog.open = False
             page.update()
 
-        def run_after_confirm(e):
+        def start(state: Optional[Dict[str, Any]]):
             confirm_dialog.open = False
             page.update()
-            set_busy(True)
-            new_stop_event()
-            threading.Thread(target=do_stage2_process, daemon=True).start()
+            start_job("stage2", do_stage2_process, state, root_path=_root_path_for_workflow())
+
+        actions = [
+            ft.TextButton("取消", on_click=close_dialog),
+            ft.FilledButton("开始", on_click=lambda e: start(None)),
+        ]
+        content = "即将按批调用 AI 并执行 move 命令，会实际移动文件。"
+        if resume_state:
+            content += (
+                f"\n\n检测到上次未完成的运行（已移动 {len(resume_state.get('moved') or {})} 个文件）。"
+                "\n“继续上次”会跳过已移动的文件，并复用已缓存的 AI 归类结果；“开始”会重新开始一次新运行。"
+            )
+            actions.append(ft.FilledButton("继续上次", on_click=lambda e: start(resume_state)))
 
         confirm_dialog = ft.AlertDialog(
             modal=True,
             title=ft.Text("确认开始阶段2"),
-            content=ft.Text("即将按批调用 AI 并执行 move 命令，会实际移动文件。"),
-            actions=[
-                ft.TextButton("取消", on_click=close_dialog),
-                ft.FilledButton("开始", on_click=run_after_confirm),
-            ],
+            content=ft.Text(content),
+            actions=actions,
         )
         page.open(confirm_dialog)
 
+    def do_dry_run():
+        try:
+            wf = ensure_workflow()
+            current_folders = _folders_from_field()
+            if not current_folders:
+                raise ValueError("请先完成阶段1并确认目录列表")
+            if structure_obj is None:
+                raise ValueError("请先分析目录")
+            require_api_key()
+
+            batch_size = int(batch_size_field.value or "5")
+            if batch_size <= 0:
+                batch_size = 1
+
+            def on_progress(stage: str, done: int, total: int):
+                stage2_progress.value = done / total if total else 0
+                stage2_progress_text.value = f"预演（AI 规划中）：{done}/{total}"
+                ui.touch(stage2_progress, stage2_progress_text)
+
+            log("预演：按批调用 AI 归类，并在内存中模拟移动（不改动磁盘）...")
+            result = wf.dry_run_stage2(
+                structure_obj,
+                current_folders,
+                batch_size=batch_size,
+                model=(stage2_model_field.value or "").strip(),
+                user_requirements=(organize_requirements_field.value or "").strip() or None,
+                should_stop=current_token(),
+                on_progress=on_progress,
+            )
+            if result is None:
+                log("预演：已停止")
+                return
+            summary = result.get("summary") or {}
+            log(
+                f"预演完成：将移动 {summary.get('moved', 0)} 个文件，冲突改名 {summary.get('conflicts', 0)}，"
+                f"新建文件夹 {summary.get('created_folders', 0)}，清理空文件夹 {summary.get('removed_empty_folders', 0)}"
+            )
+            show_dialog(result.get("diff_text") or "", title="预演结果（未改动磁盘）")
+        except Exception as ex:
+            log(f"预演失败: {ex}")
+            show_error(str(ex), title="预演失败")
+
+    def on_dry_run_click(_):
+        start_job("dry_run", do_dry_run, root_path=_root_path_for_workflow())
+
     scan_btn = ft.FilledButton("分析目录", icon=ft.Icons.SEARCH, on_click=on_scan_click)
     scan_btn_rename = ft.FilledButton("分析目录", icon=ft.Icons.SEARCH, on_click=on_scan_click_rename)
     plan_folders_btn = ft.FilledButton("生成目录", icon=ft.Icons.AUTO_AWESOME, on_click=on_plan_folders_click)
     create_folders_btn = ft.FilledButton("创建文件夹", icon=ft.Icons.CREATE_NEW_FOLDER, on_click=on_create_folders_click)
     start_stage2_btn = ft.FilledButton("批量移动", icon=ft.Icons.DRIVE_FILE_MOVE, on_click=on_start_stage2_click)
+    dry_run_btn = ft.OutlinedButton("预演", icon=ft.Icons.PREVIEW, on_click=on_dry_run_click)
 
     # --- Smart Rename UI actions ---
 
@@ -732,13 +1128,9 @@ def main(page: ft.Page):
         except Exception as ex:
             log(f"智能重命名：识别失败: {ex}")
             show_error(str(ex), title="智能重命名：识别失败")
-        finally:
-            set_busy(False)
 
     def on_detect_ambiguous_click(_):
-        set_busy(True)
-        new_stop_event()
-        threading.Thread(target=do_detect_ambiguous, daemon=True).start()
+        start_job("detect_ambiguous", do_detect_ambiguous, root_path=_root_path_for_rename())
 
     def do_build_rename_preview():
         nonlocal rename_preview_items
@@ -770,77 +1162,59 @@ def main(page: ft.Page):
             rename_preview_items = []
             rename_progress.value = 0
             rename_progress_text.value = f"准备开始：0/{len(targets)}"
-            page.update()
+            ui.touch(rename_progress, rename_progress_text)
 
-            lines: List[str] = []
             total = len(targets)
+            lines: List[str] = [""] * total
             done = 0
+            preview_lock = threading.Lock()
             log(f"智能重命名：开始提取内容并生成新名前缀（共 {total} 个文件）...")
-            for fi in targets:
-                if should_stop():
-                    log("智能重命名：已停止")
-                    return
-
-                rp = str(fi.get("relative_path") or "")
-                name = str(fi.get("name") or "")
-                ext = str(fi.get("extension") or "").lower()
-                rename_progress_text.value = f"处理中：{done}/{total}"
-                page.update()
-
-                # Check if it's an image file
-                image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif'}
-                is_image = ext in image_extensions
-
-                if is_image:
-                    # Use multimodal AI for image files
-                    try:
-                        log(f"智能重命名：使用多模态AI识别图片 {name}")
-                        prefix = wf.rename_suggest_prefix_for_image(
-                            root_path,
-                            fi,
-                            model=(image_model_field.value or stage2_model_field.value or "").strip(),
-                            user_requirements=(rename_requirements_field.value or "").strip() or None,
-                        )
-                        if not prefix:
-                            prefix = "未识别"
-                    except Exception as img_ex:
-                        err = str(img_ex)
-                        log(f"图片识别失败 {name}: {err}")
-                        # Keep prefix short, but show reason in preview line for debugging.
-                        prefix = "识别失败"
-                else:
-                    # Use text extraction for non-image files
-                    snippet = wf.rename_extract_content(root_path, rp)
-                    if not snippet.strip():
-                        prefix = "内容为空"
-                    else:
-                        prefix = wf.rename_suggest_prefix(
-                            fi,
-                            snippet,
-                            model=(stage2_model_field.value or "").strip(),
-                            user_requirements=(rename_requirements_field.value or "").strip() or None,
-                        )
-                        if not prefix:
-                            prefix = "未命名"
-
-                new_name = f"{prefix}_{name}"
-                if is_image and prefix == "识别失败":
-                    reason = (str(img_ex) if 'img_ex' in locals() else '').strip()
-                    if reason:
-                        reason = reason.replace('\n', ' ')
-                        if len(reason) > 120:
-                            reason = reason[:120] + "..."
-                        lines.append(f"{rp}  ->  {new_name}  # {reason}")
-                    else:
-                        lines.append(f"{rp}  ->  {new_name}")
-                else:
-                    lines.append(f"{rp}  ->  {new_name}")
-                rename_preview_items.append({"relative_path": rp, "prefix": prefix, "old_name": name, "new_name": new_name})
 
+            def on_result(index: int, item: Dict[str, Any]):
+                with preview_lock:
+                    _on_result_locked(index, item)
+
+            def _on_result_locked(index: int, item: Dict[str, Any]):
+                nonlocal done
+                rp = item["relative_path"]
+                reason = (item.get("error") or "").strip()
+                if reason:
+                    log(f"智能重命名：{item['old_name']} 处理失败: {reason}")
+                    reason = reason.replace("\n", " ")
+                    if len(reason) > 120:
+                        reason = reason[:120] + "..."
+                    # Keep prefix short, but show reason in preview line for debugging.
+                    lines[index] = f"{rp}  ->  {item['new_name']}  # {reason}"
+                else:
+                    lines[index] = f"{rp}  ->  {item['new_name']}"
                 done += 1
                 rename_progress.value = done / total if total else 0
                 rename_progress_text.value = f"已生成预览：{done}/{total}"
-                page.update()
+                # Stream results into the preview in input order; the text is rebuilt once per frame.
+                ui.defer("rename_preview", render_preview, rename_preview, rename_progress, rename_progress_text)
+
+            def render_preview():
+                with preview_lock:
+                    rename_preview.value = "\n".join(line for line in lines if line)
+
+            # Extraction, image encoding and AI calls run as a concurrent pipeline.
+            results = wf.rename_build_preview(
+                root_path,
+                targets,
+                model=(stage2_model_field.value or "").strip(),
+                image_model=(image_model_field.value or stage2_model_field.value or "").strip(),
+                user_requirements=(rename_requirements_field.value or "").strip() or None,
+                should_stop=current_token(),
+                on_result=on_result,
+            )
+            rename_preview_items = [
+                {"relative_path": it["relative_path"], "prefix": it["prefix"], "old_name": it["old_name"], "new_name": it["new_name"]}
+                for it in results
+                if it is not None
+            ]
+            if should_stop():
+                log(f"智能重命名：已停止（已生成 {len(rename_preview_items)}/{total} 个预览）")
+                return
 
             rename_preview.value = "\n".join(lines)
             log("智能重命名：预览生成完成")
@@ -848,13 +1222,9 @@ def main(page: ft.Page):
         except Exception as ex:
             log(f"智能重命名：预览失败: {ex}")
             show_error(str(ex), title="智能重命名：预览失败")
-        finally:
-            set_busy(False)
 
     def on_build_rename_preview_click(_):
-        set_busy(True)
-        new_stop_event()
-        threading.Thread(target=do_build_rename_preview, daemon=True).start()
+        start_job("rename_preview", do_build_rename_preview, root_path=_root_path_for_rename())
 
     def do_apply_rename():
         try:
@@ -866,41 +1236,39 @@ def main(page: ft.Page):
                 raise ValueError("请先生成重命名预览")
 
             total = len(rename_preview_items)
-            done = 0
-            ok = 0
-            failed = 0
-            conflict = 0
             rename_progress.value = 0
             rename_progress_text.value = f"准备开始：0/{total}"
-            page.update()
+            ui.touch(rename_progress, rename_progress_text)
+
+            def on_progress(done: int, total_files: int):
+                rename_progress.value = done / total_files if total_files else 0
+                rename_progress_text.value = f"已处理：{done}/{total_files}"
+                ui.touch(rename_progress, rename_progress_text)
 
             log(f"智能重命名：开始执行重命名（共 {total} 个文件）...")
-            for it in rename_preview_items:
-                if should_stop():
-                    log("智能重命名：已停止")
-                    return
-                rp = str(it.get("relative_path") or "")
-                prefix = str(it.get("prefix") or "")
-                res = wf.rename_apply_prefix(root_path, rp, prefix)
-                if res.get("status") == "renamed":
-                    ok += 1
-                    if res.get("conflict"):
-                        conflict += 1
-                elif res.get("status") == "failed":
-                    failed += 1
-                    logs.controls.append(ft.Text(f"[重命名失败] {rp}: {res.get('error')}", selectable=True, color=ft.Colors.RED))
-                done += 1
-                rename_progress.value = done / total if total else 0
-                rename_progress_text.value = f"已处理：{done}/{total}"
-                page.update()
+            summary = wf.rename_apply_batch(
+                root_path,
+                list(rename_preview_items),
+                should_stop=current_token(),
+                on_progress=on_progress,
+            )
+            for res in summary["results"]:
+                if res.get("status") == "failed":
+                    log(f"[重命名失败] {res.get('old_rel')}: {res.get('error')}", color=ft.Colors.RED)
+            ok = summary["renamed"]
+            failed = summary["failed"]
+            conflict = summary["conflicts"]
+            if summary["journal_path"]:
+                log(f"智能重命名：已写入历史记录 {summary['journal_path']}（可撤销）")
+            if summary["stopped"]:
+                log(f"智能重命名：已停止。成功 {ok}，失败 {failed}，冲突改名 {conflict}")
+                return
 
             log(f"智能重命名：完成。成功 {ok}，失败 {failed}，冲突改名 {conflict}")
             show_info("智能重命名：执行完成（详情见日志）")
         except Exception as ex:
             log(f"智能重命名：执行失败: {ex}")
             show_error(str(ex), title="智能重命名：执行失败")
-        finally:
-            set_busy(False)
 
     def on_apply_rename_click(_):
         if not rename_preview_items:
@@ -914,9 +1282,7 @@ def main(page: ft.Page):
         def run_after_confirm(e):
             confirm_dialog.open = False
             page.update()
-            set_busy(True)
-            new_stop_event()
-            threading.Thread(target=do_apply_rename, daemon=True).start()
+            start_job("apply_rename", do_apply_rename, root_path=_root_path_for_rename())
 
         confirm_dialog = ft.AlertDialog(
             modal=True,
@@ -933,35 +1299,56 @@ def main(page: ft.Page):
     build_rename_preview_btn = ft.FilledButton("生成重命名预览", icon=ft.Icons.FIND_REPLACE, on_click=on_build_rename_preview_click)
     apply_rename_btn = ft.FilledButton("执行重命名", icon=ft.Icons.DRIVE_FILE_RENAME_OUTLINE, on_click=on_apply_rename_click)
 
-    def do_undo_last():
+    def do_undo(root_path: str, journal_id: Optional[str] = None):
         try:
             wf = ensure_workflow()
-            root_path = root_path_field.value or ""
             if not root_path:
                 raise ValueError("请先选择目录")
             if should_stop():
                 log("已停止")
                 return
             log("撤销：开始尝试还原到执行前状态...")
-            report = wf.undo_last(root_path, on_conflict="rename")
+            if journal_id:
+                report = wf.undo_to(root_path, journal_id, on_conflict="rename")
+                log(f"撤销：已回滚 {len(report.get('journals') or [])} 次运行：{', '.join(report.get('journals') or [])}")
+            else:
+                report = wf.undo_last(root_path, on_conflict="rename")
             log(
                 f"撤销完成：恢复 {report.get('restored', 0)} 个文件，冲突 {report.get('conflicts', 0)}，失败 {report.get('failed', 0)}"
             )
             if report.get("removed_empty_folders"):
                 log(f"撤销：已删除空文件夹：{', '.join(report['removed_empty_folders'])}")
-            log(f"撤销报告：{report.get('report_path')}")
+            for report_path in report.get("report_paths") or [report.get("report_path")]:
+                log(f"撤销报告：{report_path}")
             show_info("撤销完成（详情见日志）")
         except Exception as ex:
             log(f"撤销失败: {ex}")
             show_error(str(ex), title="撤销失败")
-        finally:
-            set_busy(False)
 
     def on_undo_click(_):
-        if not root_path_field.value:
+        lane, root_path = _undo_target()
+        if not root_path:
             log("请先选择目录")
             return
 
+        try:
+            undoable = [e for e in ensure_workflow().list_journals(root_path) if not e.get("undone")]
+        except Exception:
+            undoable = []
+
+        journal_dropdown = ft.Dropdown(
+            label="回滚到（含之后的所有运行）",
+            options=[
+                ft.dropdown.Option(
+                    key=e["id"],
+                    text=f"{e['id']}{'（重命名）' if e.get('kind') == 'rename' else ''}{'' if e.get('complete') else '（未完成）'}",
+                )
+                for e in reversed(undoable)
+            ],
+            value=undoable[-1]["id"] if undoable else None,
+            visible=len(undoable) > 1,
+        )
+
         def close_dialog(e):
             confirm_dialog.open = False
             page.update()
@@ -969,16 +1356,23 @@ def main(page: ft.Page):
         def run_after_confirm(e):
             confirm_dialog.open = False
             page.update()
-            set_busy(True)
-            new_stop_event()
-            threading.Thread(target=do_undo_last, daemon=True).start()
+            selected = journal_dropdown.value if len(undoable) > 1 else None
+            start_job("undo", do_undo, root_path, selected, root_path=root_path, lane=lane)
 
         confirm_dialog = ft.AlertDialog(
             modal=True,
-            title=ft.Text("确认撤销上一次"),
-            content=ft.Text(
-                "将根据 .autosniffer_history 中最近一次记录，尽量把已移动文件移回原位置。\n"
-                "如遇同名冲突，会自动重命名保留两份。"
+            title=ft.Text("确认撤销"),
+            content=ft.Column(
+                controls=[
+                    ft.Text(
+                        "将根据 .autosniffer_history 中的记录，尽量把已移动/重命名的文件恢复到原位置和原名。\n"
+                        "选择较早的记录时，会按从新到旧的顺序一并回滚其后的所有运行。\n"
+                        "如遇同名冲突，会自动重命名保留两份。"
+                    ),
+                    ft.Text(f"目录：{root_path}", color=ft.Colors.GREY_700),
+                    journal_dropdown,
+                ],
+                tight=True,
             ),
             actions=[
                 ft.TextButton("取消", on_click=close_dialog),
@@ -1019,6 +1413,7 @@ def main(page: ft.Page):
             plan_folders_btn,
             create_folders_btn,
             start_stage2_btn,
+            dry_run_btn,
         ],
         spacing=10,
         vertical_alignment=ft.CrossAxisAlignment.CENTER,
@@ -1093,7 +1488,7 @@ def main(page: ft.Page):
             top_controls,
             actions_row,
             organize_requirements_field,
-            structure_preview,
+            structure_preview.control,
             ft.Container(
                 content=stage2_view,
                 border=ft.border.all(1, ft.Colors.GREY_300),
@@ -1173,6 +1568,7 @@ def main(page: ft.Page):
                 ft.Text("模型与执行参数", weight=ft.FontWeight.BOLD),
                 ft.Row(controls=[stage1_model_field, stage2_model_field, image_model_field], spacing=10, wrap=True),
                 ft.Row(controls=[batch_size_field, timeout_field], spacing=10),
+                profile_switch,
             ],
             spacing=12,
             scroll=ft.ScrollMode.AUTO,
@@ -1208,7 +1604,7 @@ def main(page: ft.Page):
                 rename_top_controls,
                 rename_actions_row,
                 rename_requirements_field,
-                structure_preview_rename,
+                structure_preview_rename.control,
                 ft.Container(
                     content=ft.Column(
                         controls=[
@@ -1239,18 +1635,30 @@ def main(page: ft.Page):
         ),
     )
 
-    page.add(
-        header,
-        ft.Tabs(
-            selected_index=0,
-            tabs=[workflow_tab, rename_tab, settings_tab],
-            expand=True,
-        ),
+    tabs = ft.Tabs(
+        selected_index=0,
+        tabs=[workflow_tab, rename_tab, settings_tab],
+        expand=True,
     )
+    page.add(header, tabs)
+
+    # Job threads are not daemons: cancel them so closing the window ends the process.
+    page.on_close = lambda e: jobs.shutdown(wait=False, cancel=True)
+
+    def on_keyboard(e: ft.KeyboardEvent):
+        # Only on the settings page, where the switch lives.
+        on_settings = tabs.tabs[tabs.selected_index or 0] is settings_tab
+        if on_settings and e.ctrl and e.shift and (e.key or "").upper() == "P":
+            profile_switch.visible = not profile_switch.visible
+            page.update()
+
+    page.on_keyboard_event = on_keyboard
 
     refresh_action_states()
     log("就绪：请选择要整理的目录")
 
 
 if __name__ == "__main__":
+    # Rename extraction uses a process pool; required for frozen Windows builds.
+    multiprocessing.freeze_support()
     ft.app(target=main)